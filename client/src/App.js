@@ -6,6 +6,7 @@ import "./App.css";
 import ChatBox from "./chat.js";
 import GameAPIConnection from "./connection-layer.js";
 import { suitToSymbol } from "./helpers.js";
+import LobbyTools from "./lobbytools.js";
 import { Bid1Controls, Bid2Controls } from "./movecontrols.js";
 import UIButton from "./uibutton.js";
 
@@ -25,7 +26,10 @@ function resolvePlayerPosition(position, player) {
 class Card extends Component {
   render() {
     return (
-      <div className={`card card${this.props.color}`} onClick={() => this.props.onClick()}>
+      <div
+        className={`card card${this.props.color}${this.props.unplayable ? " unplayable" : ""}`}
+        onClick={() => this.props.onClick()}
+      >
         {this.props.children}
       </div>
     );
@@ -62,26 +66,28 @@ class FaceUpCard extends Component {
 
   render() {
     return (
-      <Card color={this.color} onClick={() => this.props.onClick()}>
+      <Card color={this.color} unplayable={this.props.unplayable} onClick={() => this.props.onClick()}>
         {this.props.rank + this.suitSymbol}
       </Card>
     );
   }
 
-  static fromStr(s, onClick) {
+  static fromStr(s, onClick, unplayable = false) {
     const [rank, suit] = s.split(".");
-    return <FaceUpCard suit={suit} rank={rank} key={rank + suit} onClick={onClick} />;
+    return <FaceUpCard suit={suit} rank={rank} key={rank + suit} onClick={onClick} unplayable={unplayable} />;
   }
 }
 
 class Hand extends Component {
   render() {
     const cardStrs = this.props.cards;
+    const playable = this.props.playable;
     return (
       <div className="hand myhand">
         <div className="cards">
           {cardStrs.map((cardStr, index) => {
-            return FaceUpCard.fromStr(cardStr, () => this.props.onClick(index));
+            const unplayable = playable !== null && !playable.includes(cardStr);
+            return FaceUpCard.fromStr(cardStr, () => this.props.onClick(index), unplayable);
           })}
         </div>
         <div className="playername">
@@ -163,6 +169,7 @@ class Table extends Component {
       <Hand
         playerName={name}
         cards={this.props.gameState !== null ? this.props.gameState.hand : []}
+        playable={this.props.playable}
         onClick={i => this.props.handleCardClick(i)}
       />
     );
@@ -248,6 +255,7 @@ class Lobby extends Component {
       gameState: null,
       messages: [],
       seats: Array(4).fill(null),
+      playable: null,
       players: null,
       position: null
     };
@@ -283,6 +291,14 @@ class Lobby extends Component {
     console.log("subscribed");
   }
 
+  fillSeatsWithBots() {
+    this.state.seats.forEach((playerID, seat) => {
+      if (playerID === null) {
+        this.props.gameAPIConnection.addBot(seat);
+      }
+    });
+  }
+
   handleCardClick(i) {
     if (!this.myTurn()) {
       return;
@@ -314,7 +330,10 @@ class Lobby extends Component {
   }
 
   trackGame() {
-    this.props.gameAPIConnection.subscribeToPublicState(res => this.setState({ gameState: res }));
+    this.props.gameAPIConnection.subscribeToPublicState(res => {
+      this.setState({ gameState: res, playable: null });
+      this.updatePlayable(res);
+    });
     this.props.gameAPIConnection.subscribeToHand(([res]) =>
       this.setState(prevState =>
         update(prevState, {
@@ -326,6 +345,17 @@ class Lobby extends Component {
         })
       )
     );
+    this.props.gameAPIConnection.resync();
+  }
+
+  updatePlayable(gameState) {
+    // Grey out the cards we may not play; the server knows the rules.
+    if (gameState.turn !== this.state.position || (gameState.phase !== "play" && gameState.phase !== "discard")) {
+      return;
+    }
+    this.props.gameAPIConnection
+      .legalMoves()
+      .then(moves => this.setState({ playable: moves.map(move => move[1][0]) }));
   }
 
   renderScoreboardSpot() {
@@ -345,6 +375,8 @@ class Lobby extends Component {
       return (
         <UIButton onClick={() => this.props.gameAPIConnection.startGame()}>Start Game</UIButton>
       );
+    } else if (this.state.position !== null) {
+      return <UIButton onClick={() => this.fillSeatsWithBots()}>Fill empty seats with bots</UIButton>;
     }
     return null;
   }
@@ -356,6 +388,7 @@ class Lobby extends Component {
         <Table
           gameAPIConnection={this.props.gameAPIConnection}
           gameState={gameState}
+          playable={this.state.playable}
           player={this.state.position}
           players={this.state.seats.map(x => (x !== null ? this.state.players[x] : null))}
           position={this.state.position}
@@ -382,17 +415,29 @@ class App extends Component {
     super();
     this.state = {
       gameAPIConnection: null,
-      playerID: null
+      playerID: null,
+      tableID: null
     };
   }
 
+  joinTable(tableID) {
+    this.state.gameAPIConnection.joinTable(tableID).then(() => this.setState({ tableID }));
+  }
+
   componentDidMount() {
     const wsuri = `ws://${document.location.hostname}:8080/ws`;
 
     // the WAMP connection to the Router
+    // Prefer a binary serializer where this build of autobahn has one; the
+    // router falls back to JSON otherwise.
+    const serializers = [new autobahn.serializer.JSONSerializer()];
+    if (autobahn.serializer.MsgpackSerializer) {
+      serializers.unshift(new autobahn.serializer.MsgpackSerializer());
+    }
     this.connection = new autobahn.Connection({
       url: wsuri,
-      realm: "realm1"
+      realm: "realm1",
+      serializers
     });
 
     // fired when connection is established and session attached
@@ -400,11 +445,11 @@ class App extends Component {
       session
         .call("join_server", [])
         .then(([playerID]) => {
-          this.setState({
-            gameAPIConnection: new GameAPIConnection(session, playerID),
-            playerID
+          const gameAPIConnection = new GameAPIConnection(session, playerID);
+          return gameAPIConnection.negotiateProtocol().then(() => {
+            this.setState({ gameAPIConnection, playerID });
+            console.log("Player ID: " + playerID);
           });
-          console.log("Player ID: " + playerID);
         })
         .catch(console.log);
       console.log("Connected");
@@ -421,9 +466,24 @@ class App extends Component {
   }
 
   render() {
-    return this.state.gameAPIConnection
-      ? <Lobby gameAPIConnection={this.state.gameAPIConnection} playerID={this.state.playerID} />
-      : <div>Connecting...</div>;
+    if (!this.state.gameAPIConnection) {
+      return <div>Connecting...</div>;
+    }
+    if (this.state.tableID === null) {
+      return (
+        <LobbyTools
+          gameAPIConnection={this.state.gameAPIConnection}
+          joinTable={tableID => this.joinTable(tableID)}
+        />
+      );
+    }
+    return (
+      <Lobby
+        gameAPIConnection={this.state.gameAPIConnection}
+        playerID={this.state.playerID}
+        key={this.state.tableID}
+      />
+    );
   }
 }
 
@@ -1,7 +1,77 @@
+// Decoding tables for the server's compact protocol, in the server's order.
+const SUITS = ["C", "D", "H", "S"];
+const RANKS = ["9", "10", "J", "Q", "K", "A"];
+const CARDS = [].concat(...SUITS.map(suit => RANKS.map(rank => `${rank}.${suit}`)));
+const PHASES = ["bid1", "bid2", "discard", "play", "gameover"];
+
+function decodeHand(mask) {
+  return CARDS.filter((card, index) => mask & (1 << index));
+}
+
+function decodeFields(fields) {
+  const decoded = Object.assign({}, fields);
+  if (fields.phase !== undefined) {
+    decoded.phase = PHASES[fields.phase];
+  }
+  if (fields.trump !== undefined && fields.trump !== null) {
+    decoded.trump = SUITS[fields.trump];
+  }
+  if (fields.up_card !== undefined) {
+    decoded.up_card = CARDS[fields.up_card];
+  }
+  if (fields.trick !== undefined) {
+    decoded.trick = {};
+    Object.entries(fields.trick).forEach(([seat, card]) => (decoded.trick[seat] = CARDS[card]));
+  }
+  return decoded;
+}
+
+function encodeArg(arg) {
+  if (CARDS.includes(arg)) {
+    return CARDS.indexOf(arg);
+  }
+  if (SUITS.includes(arg)) {
+    return SUITS.indexOf(arg);
+  }
+  return arg;
+}
+
+function decodeArg(move) {
+  return (arg, index) => {
+    if (move === "discard" || move === "play") {
+      return CARDS[arg];
+    }
+    return move === "call_two" && index === 1 ? SUITS[arg] : arg;
+  };
+}
+
 class GameAPIConnection {
   constructor(session, playerID) {
     this.session = session;
     this.playerID = playerID;
+    this.tableID = null;
+    this.protocol = "string";
+    this.version = null;
+    this.publicState = null;
+    this.hand = [];
+    this.publicStateCallback = () => {};
+    this.handCallback = () => {};
+  }
+
+  applyStateMessage(message) {
+    if (message.snapshot !== undefined) {
+      this.publicState = this.decodeFields(message.snapshot);
+    } else if (this.publicState !== null && message.version === this.version + 1) {
+      const state = Object.assign({}, this.publicState, this.decodeFields(message.patch));
+      (message.removed || []).forEach(field => delete state[field]);
+      this.publicState = state;
+    } else {
+      // We missed an update; start over from the server's snapshot.
+      this.resync();
+      return;
+    }
+    this.version = message.version;
+    this.publicStateCallback(this.translateStateDict(this.publicState));
   }
 
   callAPI(endpoint, args) {
@@ -9,7 +79,15 @@ class GameAPIConnection {
   }
 
   callPlayerAPI(endpoint, args) {
-    return this.callAPI(`player${this.playerID}.${endpoint}`, args);
+    return this.callAPI(`player.${endpoint}`, args);
+  }
+
+  callTableAPI(endpoint, args) {
+    return this.callAPI(this.tableURI(endpoint), args);
+  }
+
+  addBot(seat) {
+    return this.callTableAPI("add_bot", [seat]);
   }
 
   bid1(call, alone) {
@@ -28,25 +106,77 @@ class GameAPIConnection {
     }
   }
 
+  decodeFields(fields) {
+    return this.protocol === "compact" ? decodeFields(fields) : fields;
+  }
+
+  decodeHand(hand) {
+    return this.protocol === "compact" ? decodeHand(hand) : hand;
+  }
+
+  createTable(name) {
+    return this.callAPI("create_table", [name]);
+  }
+
   getPlayers() {
     return this.callAPI("players");
   }
 
   getSeats() {
-    return this.callAPI("seats");
+    return this.callTableAPI("seats");
+  }
+
+  getTables() {
+    return this.callAPI("tables");
   }
 
   joinSeat(position) {
     return this.callPlayerAPI("join_seat", [position]);
   }
 
+  joinTable(tableID) {
+    return this.callPlayerAPI("join_table", [tableID]).then(() => {
+      this.tableID = tableID;
+    });
+  }
+
+  legalMoves() {
+    return this.callPlayerAPI("legal_moves").then(moves =>
+      moves.map(([move, args]) => [move, this.protocol === "compact" ? args.map(decodeArg(move)) : args])
+    );
+  }
+
+  negotiateProtocol() {
+    return this.callPlayerAPI("set_protocol", ["compact", "string"]).then(protocol => {
+      this.protocol = protocol;
+    });
+  }
+
   performMove(...args) {
+    if (this.protocol === "compact") {
+      args = args.map(encodeArg);
+    }
     this.callPlayerAPI("perform_move", args);
   }
 
+  resync() {
+    return this.callPlayerAPI("snapshot").then(({ version, state, hand }) => {
+      if (state === null) {
+        return;
+      }
+      this.version = version;
+      this.publicState = this.decodeFields(state);
+      this.publicStateCallback(this.translateStateDict(this.publicState));
+      if (hand !== null) {
+        this.hand = this.decodeHand(hand);
+        this.handCallback([this.hand]);
+      }
+    });
+  }
+
   sendMessage(message) {
     this.session.publish(
-      "chat",
+      this.tableURI("chat"),
       [{ senderID: this.playerID, body: message }],
       {},
       { exclude_me: false }
@@ -66,11 +196,15 @@ class GameAPIConnection {
   }
 
   subscribeToHand(callback) {
-    this.subscribe(`hands.player${this.playerID}`, callback);
+    this.handCallback = callback;
+    this.subscribe(this.tableURI(this.topic("hand")), ([res]) => {
+      this.hand = this.decodeHand(res.hand);
+      callback([this.hand]);
+    });
   }
 
   subscribeToChat(callback) {
-    this.subscribe("chat", callback);
+    this.subscribe(this.tableURI("chat"), callback);
   }
 
   subscribeToPlayers(callback) {
@@ -78,16 +212,32 @@ class GameAPIConnection {
   }
 
   subscribeToPublicState(callback) {
-    this.subscribe("publicstate", ([res]) => callback(this.translateStateDict(res)));
+    this.publicStateCallback = callback;
+    this.version = null;
+    this.publicState = null;
+    this.subscribe(this.tableURI(this.topic("publicstate")), ([res]) => this.applyStateMessage(res));
   }
 
   subscribeToSeats(callback) {
-    this.subscribe("seats", callback);
+    this.subscribe(this.tableURI("seats"), callback);
+  }
+
+  subscribeToTables(callback) {
+    this.subscribe("tables", callback);
+  }
+
+  topic(name) {
+    return this.protocol === "string" ? name : `${name}.${this.protocol}`;
+  }
+
+  tableURI(name) {
+    return `table${this.tableID}.${name}`;
   }
 
   translateStateDict(state) {
     return {
       dealer: state.dealer,
+      hand: this.hand,
       hands: state.hands,
       phase: state.phase,
       score: state.score,
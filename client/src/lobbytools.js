@@ -1,21 +1,30 @@
 import React, { Component } from "react";
+import update from "immutability-helper";
 import UIButton from "./uibutton.js";
 
 class LobbyTools extends Component {
   constructor() {
     super();
-    this.state = { lobbies: [] };
+    this.state = { tables: {} };
   }
 
   componentDidMount() {
-    this.props.session.call("get_lobbies", []).then(res => this.setState({ lobbies: res }));
+    const gameAPIConnection = this.props.gameAPIConnection;
+    gameAPIConnection.getTables().then(tables => this.setState({ tables }));
+    gameAPIConnection.subscribeToTables(([tables]) =>
+      this.setState(prevState => update(prevState, { tables: { $merge: tables } }))
+    );
+  }
+
+  createTable() {
+    this.props.gameAPIConnection.createTable(null).then(tableID => this.props.joinTable(tableID));
   }
 
-  lobbyList() {
+  tableList() {
     return (
       <div className="lobbyList">
-        {Object.entries(this.state.lobbies).map(([key, value]) => (
-          <UIButton onClick={() => this.props.joinLobby(Number(key))} key={key}>{value}</UIButton>
+        {Object.entries(this.state.tables).filter(([key, value]) => value !== null).map(([key, value]) => (
+          <UIButton onClick={() => this.props.joinTable(Number(key))} key={key}>{value}</UIButton>
         ))}
       </div>
     );
@@ -24,10 +33,10 @@ class LobbyTools extends Component {
   render() {
     return (
       <div>
-        <UIButton onClick={() => this.props.createLobby("cool lobby")}>
-          Create lobby
+        <UIButton onClick={() => this.createTable()}>
+          Create table
         </UIButton>
-        {this.lobbyList()}
+        {this.tableList()}
       </div>
     );
   }
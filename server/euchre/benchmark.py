@@ -0,0 +1,290 @@
+"""Performance benchmarks with stored baselines.
+
+Micro benchmarks time single operations of the engine, macro benchmarks
+whole games, and the publish_state benchmarks the fan-out of one move at
+each of a number of tables, serialization included, without a router or an
+event loop.
+Every result is in seconds per operation.
+
+Run every benchmark and compare it with the stored baselines::
+
+    $ python -m euchre.benchmark
+
+The run fails if any benchmark is more than --tolerance slower than its
+baseline. Baselines only mean something on the machine that made them;
+refresh them there with --save after a deliberate change in speed.
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import time
+
+from .dealing import Dealer, deal
+from .encoder import encode, to_serializable
+from .game import (BidPhaseOne, BidPhaseTwo, DiscardPhase, Game, GameOver,
+                   PlayCardsPhase, Trick, initial_game_state)
+from .objects import Card, Suit
+from .simulate import play_game, random_policy
+
+BASELINE = os.path.join(os.path.dirname(os.path.dirname(
+    os.path.abspath(__file__))), 'benchmarks.json')
+
+# Every benchmark, by name. Each is a function returning a callable to time
+# and the number of operations one call performs.
+BENCHMARKS = {}
+
+
+def benchmark(name):
+    """Register the decorated setup function as benchmark name."""
+    def register(setup):
+        BENCHMARKS[name] = setup
+        return setup
+    return register
+
+
+def cards(*card_strs):
+    return [Card.from_str(card_str) for card_str in card_strs]
+
+
+def sample_phases():
+    """Return one phase of each kind, by name."""
+    hands = [cards('A.S', 'K.S', 'J.S', 'Q.H', '9.D'),
+             cards('A.C', 'K.C', 'J.C', 'Q.D', '9.H'),
+             cards('A.H', 'K.H', 'J.H', 'Q.C', '9.C'),
+             cards('A.D', 'K.D', 'J.D', 'Q.S', '9.S')]
+    up_card = Card.from_str('10.D')
+    trick = Trick(1, {1: hands[1][0], 2: hands[2][4], 3: hands[3][4]})
+    return {
+        'bid1': BidPhaseOne([0, 0], hands, 0, 1, up_card),
+        'bid2': BidPhaseTwo([0, 0], hands, 0, 1, up_card),
+        'discard': DiscardPhase([0, 0], hands, 0, 1, None, Suit.diamonds),
+        'play': PlayCardsPhase([0, 0], hands, 0, 0, 1, None, Suit.spades,
+                               trick, [1, 0]),
+        'gameover': GameOver(0, [10, 4]),
+    }
+
+
+@benchmark('card_from_str')
+def card_from_str():
+    return lambda: Card.from_str('10.H'), 1
+
+
+@benchmark('card_hash')
+def card_hash():
+    card = Card.from_str('10.H')
+    return lambda: hash(card), 1
+
+
+@benchmark('deal')
+def deal_hand():
+    rng = random.Random(0)
+    return lambda: deal(rng), 1
+
+
+@benchmark('trick_winner')
+def trick_winner():
+    return sample_phases()['play'].trick_winner, 1
+
+
+def _serialize(phase):
+    @benchmark('to_serializable.' + phase)
+    def setup():
+        state = sample_phases()[phase]
+        return lambda: to_serializable(state), 1
+
+
+for _phase in ('bid1', 'bid2', 'discard', 'play', 'gameover'):
+    _serialize(_phase)
+
+
+@benchmark('random_game')
+def random_game():
+    rng = random.Random(0)
+    policies = [random_policy] * 4
+    return lambda: play_game(policies, rng, Dealer(rng.getrandbits(64))), 1
+
+
+def record_game(seed):
+    """Return the (seat, move, args) of a random game dealt by Dealer(seed).
+    """
+    rng = random.Random(seed)
+    state = initial_game_state(Dealer(seed))
+    moves = []
+    while not isinstance(state, GameOver):
+        move, args = random_policy(state, rng)
+        moves.append((state.turn, move, args))
+        state = state.apply(move, *args)
+    return moves
+
+
+@benchmark('perform_move')
+def perform_move():
+    moves = record_game(0)
+
+    def replay():
+        game = Game(initial_game_state(Dealer(0)))
+        for seat, move, args in moves:
+            game.perform_move(move, seat, *args)
+    return replay, len(moves)
+
+
+class _Sink:
+    """Stands in for the router session, serializing what is published."""
+    journal = None
+    history = None
+
+    def publish(self, topic, *args, options=None):
+        encode(args)
+
+
+def _publish_state(tables):
+    @benchmark('publish_state.{}'.format(tables))
+    def setup():
+        from .server import GameLayer, Lobby, Player, PublishQueue
+
+        class Queue(PublishQueue):
+            # Flushed by hand below rather than by an event loop.
+            def schedule(self, table):
+                self.tables[table.table_id] = table
+
+        sink = _Sink()
+        sink.publish_queue = Queue()
+        lobbies = []
+        for table_id in range(tables):
+            lobby = Lobby(sink, table_id, 'bench')
+            for seat in range(4):
+                player = Player(4 * table_id + seat, 'p', sink)
+                player.session_id = player.player_id
+                player.protocol = 'compact' if seat % 2 else 'string'
+                lobby.seats_to_players[seat] = player
+            lobby.game = GameLayer(Game(None))
+            lobbies.append((lobby, record_game(table_id)))
+        steps = min(len(moves) for _, moves in lobbies)
+        position = [steps]
+
+        def step():
+            # One move at every table; a new game after steps moves.
+            if position[0] == steps:
+                position[0] = 0
+                for lobby, _ in lobbies:
+                    lobby.game.game.state = initial_game_state(
+                        Dealer(lobby.table_id))
+                    lobby.published = None
+                    lobby.publish_state()
+                sink.publish_queue.flush()
+            index = position[0]
+            position[0] += 1
+            for lobby, moves in lobbies:
+                seat, move, args = moves[index]
+                game = lobby.game.game
+                before, game.state = game.state, game.state.apply(move, *args)
+                lobby.publish_state(seat, move, args, before)
+            sink.publish_queue.flush()
+        return step, 1
+
+
+for _tables in (1, 64):
+    _publish_state(_tables)
+
+
+def measure(setup, min_time=0.2, repeat=5):
+    """Return the best seconds per operation over repeat timed runs.
+
+    Each run makes enough calls to take at least min_time.
+    """
+    function, operations = setup()
+    calls = 1
+    while True:
+        start = time.perf_counter()
+        for _ in range(calls):
+            function()
+        elapsed = time.perf_counter() - start
+        if elapsed >= min_time / 10:
+            break
+        calls *= 2
+    calls = max(1, int(calls * min_time / elapsed))
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for _ in range(calls):
+            function()
+        elapsed = time.perf_counter() - start
+        if best is None or elapsed < best:
+            best = elapsed
+    return best / (calls * operations)
+
+
+def run(names=None, min_time=0.2, repeat=5):
+    """Return a dict mapping each benchmark run to its seconds per operation.
+
+    Benchmarks whose optional dependencies are missing are left out.
+    """
+    results = {}
+    for name in names or sorted(BENCHMARKS):
+        try:
+            results[name] = measure(BENCHMARKS[name], min_time, repeat)
+        except ImportError:
+            continue
+    return results
+
+
+def load_baseline(path=BASELINE):
+    """Return the stored baselines, or an empty dict if there are none."""
+    try:
+        with open(path) as baseline:
+            return json.load(baseline)
+    except FileNotFoundError:
+        return {}
+
+
+def save_baseline(results, path=BASELINE):
+    with open(path, 'w') as baseline:
+        json.dump(results, baseline, indent=2, sort_keys=True)
+        baseline.write('\n')
+
+
+def regressions(results, baseline, tolerance=0.25):
+    """Return the names of benchmarks more than tolerance slower than baseline.
+    """
+    return [name for name, seconds in sorted(results.items())
+            if name in baseline and
+            seconds > baseline[name] * (1 + tolerance)]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the engine.")
+    parser.add_argument('names', nargs='*',
+                        help="benchmarks to run (default: all)")
+    parser.add_argument('--baseline', default=BASELINE)
+    parser.add_argument('--save', action='store_true',
+                        help="store the results as the new baselines")
+    parser.add_argument('--tolerance', type=float, default=0.25,
+                        help="allowed slowdown, as a fraction of baseline")
+    parser.add_argument('--min-time', type=float, default=0.2)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args(argv)
+    unknown = [name for name in args.names if name not in BENCHMARKS]
+    if unknown:
+        parser.error("no such benchmark: {}".format(', '.join(unknown)))
+    results = run(args.names, args.min_time, args.repeat)
+    baseline = load_baseline(args.baseline)
+    for name, seconds in sorted(results.items()):
+        line = "{:<26} {:>12.2f}us".format(name, seconds * 1e6)
+        if name in baseline:
+            line += " {:+7.1%}".format(seconds / baseline[name] - 1)
+        print(line)
+    if args.save:
+        baseline.update(results)
+        save_baseline(baseline, args.baseline)
+        return 0
+    slower = regressions(results, baseline, args.tolerance)
+    if slower:
+        print("Slower than baseline: {}".format(', '.join(slower)))
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
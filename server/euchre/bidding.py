@@ -0,0 +1,236 @@
+"""Precomputed bidding decisions.
+
+For every hand a bidder can hold, every upcard and every seat relative to
+the dealer, the table holds the points the bidder's team expects from each
+call: ordering up, going alone or passing in the first round, and naming
+each other suit, alone or not, in the second. Expected points are estimated
+offline by dealing the unseen cards at random and solving each deal double
+dummy. After a first-round pass the bidding is played out on the same deal
+by pass_value. Passing in the second round counts as 0, as in bot.evaluate.
+
+Keys are stored in canonical form with the upcard's suit as trump (see the
+canonical module), so the upcard is always a club and each key is numbered
+by the dense index of its hand. The table is a .npy file with one row per
+key, opened as a memmap; looking up a bid is a constant amount of work.
+
+Build a table with::
+
+    $ python -m euchre.bidding bidding.npy --samples 20 --workers 8
+
+There are about 400,000 canonical keys and each sample of one takes some
+65ms, so a full table at 20 samples is a job of about 145 CPU hours; use
+--up-rank to build it in parts.
+"""
+import argparse
+import random
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from .bot import evaluate
+from .canonical import hand_index
+from .compact import (CARD_INDEX, CARDS, FULL_MASK, SUITS, card_rank,
+                      card_suit, indices)
+from .game import BidPhase, BidPhaseOne, BidPhaseTwo
+from .numeric import np, require_numpy
+
+HAND_SIZE = 5
+SEATS = 4
+RANKS = 6
+
+# Columns of the table. In canonical suits the upcard is a club, so the
+# second round names spades (next), diamonds or hearts, from column
+# SECOND_ROUND on.
+ORDER, ORDER_ALONE, PASS = 0, 1, 2
+SECOND_ROUND = 3
+SECOND_ROUND_SUITS = (3, 1, 2)
+COLUMNS = SECOND_ROUND + 2 * len(SECOND_ROUND_SUITS)
+
+
+def table_size():
+    """Return the number of rows in a full table."""
+    return len(hand_index(HAND_SIZE)) * RANKS * SEATS
+
+
+def key_index(hand, up_rank, seat):
+    """Return the table row of a canonical hand, upcard rank and seat."""
+    hand_number = hand_index(HAND_SIZE).indices[hand]
+    return (hand_number * RANKS + up_rank) * SEATS + seat
+
+
+def canonical_key(hand, up_card, seat):
+    """Return the table row and suit permutation for a bidder.
+
+    hand is a mask, up_card a card index and seat the bidder's seat counted
+    left from the dealer (0 is the dealer).
+    """
+    hand_number, permutation = hand_index(HAND_SIZE).index(
+        hand, card_suit(up_card))
+    row = (hand_number * RANKS + card_rank(up_card)) * SEATS + seat
+    return row, permutation
+
+
+def canonical_keys(up_ranks=range(RANKS), seats=range(SEATS)):
+    """Yield every canonical (hand, up_rank, seat) a bidder can hold."""
+    for up_rank in up_ranks:
+        for hand in hand_index(HAND_SIZE).hands:
+            if hand >> up_rank & 1:
+                continue
+            for seat in seats:
+                yield hand, up_rank, seat
+
+
+def pass_value(state, team):
+    """Return the points team expects if the bidder in state passes.
+
+    The bidding goes on double dummy: each bidder in turn, the passer
+    included in the second round, makes its best call if that is worth
+    more than nothing to its team, and the dealer makes its best call if
+    everyone else passes in the second round.
+    """
+    state = state.apply('pass_bid')
+    while isinstance(state, BidPhase):
+        side = state.turn % 2
+        moves = state.legal_moves()
+        values = {(move, args): evaluate(state, side, move, args)
+                  for move, args in moves if move != 'pass_bid'}
+        best = max(values, key=values.get)
+        if values[best] > 0 or ('pass_bid', ()) not in moves:
+            return values[best] if side == team else -values[best]
+        state = state.apply('pass_bid')
+    return 0
+
+
+def estimate(hand, up_rank, seat, samples, seed):
+    """Return the table row of expected points for one canonical key."""
+    rng = random.Random(seed)
+    up_card = CARDS[up_rank]
+    bidder = seat
+    team = bidder % 2
+    unseen = list(indices(FULL_MASK & ~hand & ~(1 << up_rank)))
+    mine = [CARDS[index] for index in indices(hand)]
+    totals = [0.0] * COLUMNS
+    for _ in range(samples):
+        rng.shuffle(unseen)
+        hands, start = [], 0
+        for player in range(4):
+            if player == bidder:
+                hands.append(list(mine))
+            else:
+                hands.append([CARDS[index]
+                              for index in unseen[start:start + HAND_SIZE]])
+                start += HAND_SIZE
+        first = BidPhaseOne([0, 0], hands, 0, bidder, up_card)
+        totals[ORDER] += evaluate(first, team, 'call_one', (False,))
+        totals[ORDER_ALONE] += evaluate(first, team, 'call_one', (True,))
+        totals[PASS] += pass_value(first, team)
+        second = BidPhaseTwo([0, 0], hands, 0, bidder, up_card)
+        for column, suit in enumerate(SECOND_ROUND_SUITS):
+            for alone in (False, True):
+                totals[SECOND_ROUND + 2 * column + alone] += evaluate(
+                    second, team, 'call_two', (alone, SUITS[suit]))
+    return [total / samples for total in totals]
+
+
+def _estimate_batch(keys, samples, seed):
+    rows = []
+    for key in keys:
+        index = key_index(*key)
+        rows.append((index, estimate(*key, samples, seed ^ index)))
+    return rows
+
+
+def build_table(path, samples=20, workers=None, seed=0, batch_size=256,
+                keys=None):
+    """Estimate every key (or just keys) into the table at path.
+
+    The table is created if need be, filled with NaN for keys not yet
+    estimated, so a build can be resumed or spread over several runs.
+    """
+    require_numpy('bidding tables')
+    try:
+        table = np.load(path, mmap_mode='r+')
+    except FileNotFoundError:
+        table = np.lib.format.open_memmap(path, mode='w+', dtype=np.float16,
+                                          shape=(table_size(), COLUMNS))
+        table[:] = np.nan
+    if keys is None:
+        keys = canonical_keys()
+    keys = [key for key in keys if np.isnan(table[key_index(*key), 0])]
+    batches = [keys[start:start + batch_size]
+               for start in range(0, len(keys), batch_size)]
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = [executor.submit(_estimate_batch, batch, samples, seed)
+                   for batch in batches]
+        for future in as_completed(futures):
+            for index, row in future.result():
+                table[index] = row
+            table.flush()
+    return table
+
+
+class BiddingTable:
+    """Answers bidding questions from a table made by build_table."""
+    def __init__(self, path):
+        require_numpy('bidding tables')
+        self.table = np.load(path, mmap_mode='r')
+
+    def values(self, state):
+        """Return a dict mapping each call in state to its expected points.
+
+        Keys are (move, args) pairs as in Phase.legal_moves. The dict is
+        empty if the table has no estimate for the bidder's hand.
+        """
+        up_card = CARD_INDEX[state.up_card]
+        hand = 0
+        for card in state.current_hand:
+            hand |= 1 << CARD_INDEX[card]
+        seat = (state.turn - state.dealer) % 4
+        index, permutation = canonical_key(hand, up_card, seat)
+        row = self.table[index]
+        if np.isnan(row[0]):
+            return {}
+        if isinstance(state, BidPhaseOne):
+            return {('call_one', (False,)): float(row[ORDER]),
+                    ('call_one', (True,)): float(row[ORDER_ALONE]),
+                    ('pass_bid', ()): float(row[PASS])}
+        values = {}
+        for column, canonical_suit in enumerate(SECOND_ROUND_SUITS):
+            suit = SUITS[permutation.index(canonical_suit)]
+            for alone in (False, True):
+                values[('call_two', (alone, suit))] = float(
+                    row[SECOND_ROUND + 2 * column + alone])
+        return values
+
+    def best_bid(self, state, threshold=0.0):
+        """Return the best (move, args) for the bidder, or None if unknown.
+
+        The bidder passes unless a call is worth more than passing by
+        threshold, or they are the dealer in the second round and may not
+        pass. Passing in the second round is taken to be worth 0.
+        """
+        values = self.values(state)
+        if not values:
+            return None
+        passing = values.pop(('pass_bid', ()), 0.0)
+        move = max(values, key=values.get)
+        forced = isinstance(state, BidPhaseTwo) and state.turn == state.dealer
+        if values[move] > passing + threshold or forced:
+            return move
+        return ('pass_bid', ())
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Build a bidding table.")
+    parser.add_argument('path')
+    parser.add_argument('--samples', type=int, default=20)
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--up-rank', type=int, nargs='+',
+                        default=list(range(RANKS)),
+                        help="only estimate these upcard ranks (0 is nine)")
+    args = parser.parse_args(argv)
+    build_table(args.path, args.samples, args.workers, args.seed,
+                keys=canonical_keys(args.up_rank))
+
+
+if __name__ == '__main__':
+    main()
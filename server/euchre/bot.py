@@ -0,0 +1,300 @@
+"""Information-set Monte Carlo bot.
+
+The bot keeps track of what its seat has seen during a hand: cards played,
+suits other players have shown out of, the upcard and its own discard. To
+choose a move it repeatedly deals the unseen cards to the other seats in a
+way consistent with that knowledge, scores every legal move in each such
+world with the double-dummy solver, and plays the move with the best average
+score. Sampling stops after a fixed number of worlds or when the time budget
+runs out, whichever comes first, and may be spread across worker processes.
+No world is started after the deadline; if none was evaluated in time, the
+bot falls back to default_move.
+"""
+import random
+import time
+from concurrent.futures import wait
+
+from .compact import (CARD_INDEX, CARDS, FULL_MASK, RELATIVE_SUIT,
+                      SUIT_INDEX, SUIT_MASKS, TRICK_RANK, count, hand_mask,
+                      indices)
+from .game import BidPhase, BidPhaseOne, DiscardPhase, PlayCardsPhase
+from .solver import solve
+
+
+def hand_points(phase, team, tricks):
+    """Return the points team scores if it takes tricks in the hand.
+
+    Points the other team scores count against team.
+    """
+    maker_team = phase.maker % 2
+    maker_tricks = tricks if team == maker_team else 5 - tricks
+    if maker_tricks == 5:
+        points = 4 if phase.sitting is not None else 2
+    elif maker_tricks >= 3:
+        points = 1
+    else:
+        points = -2
+    return points if team == maker_team else -points
+
+
+def team_points(phase, team):
+    """Return the points team scores from a PlayCardsPhase with best play."""
+    # solve() counts tricks for the side to move, who takes the best line.
+    tricks = max(solve(phase).values())
+    if phase.turn % 2 != team:
+        tricks = 5 - tricks
+    return hand_points(phase, team, tricks)
+
+
+def default_discard(phase):
+    """Return the dealer's least useful card: the lowest off-suit card."""
+    trump = SUIT_INDEX[phase.trump]
+    ranks = TRICK_RANK[trump][trump]
+
+    def key(card):
+        index = CARD_INDEX[card]
+        return (ranks[index], index % 6)
+
+    return min(phase.current_hand, key=key)
+
+
+def default_move(state, candidates):
+    """Return a move that costs nothing to choose: pass if possible,
+    discard the least useful card, or else the first legal move.
+    """
+    if ('pass_bid', ()) in candidates:
+        return ('pass_bid', ())
+    if isinstance(state, DiscardPhase):
+        return ('discard', (default_discard(state),))
+    return candidates[0]
+
+
+class Knowledge:
+    """What one seat has seen of the current hand.
+
+    Once another dealer has picked up the upcard and discarded unseen, the
+    upcard is only likely to be in their hand: sample() deals it to them
+    with probability keep_upcard and otherwise leaves it buried.
+    """
+    __slots__ = ('seat', 'hand', 'out', 'void', 'holds', 'upcard')
+
+    # Dealers rarely discard the upcard, which is trump once ordered up.
+    keep_upcard = 0.95
+
+    def __init__(self, seat, hand=None):
+        self.seat = seat
+        self.hand = hand
+        self.out = 0
+        self.void = [0, 0, 0, 0]
+        self.holds = [0, 0, 0, 0]
+        self.upcard = 0
+
+    def new_hand(self, state):
+        """Forget the previous hand if state belongs to a new one."""
+        if isinstance(state, BidPhase):
+            hand = (state.dealer, state.up_card)
+            if hand != self.hand:
+                self.__init__(self.seat, hand)
+
+    def observe(self, state, move, args):
+        """Update from move, made by the player to move in state."""
+        player = state.turn
+        self.new_hand(state)
+        if move == 'call_one':
+            if state.dealer != self.seat:
+                self.holds[state.dealer] |= 1 << CARD_INDEX[state.up_card]
+        elif move == 'pass_bid' and isinstance(state, BidPhaseOne):
+            if player == state.dealer:
+                self.out |= 1 << CARD_INDEX[state.up_card]
+        elif move == 'discard' and player == self.seat:
+            self.out |= 1 << CARD_INDEX[args[0]]
+        elif move == 'discard' and self.hand is not None:
+            self.upcard = self.holds[player] & (1 << CARD_INDEX[self.hand[1]])
+            self.holds[player] &= ~self.upcard
+        elif move == 'play':
+            bit = 1 << CARD_INDEX[args[0]]
+            self.out |= bit
+            self.holds[player] &= ~bit
+            self.upcard &= ~bit
+            trick = state.trick
+            if len(trick):
+                trump = SUIT_INDEX[state.trump]
+                led_suit = RELATIVE_SUIT[trump][CARD_INDEX[trick.led()]]
+                if not SUIT_MASKS[trump][led_suit] & bit:
+                    self.void[player] |= SUIT_MASKS[trump][led_suit]
+
+    def sample(self, state, rng, attempts=50):
+        """Return a copy of state with the hidden hands filled in at random.
+
+        Hidden cards are dealt so that every seat keeps its hand size, holds
+        the cards it is known to hold and gets no card of a suit it has shown
+        out of. If no such deal turns up, void inferences are dropped.
+        """
+        own = hand_mask(state.hands[self.seat])
+        unknown = FULL_MASK & ~own & ~self.out
+        for holds in self.holds:
+            unknown &= ~holds
+        if isinstance(state, BidPhase):
+            unknown &= ~(1 << CARD_INDEX[state.up_card])
+        if isinstance(state, PlayCardsPhase):
+            unknown &= ~hand_mask(state.trick.cards.values())
+        others = [player for player in range(4) if player != self.seat]
+        holds = list(self.holds)
+        if self.upcard:
+            unknown &= ~self.upcard
+            dealer = self.hand[0]
+            if (not self.void[dealer] & self.upcard and
+                    rng.random() < self.keep_upcard):
+                holds[dealer] |= self.upcard
+        needs = {player: len(state.hands[player]) - count(holds[player])
+                 for player in others}
+
+        for attempt in range(attempts + 1):
+            void = self.void if attempt < attempts else [0, 0, 0, 0]
+            hands = self._deal(unknown, others, needs, void, rng)
+            if hands is not None:
+                break
+        return state.replace(hands=[
+            list(state.hands[player]) if player == self.seat
+            else [CARDS[i] for i in indices(hands[player] | holds[player])]
+            for player in range(4)])
+
+    @staticmethod
+    def _deal(unknown, others, needs, void, rng):
+        remaining = unknown
+        hands = {}
+        # Deal to the most constrained seats first.
+        order = sorted(others, key=lambda p: count(unknown & ~void[p]))
+        for player in order:
+            allowed = list(indices(remaining & ~void[player]))
+            if len(allowed) < needs[player]:
+                return None
+            chosen = rng.sample(allowed, needs[player])
+            hands[player] = sum(1 << index for index in chosen)
+            remaining &= ~hands[player]
+        return hands
+
+
+def evaluate(state, team, move, args, discard=default_discard):
+    """Return the points team expects from move in a full-information world.
+
+    Bidding moves that leave the bidding open are worth 0.
+    """
+    next_state = state.apply(move, *args)
+    if isinstance(next_state, DiscardPhase):
+        next_state = next_state.discard(discard(next_state))
+    if isinstance(next_state, PlayCardsPhase):
+        return team_points(next_state, team)
+    return 0
+
+
+def _run_samples(knowledge, state, candidates, samples, deadline, seed,
+                 equity=None):
+    """Score candidates over sampled worlds; return totals and sample count.
+
+    Candidates score the points they win, or with equity, an
+    equity.MatchEquity, the chance of winning the game they leave. A pass
+    leaves the hand to be played from the same score and deal.
+    """
+    rng = random.Random(seed)
+    team = knowledge.seat % 2
+
+    def value(points, move=None):
+        if equity is None:
+            return points
+        if move == 'pass_bid':
+            return equity.win_probability(state.score, state.dealer, team)
+        return equity.after_hand(state.score, state.dealer, team, points)
+
+    totals = [0] * len(candidates)
+    done = 0
+    while done < samples and time.time() < deadline:
+        world = knowledge.sample(state, rng)
+        if isinstance(world, PlayCardsPhase):
+            tricks = solve(world)
+            for i, (_, (card,)) in enumerate(candidates):
+                totals[i] += value(hand_points(world, team, tricks[card]))
+        else:
+            for i, (move, args) in enumerate(candidates):
+                totals[i] += value(evaluate(world, team, move, args), move)
+        done += 1
+    return totals, done
+
+
+class MonteCarloBot:
+    """A bot for one seat.
+
+    samples is the most worlds to evaluate per decision and time_budget the
+    most seconds to spend on one. If executor is given (a
+    concurrent.futures executor), samples are split into workers batches and
+    evaluated on it.
+
+    A bot can be used directly as a simulate policy; call observe() with
+    every move made at the table so it can track what has been played.
+
+    If bidding, a bidding.BiddingTable, is given, the bot bids from it
+    instead of sampling whenever it has an entry for the bot's hand. If
+    equity, an equity.MatchEquity, is given, the bot plays to win the game
+    rather than for points, so the score decides how much a loner or the
+    risk of being euchred is worth.
+    """
+    def __init__(self, seat, samples=20, time_budget=1.0, seed=None,
+                 executor=None, workers=1, bidding=None, equity=None):
+        self.seat = seat
+        self.samples = samples
+        self.time_budget = time_budget
+        self.rng = random.Random(seed)
+        self.executor = executor
+        self.workers = workers
+        self.knowledge = Knowledge(seat)
+        self.bidding = bidding
+        self.equity = equity
+
+    def __call__(self, state, rng=None):
+        return self.choose_move(state)
+
+    def observe(self, state, move, args):
+        self.knowledge.observe(state, move, args)
+
+    def choose_move(self, state, deadline=None):
+        """Return the (move, args) pair the bot plays in state.
+
+        deadline, a time.time() value, defaults to time_budget from now;
+        pass it in to count time spent waiting for a thread to run in.
+        """
+        self.knowledge.new_hand(state)
+        if self.bidding is not None and isinstance(state, BidPhase):
+            bid = self.bidding.best_bid(state)
+            if bid is not None:
+                return bid
+        candidates = state.legal_moves()
+        if len(candidates) == 1:
+            return candidates[0]
+        if deadline is None:
+            deadline = time.time() + self.time_budget
+        if self.executor is None:
+            totals, done = _run_samples(self.knowledge, state, candidates,
+                                        self.samples, deadline,
+                                        self.rng.getrandbits(64), self.equity)
+        else:
+            batch = -(-self.samples // self.workers)
+            futures = [
+                self.executor.submit(_run_samples, self.knowledge, state,
+                                     candidates, batch, deadline,
+                                     self.rng.getrandbits(64), self.equity)
+                for _ in range(self.workers)]
+            # Batches still queued or running at the deadline are abandoned.
+            finished, late = wait(futures, max(0, deadline - time.time()))
+            for future in late:
+                future.cancel()
+            totals = [0] * len(candidates)
+            done = 0
+            for future in finished:
+                batch_totals, batch_done = future.result()
+                done += batch_done
+                for i, total in enumerate(batch_totals):
+                    totals[i] += total
+        if not done:
+            return default_move(state, candidates)
+        best = max(range(len(candidates)), key=totals.__getitem__)
+        return candidates[best]
@@ -0,0 +1,131 @@
+"""Suit isomorphism.
+
+Renaming suits changes nothing about a deal so long as same-colored suits
+stay same-colored, since that is all the bowers depend on. There are eight
+such renamings. Once trump is fixed only two remain: trump and its partner
+are pinned and the other color's suits may swap.
+
+Canonical forms here put trump (when there is one) in clubs and its partner
+in spades, and otherwise pick the renaming that gives the smallest masks.
+Every function returns the permutation it used, a list mapping each suit to
+its canonical suit, so results computed on the canonical form can be mapped
+back.
+"""
+import itertools
+from functools import lru_cache
+
+from .compact import NUM_CARDS, SAME_COLOR, card_rank, card_suit
+
+SUIT_MASK = 63
+
+
+def _preserves_color(permutation):
+    return all(permutation[SAME_COLOR[suit]] == SAME_COLOR[permutation[suit]]
+               for suit in range(4))
+
+
+# Every renaming of suits that keeps same-colored suits together.
+PERMUTATIONS = tuple(list(permutation)
+                     for permutation in itertools.permutations(range(4))
+                     if _preserves_color(permutation))
+
+# TRUMP_PERMUTATIONS[trump] holds those that move trump to clubs.
+TRUMP_PERMUTATIONS = tuple(
+    tuple(permutation for permutation in PERMUTATIONS
+          if permutation[trump] == 0)
+    for trump in range(4))
+
+
+def permute_mask(mask, permutation):
+    """Return mask with every card of suit s moved to suit permutation[s]."""
+    result = 0
+    for suit in range(4):
+        result |= (mask >> 6 * suit & SUIT_MASK) << 6 * permutation[suit]
+    return result
+
+
+def permute_card(index, permutation):
+    """Return the card index that index becomes under permutation."""
+    return 6 * permutation[card_suit(index)] + card_rank(index)
+
+
+def inverse(permutation):
+    """Return the permutation that undoes permutation."""
+    result = [0] * 4
+    for suit, image in enumerate(permutation):
+        result[image] = suit
+    return result
+
+
+def _candidates(trump):
+    return PERMUTATIONS if trump is None else TRUMP_PERMUTATIONS[trump]
+
+
+def canonical_hand(hand, trump=None):
+    """Return (canonical mask, permutation) for a hand mask.
+
+    With trump given, the permutation moves trump to clubs.
+    """
+    return min((permute_mask(hand, permutation), permutation)
+               for permutation in _candidates(trump))
+
+
+def canonical_hands(hands, trump=None, cards=()):
+    """Return (canonical masks, canonical cards, permutation) for a position.
+
+    hands is a sequence of masks, compared in order, and cards a sequence of
+    single card indices (an upcard, or the cards of a trick) that are
+    renamed along with them.
+    """
+    best = None
+    for permutation in _candidates(trump):
+        candidate = (tuple(permute_mask(hand, permutation) for hand in hands),
+                     tuple(permute_card(card, permutation) for card in cards),
+                     permutation)
+        if best is None or candidate < best:
+            best = candidate
+    return best
+
+
+class HandIndex:
+    """A dense numbering of the canonical hands of one size.
+
+    With fixed_trump, hands are canonical with trump in clubs; otherwise
+    under all eight renamings.
+    """
+    def __init__(self, hand_size, fixed_trump=True):
+        trump = 0 if fixed_trump else None
+        self.trump = trump
+        self.hands = []
+        for combination in itertools.combinations(range(NUM_CARDS),
+                                                  hand_size):
+            hand = sum(1 << index for index in combination)
+            if canonical_hand(hand, trump)[0] == hand:
+                self.hands.append(hand)
+        self.indices = {hand: index for index, hand in enumerate(self.hands)}
+
+    def __len__(self):
+        return len(self.hands)
+
+    def index(self, hand, trump=None):
+        """Return (dense index, permutation) of any hand.
+
+        For an index with fixed trump, trump is the hand's actual trump.
+        """
+        if self.trump is not None:
+            if trump is None:
+                raise ValueError("This index needs a trump suit.")
+            hand, permutation = canonical_hand(hand, trump)
+        else:
+            hand, permutation = canonical_hand(hand)
+        return self.indices[hand], permutation
+
+    def hand(self, index):
+        """Return the canonical hand numbered index."""
+        return self.hands[index]
+
+
+@lru_cache(maxsize=None)
+def hand_index(hand_size, fixed_trump=True):
+    """Return the shared HandIndex for hand_size, built on first use."""
+    return HandIndex(hand_size, fixed_trump)
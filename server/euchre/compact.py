@@ -0,0 +1,159 @@
+"""Compact card representation for the simulation engine.
+
+Each of the 24 cards is an index from 0 to 23, in the same order as
+``Deck.cards`` (suit-major, so ``index == 6 * suit + rank``). A hand is an int
+bitmask with bit ``i`` set when the hand holds card ``i``. Suits are the
+indices 0 to 3, in the order of the ``Suit`` enum.
+
+Conversion to and from ``Card`` objects and strings happens at the edges; the
+engine itself only ever handles ints.
+"""
+from .objects import Deck, Rank, Suit
+
+CARDS = tuple(Deck.cards)
+SUITS = tuple(Suit)
+RANKS = tuple(Rank)
+
+CARD_INDEX = {card: i for i, card in enumerate(CARDS)}
+CARD_STRS = tuple(str(card) for card in CARDS)
+STR_INDEX = {card_str: i for i, card_str in enumerate(CARD_STRS)}
+SUIT_INDEX = {suit: i for i, suit in enumerate(SUITS)}
+
+NUM_CARDS = len(CARDS)
+FULL_MASK = (1 << NUM_CARDS) - 1
+JACK = RANKS.index(Rank.jack)
+
+
+def _same_color(suit):
+    """Return the other suit of the same color as the given suit index."""
+    color = SUITS[suit].color
+    return next(other for other in range(4)
+                if other != suit and SUITS[other].color == color)
+
+
+SAME_COLOR = tuple(_same_color(suit) for suit in range(4))
+
+
+def card_suit(index):
+    """Return the printed suit of a card index."""
+    return index // 6
+
+
+def card_rank(index):
+    """Return the rank of a card index, from 0 (nine) to 5 (ace)."""
+    return index % 6
+
+
+def _relative_suit(index, trump):
+    if card_rank(index) == JACK and card_suit(index) == SAME_COLOR[trump]:
+        return trump
+    return card_suit(index)
+
+
+# RELATIVE_SUIT[trump][card] is the suit a card counts as, given trump.
+RELATIVE_SUIT = tuple(
+    tuple(_relative_suit(index, trump) for index in range(NUM_CARDS))
+    for trump in range(4))
+
+# SUIT_MASKS[trump][suit] holds every card that counts as suit, given trump.
+SUIT_MASKS = tuple(
+    tuple(sum(1 << index for index in range(NUM_CARDS)
+              if RELATIVE_SUIT[trump][index] == suit)
+          for suit in range(4))
+    for trump in range(4))
+
+
+def _trick_rank(index, trump, led_suit):
+    suit = RELATIVE_SUIT[trump][index]
+    if suit == trump:
+        if card_rank(index) == JACK:
+            return 21 if card_suit(index) == trump else 20
+        return 10 + card_rank(index)
+    if suit == led_suit:
+        return 1 + card_rank(index)
+    return 0
+
+
+# TRICK_RANK[trump][led_suit][card] orders cards for winning a trick: trump
+# beats the led suit, which beats everything else (ranked 0).
+TRICK_RANK = tuple(
+    tuple(tuple(_trick_rank(index, trump, led_suit)
+                for index in range(NUM_CARDS))
+          for led_suit in range(4))
+    for trump in range(4))
+
+
+def card_index(card):
+    """Return the index of a Card."""
+    return CARD_INDEX[card]
+
+
+def index_card(index):
+    """Return the Card for an index."""
+    return CARDS[index]
+
+
+def str_index(card_str):
+    """Return the index of a card from its str() representation."""
+    return STR_INDEX[card_str]
+
+
+def suit_index(suit):
+    """Return the index of a Suit."""
+    return SUIT_INDEX[suit]
+
+
+def hand_mask(cards):
+    """Return the bitmask for an iterable of Cards."""
+    mask = 0
+    for card in cards:
+        mask |= 1 << CARD_INDEX[card]
+    return mask
+
+
+def indices(mask):
+    """Yield the card indices in a bitmask, lowest first."""
+    while mask:
+        low = mask & -mask
+        yield low.bit_length() - 1
+        mask ^= low
+
+
+def hand_cards(mask):
+    """Return the list of Cards in a bitmask, in deck order."""
+    return [CARDS[index] for index in indices(mask)]
+
+
+def count(mask):
+    """Return the number of cards in a bitmask."""
+    return bin(mask).count('1')
+
+
+def has_card(mask, index):
+    return bool(mask >> index & 1)
+
+
+def follow_mask(hand, trump, led):
+    """Return the cards in hand that follow the led card, given trump."""
+    return hand & SUIT_MASKS[trump][RELATIVE_SUIT[trump][led]]
+
+
+def legal_plays(hand, trump, led=None):
+    """Return the mask of cards that may legally be played from hand.
+
+    led is the index of the card that was led to the trick, or None if the
+    player is leading.
+    """
+    if led is None:
+        return hand
+    return follow_mask(hand, trump, led) or hand
+
+
+def winning_card(trump, led, played):
+    """Return the index of the card that wins a trick.
+
+    led is the index of the card that was led and played is an iterable of
+    every card index in the trick, including led.
+    """
+    ranks = TRICK_RANK[trump][RELATIVE_SUIT[trump][led]]
+    return max(played, key=ranks.__getitem__)
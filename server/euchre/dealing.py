@@ -0,0 +1,93 @@
+"""Seedable and batched dealing.
+
+A deal is a permutation of the 24 card indices from ``compact``: seat ``n``
+receives positions ``5n`` to ``5n + 4``, position 20 is the upcard and the
+last three positions stay in the kitty.
+
+Anything that returns a ``(hands, up_card)`` pair when called can be used as
+the deal source for ``initial_game_state`` and the phases in ``game``.
+"""
+import random
+
+from .compact import CARDS, NUM_CARDS
+from .numeric import np, require_numpy
+
+HAND_SIZE = 5
+UP_CARD = 4 * HAND_SIZE
+
+
+def deal_from_permutation(permutation):
+    """Return pair containing list of new hands and upcard."""
+    hands = [[CARDS[permutation[start + i]] for i in range(HAND_SIZE)]
+             for start in range(0, UP_CARD, HAND_SIZE)]
+    return (hands, CARDS[permutation[UP_CARD]])
+
+
+def deal(rng=random):
+    """Return pair containing list of new hands and upcard.
+
+    rng defaults to the module-level functions of random; pass a
+    random.Random for a reproducible deal.
+    """
+    permutation = list(range(NUM_CARDS))
+    rng.shuffle(permutation)
+    return deal_from_permutation(permutation)
+
+
+def deal_batch(count, seed=None):
+    """Return a (count, 24) uint8 array, each row a random deal.
+
+    seed may be anything accepted by numpy.random.default_rng, including an
+    existing Generator.
+    """
+    require_numpy('batch dealing')
+    rng = np.random.default_rng(seed)
+    deck = np.tile(np.arange(NUM_CARDS, dtype=np.uint8), (count, 1))
+    return rng.permuted(deck, axis=1)
+
+
+class Dealer:
+    """A reproducible deal source backed by its own random.Random.
+
+    deals counts the deals made so far, which together with seed pins down
+    every deal still to come.
+    """
+    def __init__(self, seed=None):
+        self.seed = seed
+        self.rng = random.Random(seed)
+        self.deals = 0
+
+    def __call__(self):
+        self.deals += 1
+        return deal(self.rng)
+
+    @classmethod
+    def resume(cls, seed, deals):
+        """Return a Dealer for seed that has already made deals deals."""
+        dealer = cls(seed)
+        for _ in range(deals):
+            dealer()
+        return dealer
+
+
+class BatchDealer:
+    """A reproducible deal source that deals batch_size hands at a time."""
+    def __init__(self, seed=None, batch_size=4096):
+        require_numpy('batch dealing')
+        self.seed = seed
+        self.rng = np.random.default_rng(seed)
+        self.batch_size = batch_size
+        self.batch = None
+        self.position = batch_size
+
+    def __call__(self):
+        return deal_from_permutation(self.next_permutation())
+
+    def next_permutation(self):
+        """Return the next deal as a sequence of card indices."""
+        if self.position == self.batch_size:
+            self.batch = deal_batch(self.batch_size, self.rng).tolist()
+            self.position = 0
+        permutation = self.batch[self.position]
+        self.position += 1
+        return permutation
@@ -1,9 +1,32 @@
-from functools import singledispatch
+"""Turn game objects into plain data for the wire.
 
-from .game import (BidPhaseOne, BidPhaseTwo, DiscardPhase, PlayCardsPhase,
-                   Phase, GameOver, Trick)
+Every Phase class gets one serializer, generated the first time it is needed,
+that reads each field straight off the phase and encodes it with a function
+picked for that field, so no per-value type dispatch happens on the hot path.
+Card and suit strings are interned once. to_serializable remains for
+arbitrary nested values; encode turns plain data into JSON or msgpack bytes.
+
+Besides the string form, states have a compact form for clients that
+negotiate it: cards are their compact index, suits their index, hands bit
+masks and phases small integer codes. Sent with a binary WAMP serializer,
+most values in it take a single byte.
+"""
+import json
+import sys
+from functools import lru_cache, singledispatch
+
+from .compact import (CARD_INDEX, CARDS, SUIT_INDEX, SUITS, hand_cards,
+                      hand_mask)
+from .exceptions import IllegalMoveException
+from .game import (BidPhaseOne, BidPhaseTwo, DiscardPhase, LiveGamePhase,
+                   PlayCardsPhase, Phase, GameOver, Trick)
 from .objects import Card, Suit
 
+try:
+    import msgpack
+except ImportError:  # pragma: no cover
+    msgpack = None
+
 
 PHASE_NAMES = {
     BidPhaseOne: 'bid1',
@@ -13,6 +36,240 @@ PHASE_NAMES = {
     GameOver: 'gameover',
 }
 
+PHASE_CODES = {cls: code for code, cls in enumerate(PHASE_NAMES)}
+
+# Ways to send game state: the original strings, and integer codes.
+PROTOCOLS = ('string', 'compact')
+
+# Phase attributes that are engine plumbing rather than game state.
+UNSERIALIZED = {'deal'}
+
+_MISSING = object()
+
+CARD_STR = {card: sys.intern(str(card)) for card in CARDS}
+STR_CARD = {card_str: card for card, card_str in CARD_STR.items()}
+SUIT_STR = {suit: sys.intern(str(suit)) for suit in Suit}
+
+
+@lru_cache(maxsize=None)
+def phase_fields(cls):
+    """Return the serialized attribute names of a Phase class."""
+    return [field for klass in reversed(cls.__mro__)
+            for field in getattr(klass, '__slots__', ())
+            if field not in UNSERIALIZED]
+
+
+def encode_card(card):
+    return CARD_STR[card]
+
+
+def encode_cards(cards):
+    return [CARD_STR[card] for card in cards]
+
+
+def encode_hands(hands):
+    return [[CARD_STR[card] for card in hand] for hand in hands]
+
+
+def encode_hand_sizes(hands):
+    return [len(hand) for hand in hands]
+
+
+def encode_suit(suit):
+    return SUIT_STR[suit]
+
+
+def encode_trick(trick):
+    return {player: CARD_STR[card] for player, card in trick.cards.items()}
+
+
+# Fields holding anything other than ints and None, by name.
+FIELD_ENCODERS = {
+    'hands': encode_hands,
+    'score': list,
+    'trick': encode_trick,
+    'trick_score': list,
+    'trump': encode_suit,
+    'up_card': encode_card,
+}
+
+# The same, for the view every player at the table may see.
+PUBLIC_FIELD_ENCODERS = dict(FIELD_ENCODERS, hands=encode_hand_sizes)
+
+
+def encode_trick_codes(trick):
+    return {player: CARD_INDEX[card] for player, card in trick.cards.items()}
+
+
+# The public view in compact form.
+COMPACT_FIELD_ENCODERS = dict(PUBLIC_FIELD_ENCODERS,
+                              trick=encode_trick_codes,
+                              trump=SUIT_INDEX.__getitem__,
+                              up_card=CARD_INDEX.__getitem__)
+
+# Field encoders and phase tags for each view of a phase.
+VIEWS = {
+    'full': (FIELD_ENCODERS, PHASE_NAMES),
+    'public': (PUBLIC_FIELD_ENCODERS, PHASE_NAMES),
+    'compact': (COMPACT_FIELD_ENCODERS, PHASE_CODES),
+}
+
+
+def encode_hand(hand, protocol='string'):
+    """Encode one seat's hand for protocol."""
+    if protocol == 'compact':
+        return hand_mask(hand)
+    return encode_cards(hand)
+
+
+def encode_args(args, protocol='string'):
+    """Encode the arguments of a move for protocol."""
+    if protocol == 'compact':
+        return [CARD_INDEX[arg] if isinstance(arg, Card) else
+                SUIT_INDEX[arg] if isinstance(arg, Suit) else arg
+                for arg in args]
+    return to_serializable(args)
+
+
+@lru_cache(maxsize=None)
+def phase_encoder(cls, view='full'):
+    """Return a function serializing phases of class cls in one dict display.
+
+    view is a key of VIEWS: 'full', 'public' with hands reduced to their
+    sizes, or 'compact', the public view in compact form.
+    """
+    encoders, tags = VIEWS[view]
+    namespace = {}
+    items = []
+    for field in phase_fields(cls):
+        if field in encoders:
+            namespace['_' + field] = encoders[field]
+            items.append('{f!r}: _{f}(state.{f})'.format(f=field))
+        else:
+            items.append('{f!r}: state.{f}'.format(f=field))
+    items.append('"phase": {!r}'.format(tags[cls]))
+    source = 'def encode(state):\n    return {{{}}}\n'.format(', '.join(items))
+    exec(source, namespace)
+    return namespace['encode']
+
+
+def public_field(state, field, view='public'):
+    """Serialize one field of state as every player may see it."""
+    encoder = VIEWS[view][0].get(field)
+    value = getattr(state, field)
+    return value if encoder is None else encoder(value)
+
+
+def public_state(state, view='public'):
+    """Return the serializable view of state with hands reduced to sizes."""
+    return phase_encoder(type(state), view)(state)
+
+
+def views(state, protocol='string'):
+    """Return the public view of state and a list of each seat's hand.
+
+    The hands list is empty once the game is over.
+    """
+    view = 'compact' if protocol == 'compact' else 'public'
+    public = phase_encoder(type(state), view)(state)
+    if not isinstance(state, LiveGamePhase):
+        return public, []
+    return public, [encode_hand(hand, protocol) for hand in state.hands]
+
+
+def state_patch(old, new, view='public'):
+    """Return a (changed, removed) pair taking public_state(old) to new's.
+
+    changed maps fields to their new public values and removed lists the
+    fields new lacks. Phases share every attribute a move leaves alone, so
+    unchanged fields are found by identity without serializing them.
+    """
+    fields = phase_fields(type(new))
+    changed = {field: public_field(new, field, view) for field in fields
+               if getattr(old, field, _MISSING) is not getattr(new, field)}
+    if type(old) is not type(new):
+        changed['phase'] = VIEWS[view][1][type(new)]
+    removed = [field for field in phase_fields(type(old))
+               if field not in fields]
+    return changed, removed
+
+
+def changed_hands(old, new):
+    """Return the seats whose hand differs between old and new."""
+    if not isinstance(new, LiveGamePhase):
+        return []
+    if not isinstance(old, LiveGamePhase):
+        return list(range(4))
+    return [seat for seat in range(4)
+            if old.hands[seat] is not new.hands[seat]]
+
+
+def move_event(old, seat, move, args, protocol='string'):
+    """Describe move, made by seat in old, for clients.
+
+    A play that completes a trick also names the trick's winner.
+    """
+    event = {'seat': seat, 'move': move,
+             'args': encode_args(args, protocol)}
+    if move == 'play' and isinstance(old, PlayCardsPhase):
+        trick = old.trick.with_card(seat, args[0])
+        if len(trick) == (3 if old.sitting is not None else 4):
+            event['trick_winner'] = old.trick_winner(trick)
+    return event
+
+
+def decode_card(value):
+    """Return the Card for a card string or compact index.
+
+    Anything else, bools included, raises IllegalMoveException.
+    """
+    if type(value) is int and 0 <= value < len(CARDS):
+        return CARDS[value]
+    try:
+        return STR_CARD[value]
+    except (KeyError, TypeError):
+        raise IllegalMoveException()
+
+
+def decode_suit(value):
+    """Return the Suit for a suit string or compact index.
+
+    Anything else, bools included, raises IllegalMoveException.
+    """
+    if type(value) is int and 0 <= value < len(SUITS):
+        return SUITS[value]
+    try:
+        return Card.suit_map[value]
+    except (KeyError, TypeError):
+        raise IllegalMoveException()
+
+
+def decode_hand(value):
+    """Return the list of Cards for a string or compact encoded hand."""
+    if isinstance(value, int):
+        return hand_cards(value)
+    return [STR_CARD[card] for card in value]
+
+
+def decode_args(move, args):
+    """Turn the wire form of a move's arguments into game objects."""
+    if move == 'call_two':
+        return (args[0], decode_suit(args[1]))
+    if move == 'discard' or move == 'play':
+        return (decode_card(args[0]),)
+    return tuple(args)
+
+
+def encode(data, format='json'):
+    """Return plain data as bytes in format, 'json' or 'msgpack'."""
+    if format == 'json':
+        return json.dumps(data, separators=(',', ':')).encode()
+    if format == 'msgpack':
+        if msgpack is None:
+            raise RuntimeError("msgpack is not installed.")
+        return msgpack.packb(data)
+    raise ValueError("Unknown format: {}".format(format))
+
 
 @singledispatch
 def to_serializable(val):
@@ -32,21 +289,19 @@ def _(val):
 
 @to_serializable.register(Phase)  # noqa: F811
 def _(val):
-    d = to_serializable(vars(val))
-    d['phase'] = PHASE_NAMES[type(val)]
-    return d
+    return phase_encoder(type(val))(val)
 
 
 @to_serializable.register(Suit)  # noqa: F811
 def _(val):
-    return str(val)
+    return SUIT_STR[val]
 
 
 @to_serializable.register(Trick)  # noqa: F811
 def _(val):
-    return to_serializable(val.cards)
+    return encode_trick(val)
 
 
 @to_serializable.register(Card)  # noqa: F811
 def _(val):
-    return str(val)
+    return CARD_STR[val]
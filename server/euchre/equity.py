@@ -0,0 +1,185 @@
+"""Match equity: the chance of winning the game from a given score.
+
+A game goes to GAME_POINTS and the deal passes to the left after every
+hand, so what happens from any score depends only on the score and which
+team deals. Given how often a hand dealt by one team ends with each split
+of points, the chance of winning from every score follows by dynamic
+programming from the end of the game back, since every hand scores.
+
+The split of points comes from hand histories: recorded games, or games
+simulated with some policies. Build and cache a table with::
+
+    $ python -m euchre.equity equity.json --games 10000
+
+or from hands recorded by the server::
+
+    $ python -m euchre.equity equity.json --history histories/shard0.hands
+"""
+import argparse
+import json
+import random
+from collections import Counter
+
+from .dealing import Dealer
+from .history import HandRecorder, read_history
+from .simulate import play_game, random_policy
+
+GAME_POINTS = 10
+
+# Where the dealer and points are in a hand record; see history.HAND_DTYPE.
+DEALER, POINTS = 3, 10
+
+
+def outcome_distribution(dealers, points):
+    """Return how often hands end with each split of points.
+
+    dealers and points are the dealer seat and the pair of points each team
+    scored of every hand. The result maps (points to the dealing team,
+    points to the other) to its probability.
+    """
+    counts = Counter()
+    for dealer, scored in zip(dealers, points):
+        team = int(dealer) % 2
+        counts[int(scored[team]), int(scored[1 - team])] += 1
+    hands = sum(counts.values())
+    return {split: count / hands for split, count in counts.items()}
+
+
+def simulate_outcomes(games, policies=None, seed=0):
+    """Play games and return the outcome_distribution of their hands."""
+    if policies is None:
+        policies = [random_policy] * 4
+    rng = random.Random(seed)
+    deal = Dealer(rng.getrandbits(64))
+    rows = []
+    for game in range(games):
+        play_game(policies, rng, deal, recorder=HandRecorder(game),
+                  rows=rows)
+    return outcome_distribution([row[DEALER] for row in rows],
+                                [row[POINTS] for row in rows])
+
+
+def equity_table(distribution):
+    """Return table[a][b][team] for every score short of the end.
+
+    That is team 0's chance of winning when it has a points, team 1 has b
+    and the dealer is on team.
+    """
+    table = [[[None, None] for _ in range(GAME_POINTS)]
+             for _ in range(GAME_POINTS)]
+
+    def value(a, b, team):
+        if a >= GAME_POINTS:
+            return 1.0
+        if b >= GAME_POINTS:
+            return 0.0
+        return table[a][b][team]
+
+    # Every hand scores, so later scores have larger totals.
+    for total in reversed(range(2 * GAME_POINTS - 1)):
+        for a in range(max(0, total - GAME_POINTS + 1),
+                       min(GAME_POINTS - 1, total) + 1):
+            b = total - a
+            for team in range(2):
+                chance = 0.0
+                for (dealing, other), probability in distribution.items():
+                    gains = (dealing, other) if team == 0 else (other, dealing)
+                    chance += probability * value(a + gains[0], b + gains[1],
+                                                  1 - team)
+                table[a][b][team] = chance
+    return table
+
+
+class MatchEquity:
+    """Answers match equity questions from an equity_table."""
+    def __init__(self, table, distribution=None):
+        self.table = table
+        self.distribution = distribution
+
+    @classmethod
+    def from_distribution(cls, distribution):
+        return cls(equity_table(distribution), distribution)
+
+    def win_probability(self, score, dealer, team=0):
+        """Return team's chance of winning from score with dealer to deal."""
+        a, b = score
+        if a >= GAME_POINTS or b >= GAME_POINTS:
+            chance = 1.0 if a >= GAME_POINTS else 0.0
+        else:
+            chance = self.table[a][b][dealer % 2]
+        return chance if team == 0 else 1.0 - chance
+
+    def after_hand(self, score, dealer, team, points):
+        """Return team's chance of winning once the hand dealer dealt ends.
+
+        points are those team scores on the hand, or minus those the other
+        team scores, as from bot.hand_points.
+        """
+        score = list(score)
+        if points >= 0:
+            score[team] += points
+        else:
+            score[1 - team] -= points
+        return self.win_probability(score, dealer + 1, team)
+
+    def save(self, path):
+        distribution = None
+        if self.distribution is not None:
+            distribution = [[dealing, other, probability]
+                            for (dealing, other), probability
+                            in sorted(self.distribution.items())]
+        with open(path, 'w') as cache:
+            json.dump({'table': self.table, 'distribution': distribution},
+                      cache)
+
+    @classmethod
+    def load(cls, path):
+        with open(path) as cache:
+            data = json.load(cache)
+        distribution = data['distribution']
+        if distribution is not None:
+            distribution = {(dealing, other): probability
+                            for dealing, other, probability in distribution}
+        return cls(data['table'], distribution)
+
+
+def cached_equity(path, games=10000, policies=None, seed=0):
+    """Return the MatchEquity cached at path, simulating games if need be.
+    """
+    try:
+        return MatchEquity.load(path)
+    except FileNotFoundError:
+        pass
+    equity = MatchEquity.from_distribution(
+        simulate_outcomes(games, policies, seed))
+    equity.save(path)
+    return equity
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Build a match equity table.")
+    parser.add_argument('path')
+    parser.add_argument('--games', type=int, default=10000,
+                        help="random games to simulate")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--history', nargs='+', default=None,
+                        help="take outcomes from these hand history files")
+    args = parser.parse_args(argv)
+    if args.history is None:
+        distribution = simulate_outcomes(args.games, seed=args.seed)
+    else:
+        dealers, points = [], []
+        for path in args.history:
+            records = read_history(path)
+            dealers.extend(records['dealer'])
+            points.extend(records['points'])
+        distribution = outcome_distribution(dealers, points)
+    equity = MatchEquity.from_distribution(distribution)
+    equity.save(args.path)
+    for (dealing, other), probability in sorted(distribution.items()):
+        print("dealers {} - {}: {:.3f}".format(dealing, other, probability))
+    print("Dealing at 0-0: {:.3f}".format(equity.win_probability([0, 0], 0)))
+
+
+if __name__ == '__main__':
+    main()
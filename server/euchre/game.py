@@ -1,22 +1,20 @@
 from operator import itemgetter
 
 from .exceptions import IllegalMoveException, OutOfTurnException
-from .objects import Card, Deck, Rank, Suit
+from .compact import (CARD_INDEX, RELATIVE_SUIT, SUIT_INDEX, SUIT_MASKS,
+                      SUITS, TRICK_RANK)
+from .dealing import deal
+from .objects import Card, Suit
 
 
-def deal():
-    """Return pair containing tuple of new hands and upcard."""
-    deck = Deck()
-    deck.shuffle()
-    hands = []
-    for i in range(4):
-        hands.append([deck.draw() for _ in range(5)])
-    return (hands, deck.draw())
+def initial_game_state(deal=deal):
+    """Return the first phase of a new game.
 
-
-def initial_game_state():
+    deal is called for every hand's (hands, up_card); see the dealing module
+    for seeded and batched deal sources.
+    """
     hands, up_card = deal()
-    return BidPhaseOne([0, 0], hands, 0, 1, up_card)
+    return BidPhaseOne([0, 0], hands, 0, 1, up_card, deal=deal)
 
 
 class Game:
@@ -34,33 +32,65 @@ class Game:
             raise RuntimeError("No such move")
         if player != self.state.turn:
             raise OutOfTurnException(player, self.state.turn)
-        try:
-            self.state = self.state.__getattribute__(move)(*args, **kwargs)
-            return self.state
-        except AttributeError:
-            raise IllegalMoveException("Wrong phase for that move")
+        self.state = self.state.apply(move, *args, **kwargs)
+        return self.state
 
 
 class Phase:
     """Base class for all game phases.
 
-    Concrete subclasses implement a state machine.
+    Concrete subclasses implement a state machine. Phases are never modified
+    once built: each move returns a new phase that shares whatever did not
+    change (including the lists inside hands) with the old one, so lookahead
+    and rollback only need to keep a reference to an earlier phase.
     """
-    pass
+    __slots__ = ()
+
+    def apply(self, move, *args, **kwargs):
+        """Return the phase that results from move."""
+        try:
+            method = getattr(self, move)
+        except AttributeError:
+            raise IllegalMoveException("Wrong phase for that move")
+        return method(*args, **kwargs)
+
+    def legal_moves(self):
+        """Return a list of every legal (move, args) pair."""
+        return []
+
+    def replace(self, **fields):
+        """Return a new phase like this one, but with fields changed."""
+        cls = type(self)
+        slots = [slot for klass in cls.__mro__
+                 for slot in getattr(klass, '__slots__', ())]
+        unknown = set(fields) - set(slots)
+        if unknown:
+            raise TypeError("No such fields: {}".format(
+                ', '.join(sorted(unknown))))
+        phase = cls.__new__(cls)
+        for slot in slots:
+            setattr(phase, slot, fields.get(slot, getattr(self, slot)))
+        return phase
 
 
 class GameOver(Phase):
-    def __init__(self, winning_team):
+    __slots__ = ('winning_team', 'score')
+
+    def __init__(self, winning_team, score=None):
         self.winning_team = winning_team
+        self.score = score
 
 
 class LiveGamePhase(Phase):
     """Base class for all phases until game ends."""
-    def __init__(self, score, hands, dealer, turn):
+    __slots__ = ('score', 'hands', 'dealer', 'turn', 'deal')
+
+    def __init__(self, score, hands, dealer, turn, deal=deal):
         self.score = score
         self.hands = hands
         self.dealer = dealer
         self.turn = turn
+        self.deal = deal
 
     @property
     def across(self):
@@ -70,6 +100,18 @@ class LiveGamePhase(Phase):
     def card_in_hand(self, card):
         return card in self.current_hand
 
+    def hands_with(self, player, hand):
+        """Return hands with player's hand replaced, sharing the others."""
+        hands = list(self.hands)
+        hands[player] = hand
+        return hands
+
+    def hands_without(self, player, card):
+        """Return hands with card removed from player's hand."""
+        hand = list(self.hands[player])
+        hand.remove(card)
+        return self.hands_with(player, hand)
+
     @property
     def current_hand(self):
         """The hand of the player whose turn it is."""
@@ -87,49 +129,69 @@ class LiveGamePhase(Phase):
 
 class BidPhase(LiveGamePhase):
     """Base class for bidding phases."""
-    def __init__(self, score, hands, dealer, turn, up_card):
-        super().__init__(score, hands, dealer, turn)
+    __slots__ = ('up_card',)
+
+    def __init__(self, score, hands, dealer, turn, up_card, deal=deal):
+        super().__init__(score, hands, dealer, turn, deal)
         self.up_card = up_card
 
 
 class BidPhaseOne(BidPhase):
     """First bid phase, before the upcard is turned down."""
+    __slots__ = ()
+
     def __str__(self):
         return "bid1"
 
+    def legal_moves(self):
+        return [('pass_bid', ()), ('call_one', (False,)),
+                ('call_one', (True,))]
+
     def call_one(self, alone):
         """Order the dealer to pick up the upcard."""
         if not isinstance(alone, bool):
             raise TypeError()
 
-        self.hands[self.dealer].append(self.up_card)
+        hands = self.hands_with(self.dealer,
+                                self.hands[self.dealer] + [self.up_card])
         if alone:
             if self.across == self.dealer:
-                return PlayCardsPhase(self.score, self.hands, self.dealer,
+                return PlayCardsPhase(self.score, hands, self.dealer,
                                       self.left, self.turn, self.across,
-                                      self.up_card.suit, Trick(self.dealer),
-                                      [0, 0])
+                                      self.up_card.suit, Trick(self.left),
+                                      [0, 0], deal=self.deal)
             else:
-                return DiscardPhase(self.score, self.hands, self.dealer,
-                                    self.turn, self.across, self.up_card.suit)
+                return DiscardPhase(self.score, hands, self.dealer,
+                                    self.turn, self.across, self.up_card.suit,
+                                    deal=self.deal)
         else:
-            return DiscardPhase(self.score, self.hands, self.dealer, self.turn,
-                                None, self.up_card.suit)
+            return DiscardPhase(self.score, hands, self.dealer, self.turn,
+                                None, self.up_card.suit, deal=self.deal)
 
     def pass_bid(self):
         """Pass the bid to the next player."""
         if self.turn == self.dealer:
             return BidPhaseTwo(self.score, self.hands, self.dealer, self.left,
-                               self.up_card)
+                               self.up_card, deal=self.deal)
         else:
             return BidPhaseOne(self.score, self.hands, self.dealer, self.left,
-                               self.up_card)
+                               self.up_card, deal=self.deal)
 
 
 class BidPhaseTwo(BidPhase):
+    __slots__ = ()
+
     def __str__(self):
         return "bid2"
 
+    def legal_moves(self):
+        moves = [('call_two', (alone, suit))
+                 for suit in Suit if suit != self.up_card.suit
+                 for alone in (False, True)]
+        if self.turn != self.dealer:
+            moves.append(('pass_bid', ()))
+        return moves
+
     def call_two(self, alone, trump):
         """Name trump."""
         if not isinstance(alone, bool):
@@ -141,13 +203,14 @@ class BidPhaseTwo(BidPhase):
             raise IllegalMoveException()
         if alone:
             return PlayCardsPhase(self.score, self.hands, self.dealer,
-                                  self.left, self.across, self.turn, trump,
-                                  Trick(self.left), [0, 0])
+                                  self.left, self.turn, self.across, trump,
+                                  Trick(self.left), [0, 0], deal=self.deal)
         else:
             next_turn = self.left_of(self.dealer)
             return PlayCardsPhase(self.score, self.hands, self.dealer,
                                   next_turn, self.turn, None,
-                                  trump, Trick(next_turn), [0, 0])
+                                  trump, Trick(next_turn), [0, 0],
+                                  deal=self.deal)
 
     def pass_bid(self):
         """Pass the bid to the next player."""
@@ -155,13 +218,16 @@ class BidPhaseTwo(BidPhase):
             raise IllegalMoveException()
         else:
             return BidPhaseTwo(self.score, self.hands, self.dealer, self.left,
-                               self.up_card)
+                               self.up_card, deal=self.deal)
 
 
 class TrumpMadePhase(LiveGamePhase):
     """Base class for phases that have a trump suit made."""
-    def __init__(self, score, hands, dealer, turn, maker, sitting, trump):
-        super().__init__(score, hands, dealer, turn)
+    __slots__ = ('maker', 'sitting', 'trump')
+
+    def __init__(self, score, hands, dealer, turn, maker, sitting, trump,
+                 deal=deal):
+        super().__init__(score, hands, dealer, turn, deal)
         self.maker = maker
         self.sitting = sitting
         self.trump = trump
@@ -169,29 +235,39 @@ class TrumpMadePhase(LiveGamePhase):
 
 class DiscardPhase(TrumpMadePhase):
     """Short phase where the dealer discards a card."""
-    def __init__(self, score, hands, dealer, maker, sitting, trump):
-        super().__init__(score, hands, dealer, dealer, maker, sitting, trump)
+    __slots__ = ()
+
+    def __init__(self, score, hands, dealer, maker, sitting, trump,
+                 deal=deal):
+        super().__init__(score, hands, dealer, dealer, maker, sitting, trump,
+                         deal)
+
+    def legal_moves(self):
+        return [('discard', (card,)) for card in self.current_hand]
 
     def discard(self, card):
         """Discard a card."""
         if not self.card_in_hand(card):
             raise IllegalMoveException()
 
-        self.hands[self.dealer].remove(card)
+        hands = self.hands_without(self.dealer, card)
         if self.sitting is None:
             next_player = self.left
         else:
             next_player = self.left_of(self.maker)
-        return PlayCardsPhase(self.score, self.hands, self.dealer, next_player,
+        return PlayCardsPhase(self.score, hands, self.dealer, next_player,
                               self.maker, self.sitting, self.trump,
-                              Trick(next_player), [0, 0])
+                              Trick(next_player), [0, 0], deal=self.deal)
 
 
 class PlayCardsPhase(TrumpMadePhase):
     """The main phase of play."""
+    __slots__ = ('trick', 'trick_score')
+
     def __init__(self, score, hands, dealer, turn, maker, sitting, trump,
-                 trick, trick_score):
-        super().__init__(score, hands, dealer, turn, maker, sitting, trump)
+                 trick, trick_score, deal=deal):
+        super().__init__(score, hands, dealer, turn, maker, sitting, trump,
+                         deal)
         self.trick = trick
         self.trick_score = trick_score
 
@@ -199,6 +275,18 @@ class PlayCardsPhase(TrumpMadePhase):
         """Return true if the player has no card in the led suit."""
         return not any(self.following_suit(card) for card in self.current_hand)
 
+    def legal_cards(self):
+        """Return the cards in the player's hand they may play."""
+        hand = self.current_hand
+        if len(self.trick) == 0:
+            return list(hand)
+        mask = self.led_suit_mask()
+        following = [card for card in hand if mask >> CARD_INDEX[card] & 1]
+        return following or list(hand)
+
+    def legal_moves(self):
+        return [('play', (card,)) for card in self.legal_cards()]
+
     def check_legal_move(self, card):
         """Check that the player has card and follows suit if possible."""
         if not self.card_in_hand(card):
@@ -213,10 +301,25 @@ class PlayCardsPhase(TrumpMadePhase):
         """
         if len(self.trick) == 0:
             return True
-        return self.relative_suit(card) == self.led_suit()
+        return bool(self.led_suit_mask() >> CARD_INDEX[card] & 1)
 
     def led_suit(self):
-        return self.relative_suit(self.trick.led())
+        return SUITS[self.led_suit_index()]
+
+    def led_suit_index(self):
+        trump = SUIT_INDEX[self.trump]
+        return RELATIVE_SUIT[trump][CARD_INDEX[self.trick.led()]]
+
+    def led_suit_mask(self):
+        """Return the mask of cards that follow the led suit.
+
+        Trump is fixed for the whole hand, so play works the mask out once,
+        when the trick is led, and keeps it on the trick for every later seat.
+        """
+        mask = self.trick.led_mask
+        if mask is None:
+            mask = SUIT_MASKS[SUIT_INDEX[self.trump]][self.led_suit_index()]
+        return mask
 
     @property
     def relative_left(self):
@@ -225,16 +328,17 @@ class PlayCardsPhase(TrumpMadePhase):
             return self.left_of(self.turn, 2)
         return self.left
 
-    def next_hand_or_victory(self):
+    def next_hand_or_victory(self, score):
         """Proceed to next hand, or end game if someone has won."""
-        for team, score in enumerate(self.score):
-            if score >= 10:
-                return GameOver(team)
+        for team, team_score in enumerate(score):
+            if team_score >= 10:
+                return GameOver(team, score)
 
-        new_hands, new_up_card = deal()
+        new_hands, new_up_card = self.deal()
 
-        return BidPhaseOne(self.score, new_hands, self.left_of(self.dealer),
-                           self.left_of(self.dealer, spots=2), new_up_card)
+        return BidPhaseOne(score, new_hands, self.left_of(self.dealer),
+                           self.left_of(self.dealer, spots=2), new_up_card,
+                           deal=self.deal)
 
     def play(self, card):
         """Play a card."""
@@ -242,68 +346,67 @@ class PlayCardsPhase(TrumpMadePhase):
             raise TypeError()
 
         self.check_legal_move(card)
-        self.current_hand.remove(card)
-        self.trick.add_card(self.turn, card)
-        if self.trick_full():
-            return self.score_trick()
-        self.turn = self.relative_left
-        return self
+        led_mask = None
+        if not self.trick:
+            trump = SUIT_INDEX[self.trump]
+            led = RELATIVE_SUIT[trump][CARD_INDEX[card]]
+            led_mask = SUIT_MASKS[trump][led]
+        trick = self.trick.with_card(self.turn, card, led_mask)
+        state = PlayCardsPhase(self.score,
+                               self.hands_without(self.turn, card),
+                               self.dealer, self.relative_left, self.maker,
+                               self.sitting, self.trump, trick,
+                               self.trick_score, deal=self.deal)
+        if state.trick_full():
+            return state.score_trick()
+        return state
 
     def relative_rank(self, card):
-        """Turn a card into an ordered pair for scoring.
+        """Turn a card into an int for scoring.
 
-        The built-in ordering of the return values corresponds to the ordering
-        of the cards in scoring a trick.
+        The ordering of the return values corresponds to the ordering of the
+        cards in scoring a trick; see compact.TRICK_RANK.
 
         relative_rank(None) compares less than any card; this helps us handle
         the sitting player.
 
         """
         if card is None:
-            return (-1, 0)
-        if self.relative_suit(card) == self.trump:
-            suit_score = 2
-        elif self.relative_suit(card) == self.led_suit():
-            suit_score = 1
-        else:
-            suit_score = 0
-
-        if suit_score == 2 and card.rank == Rank.jack:
-            if card.suit == self.trump:
-                rank_score = 21
-            else:
-                rank_score = 20
-        else:
-            rank_score = int(card.rank)
-
-        return (suit_score, rank_score)
+            return -1
+        trump = SUIT_INDEX[self.trump]
+        return TRICK_RANK[trump][self.led_suit_index()][CARD_INDEX[card]]
 
     def relative_suit(self, card):
         """Return the suit of a card, accounting for trump."""
-        if card.rank == Rank.jack and card.color == self.trump.color:
-            return self.trump
-        return card.suit
+        return SUITS[RELATIVE_SUIT[SUIT_INDEX[self.trump]][CARD_INDEX[card]]]
 
     def trick_full(self):
         """Check if all cards have been played for this trick."""
         max_size = 3 if self.sitting is not None else 4
         return max_size == len(self.trick)
 
-    def trick_winner(self):
-        """Find the winner of the current trick."""
-        return max(range(4),
-                   key=lambda x: self.relative_rank(self.trick.cards.get(x)))
+    def trick_winner(self, trick=None):
+        """Find the winner of trick, by default the current one."""
+        if trick is None:
+            trick = self.trick
+        cards = trick.cards
+        trump = SUIT_INDEX[self.trump]
+        led_suit = RELATIVE_SUIT[trump][CARD_INDEX[trick.led()]]
+        ranks = TRICK_RANK[trump][led_suit]
+        return max(cards, key=lambda player: ranks[CARD_INDEX[cards[player]]])
 
     def score_trick(self):
         """Return next state after trick is finished."""
         winning_player = self.trick_winner()
-        winning_team = winning_player % 2
-        self.trick_score[winning_team] += 1
-        if sum(self.trick_score) == 5:
-            return self.score_round()
-        self.turn = winning_player
-        self.trick = Trick(winning_player)
-        return self
+        trick_score = list(self.trick_score)
+        trick_score[winning_player % 2] += 1
+        state = PlayCardsPhase(self.score, self.hands, self.dealer,
+                               winning_player, self.maker, self.sitting,
+                               self.trump, Trick(winning_player), trick_score,
+                               deal=self.deal)
+        if sum(trick_score) == 5:
+            return state.score_round()
+        return state
 
     def score_round(self):
         """Update game score after round and advance state."""
@@ -316,21 +419,34 @@ class PlayCardsPhase(TrumpMadePhase):
                 points = 4 if self.sitting is not None else 2
             else:
                 points = 1
-        self.score[winning_team] += points
-        return self.next_hand_or_victory()
+        score = list(self.score)
+        score[winning_team] += points
+        return self.next_hand_or_victory(score)
 
 
 class Trick:
-    """A simple representation of a trick."""
-    def __init__(self, leader):
+    """A simple representation of a trick.
+
+    led_mask is the mask of cards following the led suit, set by
+    PlayCardsPhase.play when the trick is led.
+    """
+    __slots__ = ('leader', 'cards', 'led_mask')
+
+    def __init__(self, leader, cards=None, led_mask=None):
         self.leader = leader
-        self.cards = {}
+        self.cards = {} if cards is None else cards
+        self.led_mask = led_mask
 
     def __len__(self):
         return len(self.cards)
 
-    def add_card(self, player, card):
-        self.cards[player] = card
+    def with_card(self, player, card, led_mask=None):
+        """Return a new trick with card added for player."""
+        cards = self.cards.copy()
+        cards[player] = card
+        if led_mask is None:
+            led_mask = self.led_mask
+        return Trick(self.leader, cards, led_mask)
 
     def led(self):
         """The card that was led."""
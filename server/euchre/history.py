@@ -0,0 +1,162 @@
+"""Columnar hand histories.
+
+Every finished hand becomes one fixed-size record of HAND_DTYPE: the deal,
+the bidding, who made trump and how the hand came out. Records are written
+in chunks to a file of raw records behind a short header, so a file can be
+of any length, memory use while writing stays flat, and read_history maps a
+file of any size straight into a NumPy structured array.
+
+Cards are compact indices and hands are bitmasks of them, as in the compact
+module. Each bid is one code; see bid_code.
+"""
+import os
+
+from .compact import CARD_INDEX, SUIT_INDEX, hand_mask
+from .game import BidPhaseOne, BidPhaseTwo, DiscardPhase, PlayCardsPhase
+from .numeric import np, require_numpy
+
+MAGIC = b'EUCHREHH'
+VERSION = 1
+HEADER_SIZE = 16
+
+# Bid codes. Naming a suit in the second round is BID_SUIT + 2 * suit, plus
+# one to go alone.
+BID_PASS = 0
+BID_CALL = 1
+BID_ALONE = 2
+BID_SUIT = 3
+NO_BID = 255
+NO_CARD = 255
+MAX_BIDS = 8
+
+if np is not None:
+    HAND_DTYPE = np.dtype([
+        ('game', '<u8'),
+        ('hands', '<u4', (4,)),
+        ('up_card', 'u1'),
+        ('dealer', 'u1'),
+        ('bids', 'u1', (MAX_BIDS,)),
+        ('trump', 'u1'),
+        ('maker', 'u1'),
+        ('alone', '?'),
+        ('discard', 'u1'),
+        ('tricks', 'u1', (2,)),
+        ('points', 'u1', (2,)),
+    ])
+else:  # pragma: no cover
+    HAND_DTYPE = None
+
+
+def bid_code(move, args):
+    """Return the code of a bidding move."""
+    if move == 'pass_bid':
+        return BID_PASS
+    if move == 'call_one':
+        return BID_ALONE if args[0] else BID_CALL
+    alone, trump = args
+    return BID_SUIT + 2 * SUIT_INDEX[trump] + bool(alone)
+
+
+class HandRecorder:
+    """Turns the moves of a game into one record per finished hand.
+
+    Call record() with every move; it returns the record of the hand the
+    move finished, as a tuple in HAND_DTYPE field order, or None. Hands whose
+    bidding the recorder did not see are not recorded.
+    """
+    def __init__(self, game=0):
+        self.game = game
+        self.deal = None
+        self.bids = []
+        self.discard = NO_CARD
+
+    def record(self, state, move, args, next_state):
+        if isinstance(state, (BidPhaseOne, BidPhaseTwo)):
+            if self.deal is None:
+                self.deal = (tuple(hand_mask(hand) for hand in state.hands),
+                             CARD_INDEX[state.up_card], state.dealer)
+            self.bids.append(bid_code(move, args))
+        elif isinstance(state, DiscardPhase):
+            self.discard = CARD_INDEX[args[0]]
+        elif (isinstance(state, PlayCardsPhase) and self.deal is not None and
+              not isinstance(next_state, PlayCardsPhase)):
+            return self.finish(state, args[0], next_state)
+        return None
+
+    def finish(self, state, card, next_state):
+        """Return the record of the hand state's last play finished."""
+        winner = state.trick_winner(state.trick.with_card(state.turn, card))
+        tricks = list(state.trick_score)
+        tricks[winner % 2] += 1
+        points = [after - before
+                  for after, before in zip(next_state.score, state.score)]
+        hands, up_card, dealer = self.deal
+        bids = tuple(self.bids) + (NO_BID,) * (MAX_BIDS - len(self.bids))
+        row = (self.game, hands, up_card, dealer, bids,
+               SUIT_INDEX[state.trump], state.maker,
+               state.sitting is not None, self.discard, tuple(tricks),
+               tuple(points))
+        self.deal = None
+        self.bids = []
+        self.discard = NO_CARD
+        return row
+
+
+def _header():
+    return (MAGIC + VERSION.to_bytes(4, 'little') +
+            HAND_DTYPE.itemsize.to_bytes(4, 'little'))
+
+
+def history_array(rows):
+    """Return a HAND_DTYPE array of records given as tuples."""
+    require_numpy('hand histories')
+    return np.array(rows, HAND_DTYPE)
+
+
+class HistoryWriter:
+    """Appends hand records to a history file, chunk_size at a time."""
+    def __init__(self, path, chunk_size=65536):
+        require_numpy('hand histories')
+        exists = os.path.exists(path) and os.path.getsize(path) > 0
+        if exists:
+            with open(path, 'rb') as history:
+                if history.read(HEADER_SIZE) != _header():
+                    raise ValueError("Not a hand history: {}".format(path))
+        self.file = open(path, 'ab')
+        if not exists:
+            self.file.write(_header())
+        self.chunk = np.zeros(chunk_size, HAND_DTYPE)
+        self.size = 0
+
+    def append(self, row):
+        """Add one record, a tuple in HAND_DTYPE field order."""
+        self.chunk[self.size] = row
+        self.size += 1
+        if self.size == len(self.chunk):
+            self.flush()
+
+    def extend(self, rows):
+        """Add a HAND_DTYPE array of records."""
+        self.flush()
+        self.file.write(rows.tobytes())
+
+    def flush(self):
+        if self.size:
+            self.file.write(self.chunk[:self.size].tobytes())
+            self.size = 0
+        self.file.flush()
+
+    def close(self):
+        self.flush()
+        self.file.close()
+
+
+def read_history(path):
+    """Return the records in a history file as a read-only memmap."""
+    require_numpy('hand histories')
+    with open(path, 'rb') as history:
+        if history.read(HEADER_SIZE) != _header():
+            raise ValueError("Not a hand history: {}".format(path))
+    if os.path.getsize(path) == HEADER_SIZE:
+        return np.zeros(0, HAND_DTYPE)
+    return np.memmap(path, HAND_DTYPE, 'r', offset=HEADER_SIZE)
@@ -0,0 +1,347 @@
+"""Append-only journal of table events, with replay.
+
+Every table event is one JSON line: a table being created or closed, a game
+starting (with the seed of its Dealer, from which every deal of the game
+follows), each move as its seat and wire arguments, and every so often a
+snapshot of the game so far. Lines go to numbered segment files in one
+directory, and are fsynced in batches: after batch_size events or
+sync_interval seconds, whichever comes first, so a crash loses at most that
+much.
+
+A journal kept by the server is synced in the background instead, off the
+event loop, and is compacted whenever a segment fills: the next segment
+opens with a checkpoint describing every open table, and every older
+segment is deleted. Recovery then reads at most about two segments, however
+long the server has run.
+
+recover() reads the journal back into the state of every open table. Moves
+before a table's latest snapshot are skipped rather than replayed.
+
+Running this module measures the cost of journaling a move::
+
+    $ python -m euchre.journal --moves 100000
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import tempfile
+import time
+
+from .dealing import Dealer
+from .encoder import (PHASE_NAMES, decode_args, decode_card, decode_suit,
+                      encode, phase_encoder, phase_fields, to_serializable)
+from .game import (Game, GameOver, LiveGamePhase, PlayCardsPhase, Trick,
+                   initial_game_state)
+from .simulate import random_policy
+
+SEGMENT_PREFIX = 'journal-'
+SEGMENT_SUFFIX = '.log'
+
+PHASE_CLASSES = {name: cls for cls, name in PHASE_NAMES.items()}
+
+
+def _decode_trick(value):
+    return Trick(value['leader'],
+                 {int(player): decode_card(card)
+                  for player, card in value['cards'].items()})
+
+
+# Snapshot fields that are not plain JSON values, by name.
+FIELD_DECODERS = {
+    'hands': lambda hands: [[decode_card(card) for card in hand]
+                            for hand in hands],
+    'trick': _decode_trick,
+    'trump': decode_suit,
+    'up_card': decode_card,
+}
+
+
+def snapshot_state(state):
+    """Return state as plain data from which restore_state rebuilds it."""
+    data = phase_encoder(type(state))(state)
+    if isinstance(state, PlayCardsPhase):
+        data['trick'] = {'leader': state.trick.leader,
+                         'cards': data['trick']}
+    return data
+
+
+def restore_state(data, deal):
+    """Rebuild the phase snapshot_state turned into data.
+
+    deal becomes the deal source of a live phase.
+    """
+    cls = PHASE_CLASSES[data['phase']]
+    state = cls.__new__(cls)
+    for field in phase_fields(cls):
+        decoder = FIELD_DECODERS.get(field)
+        value = data[field]
+        setattr(state, field, value if decoder is None else decoder(value))
+    if isinstance(state, LiveGamePhase):
+        state.deal = deal
+    return state
+
+
+def _fsync(fd):
+    """fsync and close fd, a duplicate of a segment's descriptor."""
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+class Journal:
+    """An append-only log of table events in numbered segment files.
+
+    Opening a journal always starts a new segment, so a line torn by a crash
+    can only be the last line of a segment.
+
+    If background is true, append never syncs or starts a new segment.
+    Whoever keeps the journal must instead await maintain() every
+    sync_interval seconds, which fsyncs in the event loop's default
+    executor and compacts the journal once a segment is full. describe is
+    then a function returning the records from which recovery rebuilds
+    every open table; without it, compacting just starts a new segment.
+    """
+    def __init__(self, directory, segment_size=64 << 20, batch_size=64,
+                 sync_interval=0.05, background=False):
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self.segment_size = segment_size
+        self.batch_size = batch_size
+        self.sync_interval = sync_interval
+        self.background = background
+        self.describe = None
+        segments = self.segments()
+        self.segment = self.segment_number(segments[-1]) if segments else 0
+        self.file = None
+        self.pending = 0
+        self.last_sync = time.monotonic()
+        self.roll()
+
+    def segment_path(self, number):
+        return os.path.join(self.directory, '{}{:06d}{}'.format(
+            SEGMENT_PREFIX, number, SEGMENT_SUFFIX))
+
+    @staticmethod
+    def segment_number(path):
+        name = os.path.basename(path)
+        return int(name[len(SEGMENT_PREFIX):-len(SEGMENT_SUFFIX)])
+
+    def segments(self):
+        """Return the paths of every segment, oldest first."""
+        names = sorted(name for name in os.listdir(self.directory)
+                       if name.startswith(SEGMENT_PREFIX) and
+                       name.endswith(SEGMENT_SUFFIX))
+        return [os.path.join(self.directory, name) for name in names]
+
+    def append(self, record):
+        """Add record, a dict of plain data, to the journal."""
+        self.file.write(encode(record) + b'\n')
+        self.pending += 1
+        if self.background:
+            return
+        if (self.pending >= self.batch_size or
+                time.monotonic() - self.last_sync >= self.sync_interval):
+            self.sync()
+        if self.full():
+            self.roll()
+
+    def full(self):
+        return self.file.tell() >= self.segment_size
+
+    def sync(self):
+        """Write every appended record through to disk."""
+        if self.pending:
+            self.file.flush()
+            os.fsync(self.file.fileno())
+            self.pending = 0
+        self.last_sync = time.monotonic()
+
+    def detach(self):
+        """Flush the segment; return a duplicate of its descriptor to sync.
+        """
+        self.file.flush()
+        self.pending = 0
+        self.last_sync = time.monotonic()
+        return os.dup(self.file.fileno())
+
+    async def sync_in_executor(self):
+        """Like sync, but fsync in the event loop's default executor."""
+        if self.file is None or not self.pending:
+            return
+        await asyncio.get_event_loop().run_in_executor(
+            None, _fsync, self.detach())
+
+    async def maintain(self):
+        """Sync appended records, and compact if the segment is full."""
+        await self.sync_in_executor()
+        if self.file is not None and self.full():
+            await self.compact()
+
+    async def compact(self):
+        """Start a new segment, opening with describe()'s records.
+
+        Both segments are fsynced off the event loop, and then every segment
+        before the new one is deleted, since describe() supersedes them.
+        """
+        old = self.detach()
+        self.file.close()
+        self.segment += 1
+        self.file = open(self.segment_path(self.segment), 'ab')
+        if self.describe is not None:
+            for record in self.describe():
+                self.file.write(encode(record) + b'\n')
+                self.pending += 1
+        await asyncio.get_event_loop().run_in_executor(None, _fsync, old)
+        if self.describe is None:
+            return
+        await self.sync_in_executor()
+        for path in self.segments()[:-1]:
+            os.remove(path)
+
+    def roll(self):
+        """Finish the current segment and start the next one."""
+        self.close()
+        self.segment += 1
+        self.file = open(self.segment_path(self.segment), 'ab')
+
+    def close(self):
+        if self.file is not None:
+            self.sync()
+            self.file.close()
+            self.file = None
+
+    def records(self):
+        """Yield every record in the journal, oldest first."""
+        if self.file is not None:
+            self.file.flush()
+        for path in self.segments():
+            with open(path, 'rb') as segment:
+                for line in segment:
+                    try:
+                        yield json.loads(line)
+                    except ValueError:
+                        # Torn by a crash; nothing follows it in a segment.
+                        break
+
+
+class TableRecord:
+    """What the journal says about one table."""
+    __slots__ = ('table_id', 'name', 'seed', 'deals', 'snapshot', 'moves')
+
+    def __init__(self, table_id, name):
+        self.table_id = table_id
+        self.name = name
+        self.seed = None
+        self.deals = 0
+        self.snapshot = None
+        self.moves = []
+
+    def replay(self):
+        """Return the table's current game state, or None if none started.
+        """
+        if self.seed is None:
+            return None
+        dealer = Dealer.resume(self.seed, self.deals)
+        if self.snapshot is None:
+            game = Game(initial_game_state(dealer))
+        else:
+            game = Game(restore_state(self.snapshot, dealer))
+        for seat, move, args in self.moves:
+            game.perform_move(move, seat, *decode_args(move, args))
+        return game.state
+
+
+def recover(journal):
+    """Return the open tables in journal and the next unused table id.
+
+    The open tables are a dict of a TableRecord for each. A table id is
+    used once a table has been created with it, even if it was closed since.
+    """
+    tables = {}
+    next_table_id = 0
+    for record in journal.records():
+        event = record['event']
+        if event == 'checkpoint':
+            next_table_id = max(next_table_id, record['next_table'])
+            continue
+        table_id = record['table']
+        if event == 'create':
+            tables[table_id] = TableRecord(table_id, record['name'])
+            next_table_id = max(next_table_id, table_id + 1)
+        elif event == 'close':
+            tables.pop(table_id, None)
+        elif event == 'start':
+            table = tables[table_id]
+            table.seed, table.deals = record['seed'], 0
+            table.snapshot, table.moves = None, []
+        elif event == 'snapshot':
+            table = tables[table_id]
+            table.deals = record['deals']
+            table.snapshot, table.moves = record['state'], []
+        elif event == 'move':
+            tables[table_id].moves.append(
+                (record['seat'], record['move'], record['args']))
+    return tables, next_table_id
+
+
+def move_record(table_id, seat, move, args):
+    """Return the journal record of a move, args being game objects."""
+    return {'event': 'move', 'table': table_id, 'seat': seat, 'move': move,
+            'args': to_serializable(args)}
+
+
+def snapshot_record(table_id, state):
+    """Return the journal record of a snapshot of state.
+
+    A live state's deal source must be a Dealer.
+    """
+    deal = getattr(state, 'deal', None)
+    return {'event': 'snapshot', 'table': table_id,
+            'deals': 0 if deal is None else deal.deals,
+            'state': snapshot_state(state)}
+
+
+def checkpoint_record(next_table_id):
+    """Return the record opening a checkpoint; see Journal.compact."""
+    return {'event': 'checkpoint', 'next_table': next_table_id}
+
+
+def benchmark(directory, moves, seed=0):
+    """Return the mean seconds spent journaling each of moves moves."""
+    rng = random.Random(seed)
+    journal = Journal(directory)
+    elapsed = 0.0
+    done = 0
+    while done < moves:
+        state = initial_game_state(Dealer(rng.getrandbits(64)))
+        while not isinstance(state, GameOver) and done < moves:
+            move, args = random_policy(state, rng)
+            seat = state.turn
+            state = state.apply(move, *args)
+            start = time.perf_counter()
+            journal.append(move_record(0, seat, move, args))
+            elapsed += time.perf_counter() - start
+            done += 1
+    journal.close()
+    return elapsed / moves
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Journal write benchmark.")
+    parser.add_argument('--moves', type=int, default=100000)
+    parser.add_argument('--directory', default=None,
+                        help="where to write (default: a temporary directory)")
+    args = parser.parse_args(argv)
+    if args.directory is not None:
+        seconds = benchmark(args.directory, args.moves)
+    else:
+        with tempfile.TemporaryDirectory() as directory:
+            seconds = benchmark(directory, args.moves)
+    print("{:.1f}us per move".format(seconds * 1e6))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,351 @@
+"""Load-test a running server with simulated players.
+
+Every simulated player is a WAMP session of its own, connected to the router
+as a browser would be, and all of them share one process and event loop.
+Four players make a table: the first creates it, each joins it and takes a
+seat through the player.{action} procedures, and they play games of random
+legal moves to the end, acting on what they see on publicstate. Every move is
+timed twice: until its perform_move call returns, and until the state it
+leads to is published back.
+
+Start the router from router/ and the server as usual, then::
+
+    $ python -m euchre.loadtest --tables 100 --games 2
+
+With --shards, the load test starts the server itself against the router,
+once for each number of shard processes given, and reports how throughput
+scales::
+
+    $ python -m euchre.loadtest --tables 100 --shards 1 2 4
+
+The simulated players share one core, so at high shard counts they can be
+the bottleneck rather than the server; give the load test a machine with
+cores to spare beyond the shards'.
+"""
+import argparse
+import asyncio
+import random
+import time
+from collections import Counter
+from multiprocessing import Process
+
+from autobahn.asyncio.wamp import ApplicationRunner, ApplicationSession
+from autobahn.wamp.exception import ApplicationError
+
+from .encoder import PHASE_CODES, PHASE_NAMES
+from .game import GameOver
+from .server import run_shard, topic
+
+# How the game over phase is tagged in each protocol.
+GAME_OVER = {'string': PHASE_NAMES[GameOver],
+             'compact': PHASE_CODES[GameOver]}
+
+PERCENTILES = (0.5, 0.9, 0.99, 0.999)
+
+
+def percentile(samples, fraction):
+    """Return the sample fraction of the sorted samples are no greater than.
+    """
+    if not samples:
+        return float('nan')
+    return samples[min(len(samples) - 1, int(fraction * len(samples)))]
+
+
+class LoadStats:
+    """Move latencies, games and errors gathered from every player."""
+    def __init__(self):
+        self.call_seconds = []
+        self.publish_seconds = []
+        self.games = 0
+        self.errors = Counter()
+        self.start = None
+        self.end = None
+
+    def elapsed(self):
+        return (self.end or time.perf_counter()) - (self.start or 0.0)
+
+    def rate(self):
+        """Return the moves made per second of play."""
+        elapsed = self.elapsed()
+        return len(self.call_seconds) / elapsed if elapsed else 0.0
+
+    def report(self):
+        """Return a summary of throughput and latency percentiles."""
+        lines = ["{} moves and {} games in {:.1f}s: {:.1f} moves/s".format(
+            len(self.call_seconds), self.games, self.elapsed(), self.rate())]
+        for name, samples in (('call', self.call_seconds),
+                              ('published', self.publish_seconds)):
+            samples = sorted(samples)
+            lines.append("{:<10} ".format(name) + ' '.join(
+                "p{:g}={:.2f}ms".format(100 * fraction,
+                                        1000 * percentile(samples, fraction))
+                for fraction in PERCENTILES))
+        for error, count in sorted(self.errors.items()):
+            lines.append("{}: {}".format(error, count))
+        return '\n'.join(lines)
+
+
+class LoadPlayer:
+    """One simulated player, acting through a WAMP session.
+
+    session needs only call and subscribe, as an ApplicationSession has.
+    """
+    def __init__(self, session, stats, rng, protocol='string'):
+        self.session = session
+        self.stats = stats
+        self.rng = rng
+        self.protocol = protocol
+        self.player_id = None
+        self.table_id = None
+        self.seat = None
+        self.version = None
+        self.state = None
+        self.hand = None
+        self.moving = False
+        self.acted = None
+        self.sent = None
+        self.game_over = asyncio.Event()
+
+    def uri(self, name):
+        return 'table{t}.{name}'.format(t=self.table_id, name=name)
+
+    def call_player(self, name, *args):
+        return self.session.call('player.{}'.format(name), *args)
+
+    async def join(self, name=None):
+        """Join the server and negotiate a protocol."""
+        self.player_id, _ = await self.session.call('join_server', name)
+        self.protocol = await self.call_player('set_protocol', self.protocol)
+
+    async def sit(self, table_id, seat):
+        """Join table_id, follow its state and take seat."""
+        self.table_id = table_id
+        self.seat = seat
+        await self.call_player('join_table', table_id)
+        await self.session.subscribe(
+            self.on_state, self.uri(topic('publicstate', self.protocol)))
+        await self.session.subscribe(
+            self.on_hand, self.uri(topic('hand', self.protocol)))
+        await self.call_player('join_seat', seat)
+
+    def on_hand(self, message):
+        self.hand = message['hand']
+
+    def on_state(self, message):
+        if 'snapshot' in message:
+            self.state = dict(message['snapshot'])
+        elif self.state is not None and message['version'] == self.version + 1:
+            self.state.update(message['patch'])
+            for field in message.get('removed', ()):
+                self.state.pop(field, None)
+        else:
+            asyncio.ensure_future(self.resync())
+            return
+        self.version = message['version']
+        self.observe()
+
+    async def resync(self):
+        snapshot = await self.call_player('snapshot')
+        if snapshot['state'] is not None:
+            self.on_state({'version': snapshot['version'],
+                           'snapshot': snapshot['state']})
+
+    def observe(self):
+        """Time the move awaiting publication, then act on the state."""
+        if self.sent is not None and self.version > self.sent[0]:
+            self.stats.publish_seconds.append(
+                time.perf_counter() - self.sent[1])
+            self.sent = None
+        if self.state.get('phase') == GAME_OVER[self.protocol]:
+            self.game_over.set()
+        elif self.state.get('turn') == self.seat:
+            asyncio.ensure_future(self.take_turn())
+
+    async def take_turn(self):
+        """Make a random legal move, once per published state."""
+        if self.moving or self.acted == self.version:
+            return
+        self.moving = True
+        self.acted = self.version
+        try:
+            moves = await self.call_player('legal_moves')
+            if not moves:
+                return
+            move, args = self.rng.choice(moves)
+            start = time.perf_counter()
+            self.sent = (self.version, start)
+            await self.call_player('perform_move', move, *args)
+            self.stats.call_seconds.append(time.perf_counter() - start)
+        except Exception as error:
+            self.stats.errors[type(error).__name__] += 1
+        finally:
+            self.moving = False
+        # Our turn may have come round again while we waited.
+        if self.acted != self.version:
+            self.observe()
+
+
+async def play_table(players, games, stats, timeout=120.0):
+    """Seat four players at a new table and have them play games."""
+    table_id = await players[0].session.call('create_table')
+    for seat, player in enumerate(players):
+        await player.sit(table_id, seat)
+    for _ in range(games):
+        for player in players:
+            player.game_over.clear()
+        if stats.start is None:
+            stats.start = time.perf_counter()
+        await players[0].call_player('start_game')
+        try:
+            await asyncio.wait_for(asyncio.gather(
+                *[player.game_over.wait() for player in players]), timeout)
+        except asyncio.TimeoutError:
+            stats.errors['game timed out'] += 1
+            return
+        stats.games += 1
+        stats.end = time.perf_counter()
+
+
+class LoadSession(ApplicationSession):
+    """A bare session, handed to the future in its config on joining."""
+    def onJoin(self, details):
+        joined = self.config.extra['joined']
+        if not joined.done():
+            joined.set_result(self)
+
+    def onDisconnect(self):
+        joined = self.config.extra['joined']
+        if not joined.done():
+            joined.set_exception(ConnectionError("Could not join."))
+
+
+async def connect(url, realm):
+    """Return a new session joined to realm on the router at url."""
+    joined = asyncio.get_event_loop().create_future()
+    runner = ApplicationRunner(url=url, realm=realm, extra={'joined': joined})
+    await runner.run(LoadSession, start_loop=False)
+    return await joined
+
+
+async def run(url, realm, tables, games=1, protocol='string', seed=0,
+              ramp=0.0, timeout=120.0):
+    """Play games at each of tables tables and return the LoadStats."""
+    stats = LoadStats()
+    rng = random.Random(seed)
+
+    async def table(index):
+        await asyncio.sleep(ramp * index / tables)
+        players = []
+        for _ in range(4):
+            player = LoadPlayer(await connect(url, realm), stats,
+                                random.Random(rng.getrandbits(64)), protocol)
+            await player.join()
+            players.append(player)
+        try:
+            await play_table(players, games, stats, timeout)
+        finally:
+            for player in players:
+                player.session.leave()
+
+    await asyncio.gather(*[table(index) for index in range(tables)])
+    return stats
+
+
+def start_shards(url, realm, shards):
+    """Start shards server processes against the router at url."""
+    processes = [Process(target=run_shard,
+                         args=(url, realm, shard, shards), daemon=True)
+                 for shard in range(shards)]
+    for process in processes:
+        process.start()
+    return processes
+
+
+def stop_shards(processes):
+    for process in processes:
+        process.terminate()
+    for process in processes:
+        process.join()
+
+
+async def wait_for_shards(url, realm, shards, timeout=30.0):
+    """Wait until every shard has registered its procedures.
+
+    url must be the router's transport for the server role, since only the
+    server may call the shards' own procedures.
+    """
+    session = await connect(url, realm)
+    deadline = time.perf_counter() + timeout
+    try:
+        for shard in range(shards):
+            while True:
+                try:
+                    await session.call('shard{n}.tables'.format(n=shard))
+                    break
+                except ApplicationError:
+                    if time.perf_counter() > deadline:
+                        raise RuntimeError(
+                            "Shard {} did not start.".format(shard))
+                    await asyncio.sleep(0.1)
+    finally:
+        session.leave()
+
+
+def scale(url, server_url, realm, shard_counts, *args):
+    """Run the load test against each number of shards in shard_counts.
+
+    The shards connect to the router at server_url and the players at url.
+    args are passed on to run. Return a list of (shards, LoadStats).
+    """
+    results = []
+    for shards in shard_counts:
+        processes = start_shards(server_url, realm, shards)
+        try:
+            async def measure():
+                await wait_for_shards(server_url, realm, shards)
+                return await run(url, realm, *args)
+            results.append((shards, asyncio.run(measure())))
+        finally:
+            stop_shards(processes)
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Load-test the server.")
+    parser.add_argument('--url', default=u"ws://localhost:8080/ws")
+    parser.add_argument('--server-url', default=u"ws://localhost:8081/ws",
+                        help="the router's transport for the server role, "
+                        "used with --shards")
+    parser.add_argument('--realm', default=u"realm1")
+    parser.add_argument('--tables', type=int, default=25,
+                        help="tables of four simulated players")
+    parser.add_argument('--games', type=int, default=1,
+                        help="games to play at each table")
+    parser.add_argument('--protocol', choices=('string', 'compact'),
+                        default='string')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--ramp', type=float, default=0.0,
+                        help="seconds over which to spread table starts")
+    parser.add_argument('--timeout', type=float, default=120.0,
+                        help="seconds to allow for each game")
+    parser.add_argument('--shards', type=int, nargs='+', default=None,
+                        help="start the server with each of these numbers "
+                        "of shards in turn, rather than use a running one")
+    args = parser.parse_args(argv)
+    options = (args.tables, args.games, args.protocol, args.seed, args.ramp,
+               args.timeout)
+    if args.shards is None:
+        print(asyncio.run(run(args.url, args.realm, *options)).report())
+        return
+    baseline = None
+    results = scale(args.url, args.server_url, args.realm, args.shards,
+                    *options)
+    for shards, stats in results:
+        baseline = baseline or stats.rate() / shards
+        print("{} shards: {:.0%} scaling efficiency".format(
+            shards, stats.rate() / baseline / shards if baseline else 0.0))
+        print(stats.report())
+
+
+if __name__ == '__main__':
+    main()
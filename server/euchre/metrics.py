@@ -0,0 +1,209 @@
+"""Counters, gauges and latency histograms in Prometheus text format.
+
+Metrics live in a Registry, by default the module's REGISTRY. Counters and
+histograms may have labels; their values are then kept per tuple of label
+values. A gauge is read from a function whenever the registry is rendered.
+
+Timing every call of a hot function costs two clock reads and a bucket
+lookup. With sample_every set to n, a timed function is only timed on one
+call in n, so a histogram's count is the number of samples taken, not of
+calls made.
+
+The rendered registry can be served over HTTP with serve() or written to a
+file every so often with dump_periodically().
+"""
+import asyncio
+import bisect
+import functools
+import os
+import time
+
+# Upper bounds, in seconds, of the default latency buckets.
+DEFAULT_BUCKETS = (0.00001, 0.000025, 0.00005, 0.0001, 0.00025, 0.0005,
+                   0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 1.0)
+
+
+def _format_labels(names, values, extra=()):
+    pairs = list(zip(names, values)) + list(extra)
+    if not pairs:
+        return ''
+    return '{{{}}}'.format(','.join(
+        '{}="{}"'.format(name, str(value).replace('"', '\\"'))
+        for name, value in pairs))
+
+
+def _format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Metric:
+    kind = None
+
+    def __init__(self, name, help, labels=()):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self.values = {}
+
+    def header(self):
+        return ['# HELP {} {}'.format(self.name, self.help),
+                '# TYPE {} {}'.format(self.name, self.kind)]
+
+
+class Counter(Metric):
+    """A count that only goes up."""
+    kind = 'counter'
+
+    def inc(self, *labels, amount=1):
+        self.values[labels] = self.values.get(labels, 0) + amount
+
+    def value(self, *labels):
+        return self.values.get(labels, 0)
+
+    def render(self):
+        lines = self.header()
+        for labels, value in sorted(self.values.items()):
+            lines.append('{}{} {}'.format(
+                self.name, _format_labels(self.labels, labels),
+                _format_value(value)))
+        return lines
+
+
+class Gauge(Metric):
+    """A value read from function whenever it is rendered."""
+    kind = 'gauge'
+
+    def __init__(self, name, help, function):
+        super().__init__(name, help)
+        self.function = function
+
+    def render(self):
+        return self.header() + ['{} {}'.format(
+            self.name, _format_value(self.function()))]
+
+
+class Histogram(Metric):
+    """Counts of observations by bucket, with their sum."""
+    kind = 'histogram'
+
+    def __init__(self, name, help, labels=(), buckets=DEFAULT_BUCKETS,
+                 registry=None):
+        super().__init__(name, help, labels)
+        self.buckets = tuple(buckets)
+        self.registry = registry
+        self.calls = 0
+
+    def observe(self, value, *labels):
+        counts = self.values.get(labels)
+        if counts is None:
+            # One count per bucket, one for +Inf, then the sum.
+            counts = self.values[labels] = [0] * (len(self.buckets) + 1) + [0]
+        counts[bisect.bisect_left(self.buckets, value)] += 1
+        counts[-1] += value
+
+    def count(self, *labels):
+        return sum(self.values.get(labels, [0])[:-1])
+
+    def time(self, function):
+        """Decorate function to observe how long its calls take.
+
+        Calls that raise are timed too. Only one call in the registry's
+        sample_every is timed.
+        """
+        @functools.wraps(function)
+        def timed(*args, **kwargs):
+            self.calls += 1
+            every = self.registry.sample_every if self.registry else 1
+            if self.calls % every:
+                return function(*args, **kwargs)
+            start = time.perf_counter()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                self.observe(time.perf_counter() - start)
+        return timed
+
+    def render(self):
+        lines = self.header()
+        bounds = self.buckets + (float('inf'),)
+        for labels, counts in sorted(self.values.items()):
+            total = 0
+            for bound, count in zip(bounds, counts):
+                total += count
+                lines.append('{}_bucket{} {}'.format(
+                    self.name,
+                    _format_labels(self.labels, labels,
+                                   [('le', _format_value(bound))]),
+                    total))
+            suffix = _format_labels(self.labels, labels)
+            lines.append('{}_sum{} {}'.format(self.name, suffix,
+                                              _format_value(counts[-1])))
+            lines.append('{}_count{} {}'.format(self.name, suffix, total))
+        return lines
+
+
+class Registry:
+    """A set of metrics, by name."""
+    def __init__(self, sample_every=1):
+        self.metrics = {}
+        self.sample_every = sample_every
+
+    def add(self, metric):
+        """Add metric, replacing any metric of the same name."""
+        self.metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name, help, labels=()):
+        return self.add(Counter(name, help, labels))
+
+    def gauge(self, name, help, function):
+        return self.add(Gauge(name, help, function))
+
+    def histogram(self, name, help, labels=(), buckets=DEFAULT_BUCKETS):
+        return self.add(Histogram(name, help, labels, buckets, self))
+
+    def render(self):
+        """Return every metric in Prometheus text format."""
+        lines = []
+        for name in sorted(self.metrics):
+            lines.extend(self.metrics[name].render())
+        return '\n'.join(lines) + '\n'
+
+
+REGISTRY = Registry()
+
+
+async def serve(registry=REGISTRY, host='0.0.0.0', port=9100):
+    """Serve registry.render() to every HTTP request on host and port."""
+    async def handle(reader, writer):
+        try:
+            await reader.readuntil(b'\r\n\r\n')
+        except (asyncio.IncompleteReadError, asyncio.LimitOverrunError):
+            writer.close()
+            return
+        body = registry.render().encode()
+        writer.write(b'HTTP/1.0 200 OK\r\n'
+                     b'Content-Type: text/plain; version=0.0.4\r\n'
+                     b'Content-Length: ' + str(len(body)).encode() +
+                     b'\r\n\r\n' + body)
+        await writer.drain()
+        writer.close()
+
+    return await asyncio.start_server(handle, host, port)
+
+
+def dump(path, registry=REGISTRY):
+    """Write registry.render() to path, replacing it atomically."""
+    temporary = path + '.tmp'
+    with open(temporary, 'w') as metrics:
+        metrics.write(registry.render())
+    os.replace(temporary, path)
+
+
+async def dump_periodically(path, interval=10.0, registry=REGISTRY):
+    """Dump registry to path every interval seconds, forever."""
+    while True:
+        await asyncio.sleep(interval)
+        dump(path, registry)
@@ -0,0 +1,15 @@
+"""NumPy, for the features that need it.
+
+NumPy is optional: np is None where it is not installed, and the features
+built on it call require_numpy before they use it.
+"""
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover
+    np = None
+
+
+def require_numpy(feature):
+    """Raise RuntimeError unless numpy is installed."""
+    if np is None:
+        raise RuntimeError("NumPy is required for {}.".format(feature))
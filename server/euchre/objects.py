@@ -46,6 +46,14 @@ class Rank(Enum):
 
 
 class Card():
+    """A playing card.
+
+    There is exactly one instance of each of the 24 cards, made when this
+    module is imported, so cards compare by identity and hash to their
+    index in Deck.cards. Card(rank, suit) and from_str() look the card up.
+    """
+    __slots__ = ('rank', 'suit', 'index')
+
     rank_map = {'9': Rank.nine,
                 '10': Rank.ten,
                 'J': Rank.jack,
@@ -60,15 +68,27 @@ class Card():
                 'S': Suit.spades,
                 }
 
-    def __init__(self, rank, suit):
-        self.suit = suit
-        self.rank = rank
+    # Every card, by (rank, suit) and by str().
+    interned = {}
+    str_map = {}
 
-    def __eq__(self, other):
-        return self.suit == other.suit and self.rank == other.rank
+    def __new__(cls, rank, suit):
+        return cls.interned[rank, suit]
+
+    @classmethod
+    def _intern(cls, rank, suit):
+        card = object.__new__(cls)
+        card.rank = rank
+        card.suit = suit
+        card.index = len(cls.interned)
+        cls.interned[rank, suit] = card
+        cls.str_map[str(card)] = card
 
     def __hash__(self):
-        return (self.rank, self.suit).__hash__()
+        return self.index
+
+    def __reduce__(self):
+        return (Card, (self.rank, self.suit))
 
     def __repr__(self):
         return "Card({!r}, {!r})".format(self.rank, self.suit)
@@ -83,10 +103,12 @@ class Card():
     @classmethod
     def from_str(cls, card_str):
         """Return a card from its str() representation."""
-        rank_str, suit_str = card_str.split('.')
-        rank = cls.rank_map[rank_str]
-        suit = cls.suit_map[suit_str]
-        return cls(rank, suit)
+        return cls.str_map[card_str]
+
+
+for _suit in Suit:
+    for _rank in Rank:
+        Card._intern(_rank, _suit)
 
 
 class Deck():
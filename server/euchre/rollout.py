@@ -0,0 +1,225 @@
+"""Play the tricks of many hands at once with NumPy.
+
+A Batch holds one hand being played per row, in the compact representation:
+a bitmask per seat's hand, the card index each seat has put on the trick
+(or -1), the leader, the seat to play, trump, the maker, the seat sitting
+out (or -1) and the tricks each team has taken. Legal cards and trick
+winners come from the compact module's tables, indexed by whole columns at
+a time, so advancing every row by one card costs a handful of array
+operations however many rows there are.
+
+Policies are vectorized too: a policy takes the batch, the mask of legal
+cards for every row and a numpy.random.Generator, and returns the card
+index each row plays.
+
+Running this module measures throughput::
+
+    $ python -m euchre.rollout --hands 1000000 --batch 100000
+"""
+import argparse
+import time
+
+from .compact import (NUM_CARDS, RELATIVE_SUIT, SUIT_INDEX, SUIT_MASKS,
+                      TRICK_RANK, hand_mask)
+from .numeric import np, require_numpy
+
+if np is not None:
+    BITS = np.left_shift(np.uint32(1), np.arange(NUM_CARDS, dtype=np.uint32))
+    # The compact tables, indexed [trump, suit], [trump, card] and
+    # [trump, led suit, card].
+    SUIT_MASK_TABLE = np.array(SUIT_MASKS, dtype=np.uint32)
+    RELATIVE_SUIT_TABLE = np.array(RELATIVE_SUIT, dtype=np.intp)
+    TRICK_RANK_TABLE = np.array(TRICK_RANK, dtype=np.int8)
+
+
+class Batch:
+    """Hands in the middle of play, one per row."""
+    def __init__(self, hands, trump, turn, maker, sitting=None, trick=None,
+                 leader=None, trick_score=None):
+        require_numpy('rollouts')
+        self.hands = np.array(hands, dtype=np.uint32)
+        size = len(self.hands)
+        self.rows = np.arange(size)
+        self.trump = np.array(trump, dtype=np.intp)
+        self.turn = np.array(turn, dtype=np.intp)
+        self.maker = np.array(maker, dtype=np.intp)
+        self.sitting = (np.full(size, -1, dtype=np.intp) if sitting is None
+                        else np.array(sitting, dtype=np.intp))
+        self.trick = (np.full((size, 4), -1, dtype=np.intp) if trick is None
+                      else np.array(trick, dtype=np.intp))
+        self.leader = (self.turn.copy() if leader is None
+                       else np.array(leader, dtype=np.intp))
+        self.trick_score = (np.zeros((size, 2), dtype=np.intp)
+                            if trick_score is None
+                            else np.array(trick_score, dtype=np.intp))
+
+    def __len__(self):
+        return len(self.rows)
+
+    @classmethod
+    def from_phases(cls, phases):
+        """Return a batch of the hands being played in PlayCardsPhases."""
+        trick = [[-1] * 4 for _ in phases]
+        for row, phase in enumerate(phases):
+            for seat, card in phase.trick.cards.items():
+                trick[row][seat] = card.index
+        return cls([[hand_mask(hand) for hand in phase.hands]
+                    for phase in phases],
+                   [SUIT_INDEX[phase.trump] for phase in phases],
+                   [phase.turn for phase in phases],
+                   [phase.maker for phase in phases],
+                   [-1 if phase.sitting is None else phase.sitting
+                    for phase in phases],
+                   trick,
+                   [phase.trick.leader for phase in phases],
+                   [phase.trick_score for phase in phases])
+
+    @classmethod
+    def deal(cls, size, rng, alone=0.0):
+        """Return a batch of size random hands about to be led.
+
+        Trump, dealer and maker are random; the maker goes alone with
+        probability alone.
+        """
+        require_numpy('rollouts')
+        order = rng.random((size, NUM_CARDS)).argsort(axis=1)
+        cards = order[:, :20].reshape(size, 4, 5)
+        hands = np.bitwise_or.reduce(BITS[cards], axis=2)
+        dealer = rng.integers(0, 4, size)
+        maker = rng.integers(0, 4, size)
+        sitting = np.where(rng.random(size) < alone, (maker + 2) % 4, -1)
+        turn = (dealer + 1) % 4
+        turn = np.where(turn == sitting, (turn + 1) % 4, turn)
+        return cls(hands, rng.integers(0, 4, size), turn, maker, sitting)
+
+    def done(self):
+        """Return which rows have played all five tricks."""
+        return self.trick_score.sum(axis=1) == 5
+
+    def led_suit(self):
+        """Return each row's led suit, or trump for rows about to lead."""
+        led = self.trick[self.rows, self.leader]
+        return np.where(led < 0, self.trump,
+                        RELATIVE_SUIT_TABLE[self.trump, np.maximum(led, 0)])
+
+    def legal(self):
+        """Return the mask of cards the player to move in each row may play.
+        """
+        hand = self.hands[self.rows, self.turn]
+        leading = self.trick[self.rows, self.leader] < 0
+        follow = hand & SUIT_MASK_TABLE[self.trump, self.led_suit()]
+        return np.where(leading | (follow == 0), hand, follow)
+
+    def play(self, cards):
+        """Have the player to move in every unfinished row play cards[row].
+        """
+        rows = self.rows[~self.done()]
+        cards = np.asarray(cards)[rows]
+        turn = self.turn[rows]
+        sitting = self.sitting[rows]
+        self.hands[rows, turn] &= ~BITS[cards]
+        self.trick[rows, turn] = cards
+
+        following = (turn + 1) % 4
+        following = np.where(following == sitting, (following + 1) % 4,
+                             following)
+        full = (self.trick[rows] >= 0).sum(axis=1) == np.where(
+            sitting >= 0, 3, 4)
+        finished = rows[full]
+        if len(finished):
+            trick = self.trick[finished]
+            trump = self.trump[finished]
+            led = trick[np.arange(len(finished)), self.leader[finished]]
+            led_suit = RELATIVE_SUIT_TABLE[trump, led]
+            ranks = np.where(trick >= 0, TRICK_RANK_TABLE[
+                trump[:, None], led_suit[:, None], np.maximum(trick, 0)], -1)
+            winner = ranks.argmax(axis=1)
+            self.trick_score[finished, winner % 2] += 1
+            self.trick[finished] = -1
+            self.leader[finished] = winner
+            following[full] = winner
+        self.turn[rows] = following
+
+    def points(self):
+        """Return the points each team scores in each finished row."""
+        maker_team = self.maker % 2
+        tricks = self.trick_score[self.rows, maker_team]
+        alone = self.sitting >= 0
+        points = np.zeros((len(self), 2), dtype=np.intp)
+        points[self.rows, maker_team] = np.where(
+            tricks == 5, np.where(alone, 4, 2), np.where(tricks >= 3, 1, 0))
+        points[self.rows, 1 - maker_team] = np.where(tricks < 3, 2, 0)
+        return points
+
+
+def _legal_bits(legal):
+    return (legal[:, None] & BITS) != 0
+
+
+def random_policy(batch, legal, rng):
+    """Play a legal card uniformly at random."""
+    # Keys in [1, 2) for legal cards and 0 for the rest.
+    keys = rng.random((len(legal), NUM_CARDS), dtype=np.float32)
+    keys += 1
+    keys *= _legal_bits(legal)
+    return keys.argmax(axis=1)
+
+
+def lowest_policy(batch, legal, rng):
+    """Play the legal card with the lowest index."""
+    return _legal_bits(legal).argmax(axis=1)
+
+
+def highest_policy(batch, legal, rng):
+    """Play the legal card most likely to take the trick."""
+    ranks = TRICK_RANK_TABLE[batch.trump, batch.led_suit()].astype(np.int16)
+    ranks[~_legal_bits(legal)] = -1
+    return ranks.argmax(axis=1)
+
+
+def rollout(batch, policies, rng):
+    """Play out every row of batch and return the points of each.
+
+    policies is one policy for every seat or a sequence of one per seat;
+    in the latter case each is applied to the whole batch on every card and
+    the turn picks which result a row uses.
+    """
+    while not batch.done().all():
+        legal = batch.legal()
+        if callable(policies):
+            cards = policies(batch, legal, rng)
+        else:
+            cards = np.choose(batch.turn, [policy(batch, legal, rng)
+                                           for policy in policies])
+        batch.play(cards)
+    return batch.points()
+
+
+def benchmark(hands, batch_size, policy=random_policy, seed=0):
+    """Return the hands per second rollout plays at batch_size."""
+    rng = np.random.default_rng(seed)
+    elapsed = 0.0
+    done = 0
+    while done < hands:
+        size = min(batch_size, hands - done)
+        batch = Batch.deal(size, rng)
+        start = time.perf_counter()
+        rollout(batch, policy, rng)
+        elapsed += time.perf_counter() - start
+        done += size
+    return hands / elapsed
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Rollout throughput.")
+    parser.add_argument('--hands', type=int, default=1000000)
+    parser.add_argument('--batch', type=int, default=100000)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args(argv)
+    require_numpy('rollouts')
+    rate = benchmark(args.hands, args.batch, seed=args.seed)
+    print("{:,.0f} hands per minute".format(rate * 60))
+
+
+if __name__ == '__main__':
+    main()
@@ -1,8 +1,107 @@
+import argparse
+import asyncio
+import inspect
+import os
+import random
+import time
+import traceback
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import Process
+
 from autobahn.asyncio.wamp import ApplicationSession, ApplicationRunner
+from autobahn.wamp.types import PublishOptions, RegisterOptions
 from bidict import bidict
-from .game import Game, initial_game_state
-from .encoder import to_serializable
-from .objects import Card
+from .bot import MonteCarloBot, default_move
+from .game import Game, LiveGamePhase, initial_game_state
+from .dealing import Dealer
+from .encoder import (PROTOCOLS, changed_hands, decode_args, encode_args,
+                      encode_hand, move_event, state_patch, to_serializable,
+                      views)
+from .history import HandRecorder, HistoryWriter
+from .journal import (Journal, checkpoint_record, move_record, recover,
+                      snapshot_record)
+from .metrics import REGISTRY, dump_periodically, serve
+from .sharding import HashRing
+
+# Procedures every shard registers; the router spreads calls among them.
+SHARED = RegisterOptions(invoke='roundrobin')
+# Shared procedures that are told which session called them.
+CALLER = RegisterOptions(invoke='roundrobin', details_arg='details')
+
+# What players do through the player.{action} procedures.
+PLAYER_ACTIONS = ('perform_move', 'start_game', 'join_seat', 'set_name',
+                  'set_protocol', 'change_seat', 'join_table', 'snapshot',
+                  'legal_moves')
+
+TABLE_MOVE_SECONDS = REGISTRY.histogram(
+    'euchre_table_move_seconds',
+    "Time a table takes to handle a move, publishing included.")
+GAME_MOVE_SECONDS = REGISTRY.histogram(
+    'euchre_game_move_seconds', "Time the game takes to apply a move.")
+PUBLISH_STATE_SECONDS = REGISTRY.histogram(
+    'euchre_publish_state_seconds',
+    "Time to encode and publish one change of game state.")
+PUBLISH_SECONDS = REGISTRY.histogram(
+    'euchre_publish_seconds', "Time to publish one message.")
+MOVES = REGISTRY.counter('euchre_moves_total', "Moves made.")
+PUBLISH_DEFERRED = REGISTRY.counter(
+    'euchre_publish_deferred_total',
+    "Flushes put off because the transport was backed up.")
+MOVE_ERRORS = REGISTRY.counter(
+    'euchre_move_errors_total', "Moves refused, by exception type.",
+    ['exception'])
+PUBLISH_ERRORS = REGISTRY.counter(
+    'euchre_publish_errors_total',
+    "Tables that failed to publish their state, by exception type.",
+    ['exception'])
+BOT_ERRORS = REGISTRY.counter(
+    'euchre_bot_errors_total',
+    "Bot turns that failed and fell back on a default move, by exception "
+    "type.", ['exception'])
+
+
+class PublishQueue:
+    """Publishes the state of changed tables once per event loop tick.
+
+    Tables call schedule() whenever their state changes; on the next tick
+    each of them publishes everything that changed since it last did, so a
+    burst of moves at a table (a trick completing and the next being led,
+    say) goes out as one message. While backlog() reports more than
+    high_water bytes waiting to be sent, flushing is put off by retry_delay
+    seconds at a time, so slow transports see fewer, larger updates instead
+    of a growing queue. A table that fails to publish is counted and logged
+    without holding up the others.
+    """
+    def __init__(self, backlog=lambda: 0, high_water=1 << 20,
+                 retry_delay=0.01):
+        self.backlog = backlog
+        self.high_water = high_water
+        self.retry_delay = retry_delay
+        self.tables = {}
+        self.scheduled = False
+
+    def schedule(self, table):
+        self.tables[table.table_id] = table
+        if not self.scheduled:
+            self.scheduled = True
+            asyncio.get_event_loop().call_soon(self.flush)
+
+    def flush(self):
+        """Publish every scheduled table, unless the transport is backed up.
+        """
+        if self.backlog() > self.high_water:
+            PUBLISH_DEFERRED.inc()
+            asyncio.get_event_loop().call_later(self.retry_delay, self.flush)
+            return
+        self.scheduled = False
+        tables, self.tables = self.tables, {}
+        for table in tables.values():
+            try:
+                table.flush_state()
+            except Exception as error:
+                PUBLISH_ERRORS.inc(type(error).__name__)
+                print("Table {} failed to publish:".format(table.table_id))
+                traceback.print_exc()
 
 
 class GameLayer:
@@ -13,22 +112,243 @@ class GameLayer:
     def state(self):
         return self.game.state
 
+    def parse_args(self, move, args):
+        """Turn the wire form of a move's arguments into game objects."""
+        return decode_args(move, args)
+
+    @GAME_MOVE_SECONDS.time
     def perform_move(self, move, player, *args):
-        if move == 'call_two':
-            alone = args[0]
-            suit = Card.suit_map[args[1]]
-            return self.game.perform_move(move, player, alone, suit)
-        if move == 'discard' or move == 'play':
-            card = Card.from_str(args[0])
-            return self.game.perform_move(move, player, card)
+        """Make move for player, with arguments already parsed."""
         return self.game.perform_move(move, player, *args)
 
 
 class Lobby:
-    def __init__(self, coordinator):
+    """A single table: four seats and the game being played at them.
+
+    Everything a table publishes or registers is namespaced under
+    table{id}.
+
+    Changes of game state are published through the coordinator's
+    PublishQueue, and every publication bumps the table's version. The
+    publicstate topic carries a full snapshot for a new game and otherwise a
+    patch of the fields that changed, along with the moves that caused it.
+    Each seat's hand is published on the hand topic only to the session of
+    the player sitting there, and only when it changes. A client that
+    misses a version calls player.snapshot to catch up.
+
+    Players who negotiated the compact protocol get the same messages in
+    compact form on topics suffixed with .compact.
+
+    If the coordinator keeps a journal, the table records its games there,
+    with a snapshot every snapshot_interval moves. If it keeps a hand
+    history, the table writes each finished hand to it.
+    """
+    snapshot_interval = 64
+
+    def __init__(self, coordinator, table_id, name):
         self.coordinator = coordinator
+        self.table_id = table_id
+        self.name = name
         self.game = None
         self.seats_to_players = bidict()
+        self.registrations = []
+        self.guests = {}
+        self.closed = False
+        self.version = 0
+        self.published = None
+        self.events = []
+        self.moves_since_snapshot = 0
+        self.seed = None
+        self.recorder = HandRecorder()
+
+    def journal(self, record):
+        journal = self.coordinator.journal
+        if journal is not None:
+            journal.append(record)
+
+    def describe(self):
+        """Return journal records from which recovery rebuilds this table."""
+        records = [{'event': 'create', 'table': self.table_id,
+                    'name': self.name}]
+        if self.game is not None:
+            records.append({'event': 'start', 'table': self.table_id,
+                            'seed': self.seed})
+            records.append(snapshot_record(self.table_id, self.game.state))
+        return records
+
+    def uri(self, name):
+        return 'table{t}.{name}'.format(t=self.table_id, name=name)
+
+    @PUBLISH_SECONDS.time
+    def publish(self, topic, *args, **kwargs):
+        self.coordinator.publish(self.uri(topic), *args, **kwargs)
+
+    def publish_state(self, seat=None, move=None, args=(), before=None):
+        """Have the current state published on the next tick.
+
+        seat, move and args describe the move that led to the new state
+        from before.
+        """
+        if move is not None:
+            self.events.append((before, seat, move, args))
+        self.coordinator.publish_queue.schedule(self)
+
+    @PUBLISH_STATE_SECONDS.time
+    def flush_state(self):
+        """Publish what changed since the last published state."""
+        if self.closed or self.game is None:
+            return
+        old, state = self.published, self.game.state
+        events, self.events = self.events, []
+        self.version += 1
+        self.published = state
+        protocols = {'string'}
+        protocols.update(player.protocol
+                         for player in self.seats_to_players.values())
+        hands = {}
+        for protocol in protocols:
+            message = {'version': self.version}
+            if old is None:
+                message['snapshot'], hands[protocol] = views(state, protocol)
+            else:
+                view = 'compact' if protocol == 'compact' else 'public'
+                message['patch'], removed = state_patch(old, state, view)
+                if removed:
+                    message['removed'] = removed
+                if events:
+                    message['events'] = [
+                        move_event(before, seat, move, args, protocol)
+                        for before, seat, move, args in events]
+            self.publish(topic('publicstate', protocol), message)
+        for seat in changed_hands(old, state):
+            player = self.seats_to_players.get(seat)
+            if player is None or player.session_id is None:
+                continue
+            if hands.get(player.protocol):
+                hand = hands[player.protocol][seat]
+            else:
+                hand = encode_hand(state.hands[seat], player.protocol)
+            self.publish(topic('hand', player.protocol),
+                         {'version': self.version, 'hand': hand},
+                         options=PublishOptions(
+                             eligible=[player.session_id]))
+
+    def snapshot(self, player_id=None, protocol='string'):
+        """Return the current version, public state and player_id's hand.
+
+        Clients reach this through player.snapshot, which supplies the
+        calling player's id.
+        """
+        state = self.published
+        result = {'version': self.version, 'state': None, 'hand': None}
+        if state is None:
+            return result
+        result['state'], hands = views(state, protocol)
+        seats = self.get_seats()
+        if player_id in seats and hands:
+            result['hand'] = hands[seats.index(player_id)]
+        return result
+
+    def legal_moves(self, player_id, protocol='string'):
+        """Return the [move, args] pairs player_id may make now.
+
+        The list is empty unless it is player_id's turn. Clients reach this
+        through player.legal_moves, which supplies the calling player's id.
+        """
+        state = self.published
+        seats = self.get_seats()
+        if (not isinstance(state, LiveGamePhase) or player_id not in seats or
+                state.turn != seats.index(player_id)):
+            return []
+        return [[move, encode_args(args, protocol)]
+                for move, args in state.legal_moves()]
+
+    async def register(self):
+        """Register this table's procedures with the router.
+
+        Besides what clients call directly, these include the procedures
+        other shards use on behalf of their players. Those are registered
+        under the shard prefix, which the router lets only the server call.
+        """
+        procedures = [
+            (self.get_seats, 'seats'),
+            (self.add_bot, 'add_bot'),
+        ]
+        shard_procedures = [
+            (self.guest_join_seat, 'join_seat'),
+            (self.guest_change_seat, 'change_seat'),
+            (self.guest_perform_move, 'perform_move'),
+            (self.snapshot, 'snapshot'),
+            (self.legal_moves, 'legal_moves'),
+            (self.start_game, 'start_game'),
+            (self.close_self, 'close'),
+        ]
+        uris = ([(procedure, self.uri(name))
+                 for procedure, name in procedures] +
+                [(procedure, 'shard.' + self.uri(name))
+                 for procedure, name in shard_procedures])
+        for procedure, uri in uris:
+            self.registrations.append(
+                await self.coordinator.register(procedure, uri))
+
+    def guest(self, player_id, name=None):
+        """Return the local stand-in for a player homed on another shard."""
+        player = self.coordinator.players.get(player_id)
+        if player is None:
+            player = self.guests.get(player_id)
+        if player is None:
+            player = self.guests[player_id] = Player(player_id, name,
+                                                     self.coordinator)
+        return player
+
+    def guest_join_seat(self, player_id, name, seat, protocol='string',
+                        session_id=None):
+        player = self.guest(player_id, name)
+        player.protocol = protocol
+        player.session_id = session_id
+        self.join_seat(player, seat)
+
+    def guest_change_seat(self, player_id, seat):
+        self.change_seat(self.guest(player_id), seat)
+
+    def guest_perform_move(self, player_id, move, *args):
+        self.perform_move(move, self.guest(player_id), *args)
+
+    async def close_self(self):
+        await self.coordinator.tables.close_table(self.table_id)
+
+    async def close(self):
+        """Unregister this table's procedures and unseat its players.
+
+        Players whose session has left, bots among them, are dropped.
+        """
+        for registration in self.registrations:
+            await registration.unregister()
+        self.registrations = []
+        self.closed = True
+        players = list(self.seats_to_players.values())
+        self.seats_to_players.clear()
+        self.guests.clear()
+        coordinator = self.coordinator
+        for player in players:
+            if coordinator.players.get(player.player_id) is player:
+                if player.session_id is None:
+                    coordinator.drop_player(player)
+            else:
+                # Player ids are striped by shard; see new_player_id.
+                await coordinator.call('shard{n}.release'.format(
+                    n=player.player_id % coordinator.shards),
+                    player.player_id)
+        self.game = None
+        self.published = None
+
+    def add_bot(self, seat):
+        self.check_seat_open(seat)
+        self.join_seat(self.coordinator.add_bot(seat), seat)
+
+    def bots(self):
+        return [player for player in self.seats_to_players.values()
+                if isinstance(player, BotPlayer)]
 
     def change_seat(self, player, seat):
         self.join_seat(player, seat)
@@ -49,7 +369,8 @@ class Lobby:
     def join_seat(self, player, seat):
         self.check_seat_open(seat)
         self.seats_to_players[seat] = player
-        self.coordinator.publish('seats', {seat: player.player_id})
+        player.table = self
+        self.publish('seats', {seat: player.player_id})
         print("Seat {} joined by player {}", seat, player.name)
 
     def leave_seat(self, player):
@@ -57,18 +378,65 @@ class Lobby:
             raise RuntimeError("Not in the middle of a game!")
         seat = self.seats_to_players.inv[player]
         del self.seats_to_players.inv[player]
-        self.coordinator.publish('seats', {seat: None})
+        self.publish('seats', {seat: None})
 
+    @TABLE_MOVE_SECONDS.time
     def perform_move(self, move, player, *args, **kwargs):
-        self.game.perform_move(move, self.seats_to_players.inv[player], *args,
-                               **kwargs)
-        self.coordinator.publish_state()
+        state = self.game.state
+        seat = self.seats_to_players.inv[player]
+        try:
+            parsed = self.game.parse_args(move, args)
+            self.game.perform_move(move, seat, *parsed, **kwargs)
+        except Exception as error:
+            MOVE_ERRORS.inc(type(error).__name__)
+            raise
+        MOVES.inc()
+        self.journal(move_record(self.table_id, seat, move, parsed))
+        history = self.coordinator.history
+        if history is not None:
+            row = self.recorder.record(state, move, parsed, self.game.state)
+            if row is not None:
+                history.append(row)
+        self.moves_since_snapshot += 1
+        if (self.moves_since_snapshot >= self.snapshot_interval and
+                isinstance(self.game.state, LiveGamePhase)):
+            self.journal(snapshot_record(self.table_id, self.game.state))
+            self.moves_since_snapshot = 0
+        for bot_player in self.bots():
+            bot_player.bot.observe(state, move, parsed)
+        self.publish_state(seat, move, parsed, state)
+        self.schedule_bot()
+
+    def schedule_bot(self):
+        """Have the bot whose turn it is, if any, start choosing a move."""
+        state = self.game.state
+        player = self.seats_to_players.get(getattr(state, 'turn', None))
+        if isinstance(player, BotPlayer):
+            asyncio.ensure_future(player.take_turn(state))
 
     def start_game(self):
         if len(self.seats_to_players) != 4:
             raise RuntimeError("Not enough players.")
-        self.game = GameLayer(Game(initial_game_state()))
-        self.coordinator.publish_state()
+        seed = self.seed = random.getrandbits(64)
+        self.journal({'event': 'start', 'table': self.table_id, 'seed': seed})
+        self.recorder = HandRecorder(seed)
+        self.resume(initial_game_state(Dealer(seed)))
+
+    def resume(self, state):
+        """Play on from state, announcing it with a fresh snapshot."""
+        self.game = GameLayer(Game(state))
+        self.moves_since_snapshot = 0
+        self.published = None
+        self.events = []
+        self.publish_state()
+        self.schedule_bot()
+
+
+def topic(name, protocol):
+    """Return the topic carrying name in protocol."""
+    if protocol == 'string':
+        return name
+    return '{name}.{protocol}'.format(name=name, protocol=protocol)
 
 
 class Player:
@@ -79,83 +447,514 @@ class Player:
         self.player_id = player_id
         self.name = name
         self.coordinator = coordinator
+        self.table = None
+        self.protocol = 'string'
+        self.session_id = None
+
+    @property
+    def current_table(self):
+        if self.table is None or self.table.closed:
+            raise RuntimeError("Not at a table.")
+        return self.table
 
     def change_seat(self, lobby_id, seat):
-        self.coordinator.lobby.change_seat(self, seat)
+        return self.coordinator.tables.get(lobby_id).change_seat(self, seat)
 
     def join_seat(self, seat):
-        self.coordinator.lobby.join_seat(self, seat)
+        return self.current_table.join_seat(self, seat)
+
+    async def seated(self):
+        """Return whether this player holds a seat at an open table."""
+        table = self.table
+        if table is None or table.closed:
+            return False
+        seats = table.get_seats()
+        if inspect.isawaitable(seats):
+            seats = await seats
+        return self.player_id in seats
+
+    def join_table(self, table_id):
+        self.table = self.coordinator.tables.get(table_id)
 
     def perform_move(self, move, *args, **kwargs):
-        self.coordinator.lobby.perform_move(move, self, *args, **kwargs)
+        return self.current_table.perform_move(move, self, *args, **kwargs)
+
+    def snapshot(self):
+        """Return the state of this player's table, with its hand."""
+        return self.current_table.snapshot(self.player_id, self.protocol)
+
+    def legal_moves(self):
+        """Return the moves this player may make now."""
+        return self.current_table.legal_moves(self.player_id, self.protocol)
+
+    def set_protocol(self, *protocols):
+        """Use the first of protocols the server knows; return the choice.
+
+        Players who name none the server knows keep the string protocol.
+        """
+        self.protocol = next(
+            (protocol for protocol in protocols if protocol in PROTOCOLS),
+            'string')
+        return self.protocol
 
     def set_name(self, name):
         self.name = name
         self.coordinator.publish('players', {self.player_id: name})
 
     def start_game(self):
-        self.coordinator.lobby.start_game()
+        return self.current_table.start_game()
+
+
+class BotPlayer(Player):
+    def __init__(self, player_id, name, coordinator, seat):
+        super().__init__(player_id, name, coordinator)
+        self.bot = MonteCarloBot(seat, executor=coordinator.bot_executor,
+                                 workers=coordinator.bot_workers)
+
+    async def take_turn(self, state):
+        """Choose a move off the event loop, then play it.
+
+        If choosing fails or the table refuses the move, the error is logged
+        and the bot plays a default move instead, so the table is not left
+        waiting on it.
+        """
+        loop = asyncio.get_event_loop()
+        deadline = time.time() + self.bot.time_budget
+        fallback = default_move(state, state.legal_moves())
+        try:
+            chosen = await loop.run_in_executor(
+                None, self.bot.choose_move, state, deadline)
+        except Exception as error:
+            self.log_error(error, "failed to choose a move")
+            chosen = fallback
+        for move, args in (chosen, fallback):
+            if not self.playing(state):
+                return
+            try:
+                self.perform_move(move, *to_serializable(args))
+                return
+            except Exception as error:
+                self.log_error(error, "had {} refused".format(move))
+
+    def playing(self, state):
+        """Return whether state is still the one in play at our table."""
+        return not self.table.closed and self.table.game.state is state
+
+    def log_error(self, error, what):
+        BOT_ERRORS.inc(type(error).__name__)
+        print("Bot {} {}:".format(self.player_id, what))
+        traceback.print_exc()
+
+
+class RemoteTable:
+    """A table owned by another shard, reached through its procedures."""
+    closed = False
+
+    def __init__(self, coordinator, table_id):
+        self.coordinator = coordinator
+        self.table_id = table_id
+
+    def call(self, name, *args):
+        return self.coordinator.call(
+            'shard.table{t}.{name}'.format(t=self.table_id, name=name), *args)
+
+    def change_seat(self, player, seat):
+        return self.call('change_seat', player.player_id, seat)
+
+    def get_seats(self):
+        return self.coordinator.call(
+            'table{t}.seats'.format(t=self.table_id))
+
+    def join_seat(self, player, seat):
+        return self.call('join_seat', player.player_id, player.name, seat,
+                         player.protocol, player.session_id)
+
+    def perform_move(self, move, player, *args):
+        return self.call('perform_move', player.player_id, move, *args)
+
+    def snapshot(self, player_id, protocol):
+        return self.call('snapshot', player_id, protocol)
+
+    def legal_moves(self, player_id, protocol):
+        return self.call('legal_moves', player_id, protocol)
+
+    def start_game(self):
+        return self.call('start_game')
+
+
+class TableManager:
+    """All of the tables hosted by one Coordinator, by id.
+
+    With several shards, each only creates the tables that hash to it and
+    hands out RemoteTables for the rest.
+    """
+    def __init__(self, coordinator, shard=0, shards=1):
+        self.coordinator = coordinator
+        self.shard = shard
+        self.ring = HashRing(shards)
+        self.tables = {}
+        self.table_count = 0
+
+    def owns(self, table_id):
+        return self.ring.shard_for(table_id) == self.shard
+
+    def get(self, table_id):
+        if table_id in self.tables:
+            return self.tables[table_id]
+        if self.owns(table_id):
+            raise RuntimeError("No such table.")
+        return RemoteTable(self.coordinator, table_id)
+
+    def next_table_id(self):
+        """Return the next unused table id that hashes to this shard."""
+        while not self.owns(self.table_count):
+            self.table_count += 1
+        table_id = self.table_count
+        self.table_count += 1
+        return table_id
+
+    async def create_table(self, name=None):
+        table_id = self.next_table_id()
+        if name is None:
+            name = "Table {}".format(table_id)
+        table = await self.add_table(table_id, name)
+        table.journal({'event': 'create', 'table': table_id, 'name': name})
+        return table_id
+
+    async def add_table(self, table_id, name):
+        table = Lobby(self.coordinator, table_id, name)
+        self.tables[table_id] = table
+        await table.register()
+        self.coordinator.publish('tables', {table_id: name})
+        return table
+
+    async def recover(self, journal):
+        """Reopen the tables journal says are open, mid-game if need be.
+
+        No table id the journal has seen is handed out again.
+        """
+        tables, next_table_id = recover(journal)
+        self.table_count = max(self.table_count, next_table_id)
+        for table_id, record in sorted(tables.items()):
+            table = await self.add_table(table_id, record.name)
+            state = record.replay()
+            if state is not None:
+                table.seed = record.seed
+                table.recorder = HandRecorder(record.seed)
+                table.resume(state)
+
+    def describe(self):
+        """Return journal records from which recovery rebuilds every table.
+        """
+        records = [checkpoint_record(self.table_count)]
+        for table in self.tables.values():
+            records.extend(table.describe())
+        return records
+
+    async def close_table(self, table_id):
+        if not self.owns(table_id):
+            return await RemoteTable(self.coordinator, table_id).call('close')
+        table = self.tables.pop(table_id, None)
+        if table is None:
+            raise RuntimeError("No such table.")
+        await table.close()
+        table.journal({'event': 'close', 'table': table_id})
+        self.coordinator.publish('tables', {table_id: None})
+
+    def list_tables(self):
+        return {table_id: table.name
+                for table_id, table in self.tables.items()}
 
 
 class Coordinator(ApplicationSession):
+    """The WAMP session for one shard of the server.
+
+    The shard index and shard count come from the session config's extra
+    dict; by default a single Coordinator serves everything. If extra names
+    a journal directory, each shard journals its tables to a subdirectory
+    of it and reopens them from there when it starts. If it names a history
+    directory, each shard appends finished hands to a history file there.
+
+    Metrics are served over HTTP on metrics_port plus the shard index, if
+    extra gives a metrics_port, and written to shard{n}.prom in a
+    metrics_dump directory every metrics_interval seconds, if it gives one.
+    metrics_sample times only one hot call in that many.
+
+    Players act through the shared player.{action} procedures, which find
+    the calling session's Player by its session id.
+    """
+    bot_workers = 4
+    journal = None
+    history = None
+
+    def add_bot(self, seat):
+        player_id = self.new_player_id()
+        name = "Bot {}".format(player_id)
+        player = BotPlayer(player_id, name, self, seat)
+        self.players[player_id] = player
+        self.publish('players', {player_id: name})
+        return player
+
     def get_players(self):
         return {
             player_id: player.name
             for player_id, player in self.players.items()
         }
 
-    def get_seats(self):
-        return self.lobby.get_seats()
-
-    def publish_state(self):
-        serializable_state = to_serializable(self.lobby.game.state)
-        if 'hands' in serializable_state:
-            serializable_state['hands'] = [
-                len(hand) for hand in serializable_state['hands']
-            ]
-        self.publish('publicstate', serializable_state)
-        for seat, player in self.lobby.seats_to_players.items():
-            self.publish(
-                'hands.player{pn}'.format(pn=player.player_id),
-                to_serializable(self.lobby.game.state.hands[seat]))
+    async def gather_shards(self, name, local):
+        """Merge the dicts procedure shard{n}.name returns on every shard."""
+        merged = dict(local())
+        others = [shard for shard in range(self.shards) if shard != self.shard]
+        for result in await asyncio.gather(*[
+                self.call('shard{n}.{name}'.format(n=shard, name=name))
+                for shard in others]):
+            merged.update(result)
+        return merged
+
+    async def sync_journal(self):
+        """Sync and compact the journal regularly, off the event loop."""
+        while self.journal.file is not None:
+            await asyncio.sleep(self.journal.sync_interval)
+            await self.journal.maintain()
+
+    def backlog(self):
+        """Return the number of bytes waiting to be sent to the router."""
+        transport = getattr(self._transport, 'transport', None)
+        if transport is None:
+            return 0
+        return transport.get_write_buffer_size()
+
+    def add_gauges(self):
+        """Report this shard's tables, games and players as gauges."""
+        tables = self.tables.tables
+        REGISTRY.gauge('euchre_tables', "Open tables.", lambda: len(tables))
+        REGISTRY.gauge('euchre_games',
+                       "Tables with a game in progress.",
+                       lambda: sum(table.game is not None
+                                   for table in tables.values()))
+        REGISTRY.gauge('euchre_players', "Players, bots included.",
+                       lambda: len(self.players))
+
+    async def start_metrics(self, extra):
+        REGISTRY.sample_every = extra.get('metrics_sample') or 1
+        self.add_gauges()
+        if extra.get('metrics_port') is not None:
+            await serve(port=extra['metrics_port'] + self.shard)
+        if extra.get('metrics_dump') is not None:
+            os.makedirs(extra['metrics_dump'], exist_ok=True)
+            path = os.path.join(extra['metrics_dump'],
+                                'shard{n}.prom'.format(n=self.shard))
+            asyncio.ensure_future(dump_periodically(
+                path, extra.get('metrics_interval') or 10.0))
+
+    def home_shard(self, session_id):
+        """Return the shard keeping the player who joined from session_id.
+        """
+        return session_id % self.shards
+
+    def caller(self, details):
+        if details is None or details.caller is None:
+            raise RuntimeError("The router does not disclose callers.")
+        return details.caller
+
+    async def join_server(self, name=None, details=None):
+        session_id = self.caller(details)
+        shard = self.home_shard(session_id)
+        if shard != self.shard:
+            return await self.call('shard{n}.join'.format(n=shard),
+                                   session_id, name)
+        return self.add_player(session_id, name)
+
+    def add_player(self, session_id, name=None):
+        """Make a new player for session_id; return its id and name."""
+        player_id = self.new_player_id()
+        if name is None:
+            name = "Player {}".format(player_id)
+        player = Player(player_id, name, self)
+        player.session_id = session_id
+        self.players[player_id] = player
+        self.sessions[session_id] = player
+        self.publish('players', {player_id: name})
+        return player_id, name
+
+    async def act(self, session_id, action, *args):
+        """Have the player who joined from session_id perform action."""
+        if action not in PLAYER_ACTIONS:
+            raise RuntimeError("No such action.")
+        player = self.sessions.get(session_id)
+        if player is None:
+            raise RuntimeError("Not joined.")
+        result = getattr(player, action)(*args)
+        if inspect.isawaitable(result):
+            result = await result
+        return result
+
+    def dispatcher(self, action):
+        """Return the procedure for player.{action}.
+
+        It acts for the calling session's player, on that player's home
+        shard.
+        """
+        async def dispatch(*args, details=None):
+            session_id = self.caller(details)
+            shard = self.home_shard(session_id)
+            if shard != self.shard:
+                return await self.call('shard{n}.act'.format(n=shard),
+                                       session_id, action, *args)
+            return await self.act(session_id, action, *args)
+        return dispatch
+
+    async def forget_session(self, session_id, *args):
+        """Drop a departed session and its player.
+
+        A player holding a seat keeps it, and is dropped when the table
+        closes.
+        """
+        player = self.sessions.pop(session_id, None)
+        if player is None:
+            return
+        player.session_id = None
+        if not await player.seated():
+            self.drop_player(player)
+
+    def drop_player(self, player):
+        if self.players.pop(player.player_id, None) is not None:
+            self.publish('players', {player.player_id: None})
+
+    def release_player(self, player_id):
+        """Drop player_id, unseated by another shard, if its session left.
+        """
+        player = self.players.get(player_id)
+        if player is not None and player.session_id is None:
+            self.drop_player(player)
+
+    async def register_players(self):
+        """Register join_server and one dispatcher for each player action.
+
+        The router must disclose callers to these procedures. Each player
+        is kept by the shard its session id picks, so joining costs no
+        registrations and the router's registrations do not grow with the
+        number of players. The procedures the dispatchers forward to are
+        under the shard prefix, which the router lets only the server call.
+        """
+        await self.register(self.join_server, 'join_server', CALLER)
+        for action in PLAYER_ACTIONS:
+            await self.register(self.dispatcher(action),
+                                'player.{}'.format(action), CALLER)
+        await self.register(self.add_player,
+                            'shard{n}.join'.format(n=self.shard))
+        await self.register(self.act, 'shard{n}.act'.format(n=self.shard))
+        await self.register(self.release_player,
+                            'shard{n}.release'.format(n=self.shard))
+        await self.subscribe(self.forget_session, 'wamp.session.on_leave')
+
+    def onLeave(self, details):
+        if self.journal is not None:
+            self.journal.close()
+        if self.history is not None:
+            self.history.close()
+        super().onLeave(details)
+
+    def new_player_id(self):
+        """Return a player id no other shard will hand out."""
+        player_id = self.player_count * self.shards + self.shard
+        self.player_count += 1
+        return player_id
 
     async def onJoin(self, details):
         print("session joined")
         print("Details: {}".format(details))
 
+        extra = self.config.extra or {}
+        self.shard = extra.get('shard', 0)
+        self.shards = extra.get('shards', 1)
         self.players = dict()
+        self.sessions = dict()
         self.player_count = 0
-        self.lobby = Lobby(self)
-
-        async def join_server(name=None):
-            player_id = self.player_count
-            if name is None:
-                name = "Player {}".format(player_id)
-            self.player_count += 1
-            player = Player(player_id, name, self)
-            self.players[player_id] = player
-            self.publish('players', {player_id: name})
-
-            await self.register(
-                player.perform_move,
-                'player{n}.perform_move'.format(n=player_id))
-            await self.register(
-                player.start_game, 'player{n}.start_game'.format(n=player_id))
-            await self.register(
-                player.join_seat, 'player{n}.join_seat'.format(n=player_id))
-            await self.register(
-                player.set_name, 'player{n}.set_name'.format(n=player_id))
-            await self.register(
-                player.change_seat,
-                'player{n}.change_seat'.format(n=player_id))
-
-            return player_id, name
-
-        await self.register(join_server, 'join_server')
-        await self.register(self.get_players, 'players')
-        await self.register(self.get_seats, 'seats')
+        self.tables = TableManager(self, self.shard, self.shards)
+        self.publish_queue = PublishQueue(self.backlog)
+        self.bot_executor = ProcessPoolExecutor(self.bot_workers)
+        await self.start_metrics(extra)
+        if extra.get('journal') is not None:
+            self.journal = Journal(os.path.join(
+                extra['journal'], 'shard{n}'.format(n=self.shard)),
+                background=True)
+            await self.tables.recover(self.journal)
+            self.journal.describe = self.tables.describe
+            await self.journal.compact()
+            asyncio.ensure_future(self.sync_journal())
+        if extra.get('history') is not None:
+            os.makedirs(extra['history'], exist_ok=True)
+            self.history = HistoryWriter(os.path.join(
+                extra['history'], 'shard{n}.hands'.format(n=self.shard)),
+                chunk_size=1024)
+
+        async def players():
+            return await self.gather_shards('players', self.get_players)
+
+        async def tables():
+            return await self.gather_shards('tables', self.tables.list_tables)
+
+        await self.register_players()
+        await self.register(players, 'players', SHARED)
+        await self.register(self.tables.create_table, 'create_table', SHARED)
+        await self.register(self.tables.close_table, 'close_table', SHARED)
+        await self.register(tables, 'tables', SHARED)
+        await self.register(self.get_players,
+                            'shard{n}.players'.format(n=self.shard))
+        await self.register(self.tables.list_tables,
+                            'shard{n}.tables'.format(n=self.shard))
+
+
+def run_shard(url, realm, shard, shards, **options):
+    """Run one shard; options go into its session config's extra."""
+    extra = dict(options, shard=shard, shards=shards)
+    runner = ApplicationRunner(url=url, realm=realm, extra=extra)
+    runner.run(Coordinator)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run the game server.")
+    parser.add_argument('--url', default=u"ws://localhost:8081/ws",
+                        help="the router's transport for the server role")
+    parser.add_argument('--realm', default=u"realm1")
+    parser.add_argument('--shards', type=int, default=1,
+                        help="number of shard processes in the cluster")
+    parser.add_argument('--shard', type=int, default=None,
+                        help="run only this shard (default: all of them)")
+    parser.add_argument('--journal', default=None,
+                        help="directory to journal tables to and recover "
+                        "them from")
+    parser.add_argument('--history', default=None,
+                        help="directory to write hand histories to")
+    parser.add_argument('--metrics-port', type=int, default=None,
+                        help="serve metrics over HTTP from this port, plus "
+                        "the shard index")
+    parser.add_argument('--metrics-dump', default=None,
+                        help="directory to write metrics to periodically")
+    parser.add_argument('--metrics-interval', type=float, default=10.0,
+                        help="seconds between metrics dumps")
+    parser.add_argument('--metrics-sample', type=int, default=1,
+                        help="time one hot call in this many")
+    args = parser.parse_args(argv)
+
+    options = {'journal': args.journal, 'history': args.history,
+               'metrics_port': args.metrics_port,
+               'metrics_dump': args.metrics_dump,
+               'metrics_interval': args.metrics_interval,
+               'metrics_sample': args.metrics_sample}
+    if args.shard is not None:
+        run_shard(args.url, args.realm, args.shard, args.shards, **options)
+        return
+    processes = [Process(target=run_shard,
+                         args=(args.url, args.realm, shard, args.shards),
+                         kwargs=options)
+                 for shard in range(args.shards)]
+    for process in processes:
+        process.start()
+    for process in processes:
+        process.join()
 
 
 if __name__ == '__main__':
-    runner = ApplicationRunner(url=u"ws://localhost:8080/ws", realm=u"realm1")
-    runner.run(Coordinator)
+    main()
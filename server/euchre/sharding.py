@@ -0,0 +1,38 @@
+"""Consistent hashing of tables onto server shards.
+
+Each Coordinator worker process is one shard. A table belongs to the shard
+its id hashes to on the ring, and only that shard creates it and registers
+its procedures, so the router delivers every call for a table to the process
+holding it.
+
+The load test in the loadtest module measures how throughput scales with
+the number of shards, through the router.
+"""
+import bisect
+import hashlib
+
+
+def _hash(key):
+    digest = hashlib.md5(str(key).encode()).digest()
+    return int.from_bytes(digest[:8], 'big')
+
+
+class HashRing:
+    """A consistent hash ring over a number of shards.
+
+    Every shard gets replicas points on the ring; a key belongs to the shard
+    owning the first point at or after the key's hash. Adding a shard only
+    moves about 1/shards of the keys.
+    """
+    def __init__(self, shards, replicas=64):
+        self.shards = shards
+        points = sorted((_hash('{}:{}'.format(shard, replica)), shard)
+                        for shard in range(shards)
+                        for replica in range(replicas))
+        self.hashes = [point for point, _ in points]
+        self.owners = [shard for _, shard in points]
+
+    def shard_for(self, key):
+        """Return the shard that owns key."""
+        index = bisect.bisect(self.hashes, _hash(key)) % len(self.hashes)
+        return self.owners[index]
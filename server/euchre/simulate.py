@@ -0,0 +1,205 @@
+"""Play complete games headlessly, for tuning bots and validating rules.
+
+Run from the server directory with::
+
+    $ python -m euchre.simulate --games 100000 --workers 8
+
+Each seat is driven by a policy: a callable taking the current phase and a
+``random.Random`` and returning a ``(move, args)`` pair suitable for
+``Game.perform_move``. Policies with an ``observe(state, move, args)`` method
+are shown every move made at the table. Policies are sent to worker
+processes, so they must be picklable (module-level functions are).
+"""
+import argparse
+import random
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from .dealing import Dealer
+from .history import HandRecorder, HistoryWriter, history_array
+from .game import Game, GameOver, PlayCardsPhase, initial_game_state
+
+
+def random_policy(state, rng):
+    """Pick uniformly among the legal moves."""
+    return rng.choice(state.legal_moves())
+
+
+def passive_policy(state, rng):
+    """Never bid unless forced to; play a random legal card."""
+    moves = state.legal_moves()
+    if ('pass_bid', ()) in moves:
+        return ('pass_bid', ())
+    return rng.choice([m for m in moves if m[0] != 'call_two' or not m[1][0]])
+
+
+class Stats:
+    """Aggregate results of a number of simulated games."""
+    def __init__(self):
+        self.games = 0
+        self.wins = [0, 0]
+        self.hands = 0
+        self.points = [0, 0]
+        self.euchres = 0
+        self.loners = 0
+        self.loners_made = 0
+        self.loner_marches = 0
+
+    def merge(self, other):
+        """Add the counts from another Stats into this one."""
+        self.games += other.games
+        self.hands += other.hands
+        self.euchres += other.euchres
+        self.loners += other.loners
+        self.loners_made += other.loners_made
+        self.loner_marches += other.loner_marches
+        for team in range(2):
+            self.wins[team] += other.wins[team]
+            self.points[team] += other.points[team]
+        return self
+
+    def record_hand(self, maker, sitting, points):
+        """Record the outcome of a hand.
+
+        points is the pair of points scored by each team on the hand.
+        """
+        maker_team = maker % 2
+        self.hands += 1
+        for team in range(2):
+            self.points[team] += points[team]
+        if points[1 - maker_team]:
+            self.euchres += 1
+        if sitting is not None:
+            self.loners += 1
+            if points[maker_team]:
+                self.loners_made += 1
+            if points[maker_team] == 4:
+                self.loner_marches += 1
+
+    def summary(self):
+        """Return a dict of rates derived from the counts."""
+        def rate(numerator, denominator):
+            return numerator / denominator if denominator else 0.0
+
+        return {
+            'games': self.games,
+            'hands': self.hands,
+            'win_rate': [rate(wins, self.games) for wins in self.wins],
+            'points_per_hand': rate(sum(self.points), self.hands),
+            'euchre_rate': rate(self.euchres, self.hands),
+            'loner_rate': rate(self.loners, self.hands),
+            'loner_success': rate(self.loners_made, self.loners),
+            'loner_march_rate': rate(self.loner_marches, self.loners),
+        }
+
+
+def play_game(policies, rng, deal, stats=None, recorder=None, rows=None):
+    """Play one game to completion and return its Stats.
+
+    If recorder, a history.HandRecorder, is given, the record of every
+    finished hand is appended to the list rows.
+    """
+    if stats is None:
+        stats = Stats()
+    game = Game(initial_game_state(deal))
+    observers = [policy for policy in policies if hasattr(policy, 'observe')]
+    while not isinstance(game.state, GameOver):
+        state = game.state
+        move, args = policies[state.turn](state, rng)
+        for observer in observers:
+            observer.observe(state, move, args)
+        next_state = game.perform_move(move, state.turn, *args)
+        if recorder is not None:
+            row = recorder.record(state, move, args, next_state)
+            if row is not None:
+                rows.append(row)
+        if (isinstance(state, PlayCardsPhase) and
+                not isinstance(next_state, PlayCardsPhase)):
+            stats.record_hand(state.maker, state.sitting,
+                              [after - before for after, before in
+                               zip(next_state.score, state.score)])
+    stats.games += 1
+    stats.wins[game.state.winning_team] += 1
+    return stats
+
+
+def play_games(count, policies, seed, first_game=None):
+    """Play count games with a fresh RNG and return the combined Stats.
+
+    If first_game is given, return a pair of the Stats and a history array
+    of every hand played, numbering the games from first_game.
+    """
+    rng = random.Random(seed)
+    deal = Dealer(rng.getrandbits(64))
+    stats = Stats()
+    rows = []
+    for game in range(count):
+        recorder = None if first_game is None else \
+            HandRecorder(first_game + game)
+        play_game(policies, rng, deal, stats, recorder, rows)
+    if first_game is None:
+        return stats
+    return stats, history_array(rows)
+
+
+def simulate(games, policies=None, workers=None, seed=None, chunk_size=1000,
+             history=None):
+    """Play games across a process pool, yielding running totals.
+
+    Games are split into chunks of chunk_size, each played with its own seed
+    derived from seed, so a run is reproducible for a fixed seed and chunk
+    size regardless of the number of workers. A cumulative Stats is yielded
+    as each chunk completes. With workers=1 everything runs in this process.
+
+    If history, a history.HistoryWriter, is given, every hand played is
+    written to it as its chunk completes.
+    """
+    if policies is None:
+        policies = [random_policy] * 4
+    seeds = random.Random(seed)
+    chunks = [(min(chunk_size, games - start), seeds.getrandbits(64),
+               None if history is None else start)
+              for start in range(0, games, chunk_size)]
+    total = Stats()
+
+    def merge(result):
+        if history is not None:
+            result, rows = result
+            history.extend(rows)
+        return total.merge(result)
+
+    if workers == 1:
+        for count, chunk_seed, first_game in chunks:
+            yield merge(play_games(count, policies, chunk_seed, first_game))
+        return
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = [executor.submit(play_games, count, policies, chunk_seed,
+                                   first_game)
+                   for count, chunk_seed, first_game in chunks]
+        for future in as_completed(futures):
+            yield merge(future.result())
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--games', type=int, default=10000)
+    parser.add_argument('--workers', type=int, default=None,
+                        help="worker processes (default: one per core)")
+    parser.add_argument('--seed', type=int, default=None)
+    parser.add_argument('--chunk-size', type=int, default=1000)
+    parser.add_argument('--history', default=None,
+                        help="file to append every hand's record to")
+    args = parser.parse_args(argv)
+
+    history = None if args.history is None else HistoryWriter(args.history)
+    stats = Stats()
+    for stats in simulate(args.games, workers=args.workers, seed=args.seed,
+                          chunk_size=args.chunk_size, history=history):
+        print("{} / {} games".format(stats.games, args.games), flush=True)
+    if history is not None:
+        history.close()
+    for key, value in stats.summary().items():
+        print("{}: {}".format(key, value))
+
+
+if __name__ == '__main__':
+    main()
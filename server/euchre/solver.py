@@ -0,0 +1,211 @@
+"""Double-dummy solver for the play of a hand.
+
+Given every hand face up, the solver finds how many tricks each side takes
+with best play by all four players. It searches positions in the compact
+representation with alpha-beta pruning, a transposition table and simple move
+ordering; cards that are adjacent in rank among the cards still in play are
+equivalent, so only one of each run is searched.
+"""
+from .compact import (CARD_INDEX, CARDS, NUM_CARDS, RELATIVE_SUIT, SUIT_INDEX,
+                      TRICK_RANK, hand_mask, indices, legal_plays)
+
+
+def _suit_order(trump, suit):
+    ranks = TRICK_RANK[trump][suit]
+    cards = [index for index in range(NUM_CARDS)
+             if RELATIVE_SUIT[trump][index] == suit]
+    return tuple(sorted(cards, key=ranks.__getitem__, reverse=True))
+
+
+# SUIT_ORDER[trump][suit] lists the cards that count as suit, highest first.
+SUIT_ORDER = tuple(tuple(_suit_order(trump, suit) for suit in range(4))
+                   for trump in range(4))
+
+
+class Position:
+    """A play-phase position in compact form.
+
+    hands is a tuple of four masks, with the sitting player's mask empty.
+    trick is a tuple of the card indices played so far to the current trick,
+    starting with leader's.
+    """
+    __slots__ = ('trump', 'sitting', 'hands', 'leader', 'trick', 'turn',
+                 'trick_score')
+
+    def __init__(self, trump, sitting, hands, leader, trick, turn,
+                 trick_score):
+        self.trump = trump
+        self.sitting = sitting
+        self.hands = hands
+        self.leader = leader
+        self.trick = trick
+        self.turn = turn
+        self.trick_score = trick_score
+
+    @classmethod
+    def from_phase(cls, phase):
+        """Return the Position for a PlayCardsPhase."""
+        hands = tuple(0 if player == phase.sitting else hand_mask(hand)
+                      for player, hand in enumerate(phase.hands))
+        trick = phase.trick
+        players = _players(trick.leader, phase.sitting)
+        played = tuple(CARD_INDEX[trick.cards[player]]
+                       for player in players[:len(trick)])
+        return cls(SUIT_INDEX[phase.trump], phase.sitting, hands,
+                   trick.leader, played, phase.turn,
+                   tuple(phase.trick_score))
+
+
+def _players(leader, sitting):
+    """Return the players in a trick, in order of play."""
+    return [player for player in
+            ((leader + offset) % 4 for offset in range(4))
+            if player != sitting]
+
+
+class Solver:
+    """Double-dummy solver for one trump suit and sitting player.
+
+    The transposition table persists between calls, so reusing a Solver for
+    successive positions of the same hand is much faster than starting over.
+    """
+    def __init__(self, trump, sitting=None):
+        self.trump = trump
+        self.sitting = sitting
+        self.trick_size = 3 if sitting is not None else 4
+        self.order = SUIT_ORDER[trump]
+        self.players = [_players(leader, sitting) for leader in range(4)]
+        self.table = {}
+        self.nodes = 0
+
+    def moves(self, hands, trick, turn):
+        """Return the distinct legal cards for turn, best guesses first."""
+        trump = self.trump
+        led = trick[0] if trick else None
+        legal = legal_plays(hands[turn], trump, led)
+        in_play = hands[0] | hands[1] | hands[2] | hands[3]
+        for card in trick:
+            in_play |= 1 << card
+        if led is None:
+            ranks = TRICK_RANK[trump][trump]
+        else:
+            ranks = TRICK_RANK[trump][RELATIVE_SUIT[trump][led]]
+
+        moves = []
+        for suit_order in self.order:
+            previous_legal = False
+            for card in suit_order:
+                bit = 1 << card
+                if not in_play & bit:
+                    continue
+                is_legal = bool(legal & bit)
+                if is_legal and not previous_legal:
+                    moves.append(card)
+                previous_legal = is_legal
+        moves.sort(key=ranks.__getitem__, reverse=True)
+        return moves
+
+    def play(self, hands, trick, leader, turn, card):
+        """Play card for turn.
+
+        Return the arguments for searching the resulting position, plus the
+        number of tricks team 0 won by it.
+        """
+        new_hands = list(hands)
+        new_hands[turn] ^= 1 << card
+        new_hands = tuple(new_hands)
+        trick += (card,)
+        players = self.players[leader]
+        if len(trick) < self.trick_size:
+            return new_hands, trick, leader, players[len(trick)], 0
+        ranks = TRICK_RANK[self.trump][RELATIVE_SUIT[self.trump][trick[0]]]
+        winner = players[max(range(self.trick_size),
+                             key=lambda i: ranks[trick[i]])]
+        return new_hands, (), winner, winner, 1 - winner % 2
+
+    def search(self, hands, trick, leader, turn, alpha, beta):
+        """Return the tricks team 0 takes from here, within (alpha, beta).
+
+        As usual for alpha-beta, a result at or below alpha is only an upper
+        bound and one at or above beta only a lower bound.
+        """
+        if not trick and not any(hands):
+            return 0
+        self.nodes += 1
+        key = (hands, trick, turn)
+        lower, upper = self.table.get(key, (0, 5))
+        if lower >= beta:
+            return lower
+        if upper <= alpha:
+            return upper
+        alpha = max(alpha, lower)
+        beta = min(beta, upper)
+
+        maximizing = turn % 2 == 0
+        best = -1 if maximizing else 6
+        a, b = alpha, beta
+        for card in self.moves(hands, trick, turn):
+            *child, won = self.play(hands, trick, leader, turn, card)
+            value = won + self.search(*child, a - won, b - won)
+            if maximizing:
+                best = max(best, value)
+                a = max(a, best)
+            else:
+                best = min(best, value)
+                b = min(b, best)
+            if a >= b:
+                break
+
+        if best <= alpha:
+            upper = best
+        elif best >= beta:
+            lower = best
+        else:
+            lower = upper = best
+        self.table[key] = (lower, upper)
+        return best
+
+    def solve_position(self, position):
+        """Return a dict mapping each searched legal card index to tricks.
+
+        The tricks are those the side to move takes over the whole hand,
+        including tricks already won. Legal cards left out are equivalent to
+        the next higher card in the same hand and suit.
+        """
+        team = position.turn % 2
+        remaining = 5 - sum(position.trick_score)
+        results = {}
+        for card in self.moves(position.hands, position.trick,
+                               position.turn):
+            *child, won = self.play(position.hands, position.trick,
+                                    position.leader, position.turn, card)
+            team_0 = won + self.search(*child, -1, 6)
+            taken = team_0 if team == 0 else remaining - team_0
+            results[card] = position.trick_score[team] + taken
+        return results
+
+
+def solve(phase, solver=None):
+    """Return a dict mapping every legal Card to the tricks it is worth.
+
+    The value of a card is the number of tricks the side to move takes in
+    the whole hand, including tricks already won, if it plays that card and
+    everyone plays perfectly afterwards with all hands face up.
+    """
+    position = Position.from_phase(phase)
+    if solver is None:
+        solver = Solver(position.trump, position.sitting)
+    values = solver.solve_position(position)
+    hand = position.hands[position.turn]
+    led = position.trick[0] if position.trick else None
+    results = {}
+    for card in indices(legal_plays(hand, position.trump, led)):
+        suit_order = solver.order[RELATIVE_SUIT[position.trump][card]]
+        equivalent = card
+        for higher in reversed(suit_order[:suit_order.index(card)]):
+            if equivalent in values:
+                break
+            if hand >> higher & 1:
+                equivalent = higher
+        results[CARDS[card]] = values[equivalent]
+    return results
@@ -0,0 +1,24 @@
+"""Test the benchmark runner."""
+from euchre import benchmark
+
+
+def test_benchmarks_run():
+    results = benchmark.run(min_time=0.001, repeat=1)
+    assert set(benchmark.BENCHMARKS) >= set(results)
+    assert 'perform_move' in results
+    assert all(seconds > 0 for seconds in results.values())
+
+
+def test_regressions():
+    baseline = {'fast': 1.0, 'slow': 1.0}
+    results = {'fast': 1.2, 'slow': 1.3, 'new': 5.0}
+    assert benchmark.regressions(results, baseline, 0.25) == ['slow']
+
+
+def test_baselines_round_trip(tmp_path):
+    path = str(tmp_path / 'benchmarks.json')
+    args = ['deal', '--baseline', path, '--min-time', '0.001', '--repeat', '1']
+    assert benchmark.main(args + ['--save']) == 0
+    assert set(benchmark.load_baseline(path)) == {'deal'}
+    benchmark.save_baseline({'deal': 1e-12}, path)
+    assert benchmark.main(args) == 1
@@ -0,0 +1,80 @@
+"""Test the bidding tables."""
+import pytest
+
+from euchre.bidding import (PASS, SECOND_ROUND, SECOND_ROUND_SUITS,
+                            BiddingTable, build_table, canonical_key,
+                            canonical_keys, estimate, pass_value, table_size)
+from euchre.canonical import permute_mask
+from euchre.compact import CARD_INDEX, hand_mask, str_index
+from euchre.game import BidPhaseOne, BidPhaseTwo
+from euchre.objects import Card, Suit
+
+
+def cards(*card_strs):
+    return [Card.from_str(card_str) for card_str in card_strs]
+
+
+def test_renamed_suits_share_a_key():
+    # Hearts up with both red bowers, then the same with clubs and spades.
+    hand = hand_mask(cards('J.H', 'J.D', 'A.S', '9.C', 'K.H'))
+    renamed = permute_mask(hand, [2, 3, 0, 1])
+    assert renamed == hand_mask(cards('J.C', 'J.S', 'A.D', '9.H', 'K.C'))
+    key, _ = canonical_key(hand, str_index('10.H'), 1)
+    assert canonical_key(renamed, str_index('10.C'), 1)[0] == key
+    assert canonical_key(hand, str_index('10.H'), 2)[0] != key
+
+
+def test_canonical_keys_are_canonical():
+    keys = list(canonical_keys(up_ranks=[0], seats=[0]))
+    assert len(keys) == len({hand for hand, _, _ in keys})
+    rows = set()
+    for hand, up_rank, seat in keys[:200]:
+        row, permutation = canonical_key(hand, up_rank, seat)
+        assert permutation == [0, 1, 2, 3]
+        assert 0 <= row < table_size()
+        rows.add(row)
+    assert len(rows) == 200
+
+
+def test_table_answers_bids(tmp_path):
+    pytest.importorskip('numpy')
+    hand = cards('J.H', 'J.D', 'A.H', 'K.H', '9.C')
+    up_card = Card.from_str('10.H')
+    mask = hand_mask(hand)
+    index, permutation = canonical_key(mask, CARD_INDEX[up_card], 1)
+    canonical = permute_mask(mask, permutation)
+    key = (canonical, 1, 1)
+    path = str(tmp_path / 'bidding.npy')
+    build_table(path, samples=2, workers=1, keys=[key])
+    table = BiddingTable(path)
+
+    hands = [cards('9.S', '10.S', 'J.S', 'Q.S', 'K.S'), hand,
+             cards('A.S', '9.D', '10.D', 'Q.D', 'K.D'),
+             cards('A.D', '10.C', 'J.C', 'Q.C', 'K.C')]
+    expected = estimate(*key, 2, 0 ^ index)
+    first = table.values(BidPhaseOne([0, 0], hands, 0, 1, up_card))
+    assert first[('call_one', (False,))] == pytest.approx(expected[0],
+                                                          abs=0.01)
+    assert first[('pass_bid', ())] == pytest.approx(expected[PASS],
+                                                    abs=0.01)
+    second = BidPhaseTwo([0, 0], hands, 0, 1, up_card)
+    values = table.values(second)
+    assert len(values) == 6
+    # Diamonds is next to hearts, stored as spades.
+    next_column = SECOND_ROUND + 2 * SECOND_ROUND_SUITS.index(3)
+    assert values[('call_two', (False, Suit.diamonds))] == pytest.approx(
+        expected[next_column], abs=0.01)
+    assert table.best_bid(second) in list(values) + [('pass_bid', ())]
+    hands[1] = cards('9.H', '10.C', 'Q.C', 'A.C', 'K.D')
+    assert table.best_bid(BidPhaseOne([0, 0], hands, 0, 1, up_card)) is None
+
+
+def test_pass_leaves_the_bid_to_others():
+    # Seat 2 holds every top heart, and orders hearts up alone.
+    hands = [cards('9.S', '10.S', 'J.S', 'Q.S', 'K.S'),
+             cards('9.C', '10.C', 'Q.C', '9.D', '10.D'),
+             cards('J.H', 'J.D', 'A.H', 'K.H', 'Q.H'),
+             cards('A.S', 'A.C', 'K.C', 'A.D', 'K.D')]
+    first = BidPhaseOne([0, 0], hands, 0, 1, Card.from_str('10.H'))
+    assert pass_value(first, 1) == -4
+    assert pass_value(first, 0) == 4
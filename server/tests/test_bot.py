@@ -0,0 +1,124 @@
+"""Test the Monte Carlo bot."""
+import random
+
+from euchre import compact
+from euchre.bot import Knowledge, MonteCarloBot, _run_samples, default_move
+from euchre.equity import MatchEquity
+from euchre.game import BidPhaseOne, Game
+from euchre.objects import Card, Suit
+from test_game import initial_game_state, play_phase_start_state
+
+
+def test_sample_keeps_hand_sizes_and_own_hand():
+    game = play_phase_start_state()
+    knowledge = Knowledge(1)
+    world = knowledge.sample(game.state, random.Random(0))
+    assert world.hands[1] == game.state.hands[1]
+    assert [len(hand) for hand in world.hands] == [5, 5, 5, 5]
+    cards = [card for hand in world.hands for card in hand]
+    assert len(set(cards)) == 20
+
+
+def test_sample_leaves_state_alone():
+    state = play_phase_start_state().state
+    hands = [list(hand) for hand in state.hands]
+    world = Knowledge(1).sample(state, random.Random(0))
+    assert world is not state
+    assert type(world) is type(state)
+    assert state.hands == hands
+    assert (world.trump, world.maker, world.trick) == \
+        (state.trump, state.maker, state.trick)
+
+
+def test_sample_respects_voids():
+    game = play_phase_start_state()
+    bot = MonteCarloBot(1)
+    for player, card_str in [(1, "A.C"), (2, "9.C"), (3, "9.S")]:
+        state = game.state
+        args = (Card.from_str(card_str),)
+        bot.observe(state, 'play', args)
+        game.perform_move('play', player, *args)
+    clubs = compact.SUIT_MASKS[compact.suit_index(Suit.spades)][
+        compact.suit_index(Suit.clubs)]
+    rng = random.Random(1)
+    for _ in range(50):
+        world = bot.knowledge.sample(game.state, rng)
+        assert not compact.hand_mask(world.hands[3]) & clubs
+        played = {"A.C", "9.C", "9.S"}
+        assert not played & {str(c) for hand in world.hands for c in hand}
+
+
+def test_choose_move():
+    state = play_phase_start_state().state
+    bot = MonteCarloBot(1, samples=3, seed=0)
+    assert bot.choose_move(state) in state.legal_moves()
+
+
+def test_choose_move_after_deadline():
+    game = initial_game_state()
+    bot = MonteCarloBot(1, samples=20, seed=0)
+    state = game.state
+    assert bot.choose_move(state, deadline=0) == ('pass_bid', ())
+    assert default_move(state, state.legal_moves()) == ('pass_bid', ())
+
+
+def test_choose_bid():
+    game = initial_game_state()
+    bot = MonteCarloBot(1, samples=2, seed=0)
+    move, args = bot.choose_move(game.state)
+    assert (move, args) in game.state.legal_moves()
+    assert isinstance(Game(game.state).perform_move(move, 1, *args).turn, int)
+
+
+def test_choose_bid_for_match_equity():
+    game = initial_game_state()
+    equity = MatchEquity.from_distribution({(1, 0): 0.5, (0, 2): 0.5})
+    bot = MonteCarloBot(1, samples=2, seed=0, equity=equity)
+    assert bot.choose_move(game.state) in game.state.legal_moves()
+
+
+def test_pass_keeps_the_deal_for_match_equity():
+    state = initial_game_state().state
+    equity = MatchEquity.from_distribution({(1, 0): 0.5, (0, 2): 0.5})
+    candidates = [('pass_bid', ())]
+    totals, done = _run_samples(Knowledge(1), state, candidates, 3,
+                                float('inf'), 0, equity)
+    assert done == 3
+    chance = equity.win_probability(state.score, state.dealer, 1)
+    assert totals[0] == 3 * chance
+
+
+def test_knowledge_resets_each_hand():
+    game = initial_game_state()
+    knowledge = Knowledge(1)
+    knowledge.observe(game.state, 'call_one', (False,))
+    assert knowledge.holds[0]
+    knowledge.new_hand(game.state)
+    assert knowledge.holds[0]
+    state = game.state
+    knowledge.new_hand(BidPhaseOne(state.score, state.hands, state.dealer,
+                                   state.turn, Card.from_str("9.C")))
+    assert knowledge.holds == [0, 0, 0, 0]
+
+
+def test_dealer_may_discard_upcard():
+    game = initial_game_state()
+    knowledge = Knowledge(1)
+    up_card = game.state.up_card
+    for player in (1, 2, 3):
+        knowledge.observe(game.state, 'pass_bid', ())
+        game.perform_move('pass_bid', player)
+    knowledge.observe(game.state, 'call_one', (False,))
+    game.perform_move('call_one', 0, False)
+    discard = game.state.hands[0][0]
+    knowledge.observe(game.state, 'discard', (discard,))
+    game.perform_move('discard', 0, discard)
+    assert knowledge.holds[0] == 0
+
+    rng = random.Random(0)
+    kept = 0
+    for _ in range(200):
+        world = knowledge.sample(game.state, rng)
+        assert all(up_card not in world.hands[player] for player in (2, 3))
+        kept += up_card in world.hands[0]
+    assert 150 < kept < 200
@@ -0,0 +1,77 @@
+"""Test suit canonicalization."""
+import random
+
+from euchre.canonical import (PERMUTATIONS, TRUMP_PERMUTATIONS,
+                              canonical_hand, canonical_hands, hand_index,
+                              inverse, permute_card, permute_mask)
+from euchre.compact import SAME_COLOR, hand_mask, str_index
+from euchre.objects import Card
+
+
+def cards(*card_strs):
+    return [Card.from_str(card_str) for card_str in card_strs]
+
+
+def random_hand(rng, size=5):
+    return sum(1 << index for index in rng.sample(range(24), size))
+
+
+def test_permutations_keep_colors():
+    assert len(PERMUTATIONS) == 8
+    for permutation in PERMUTATIONS:
+        for suit in range(4):
+            assert (permutation[SAME_COLOR[suit]] ==
+                    SAME_COLOR[permutation[suit]])
+    for trump in range(4):
+        assert len(TRUMP_PERMUTATIONS[trump]) == 2
+
+
+def test_permute_card_and_inverse():
+    # Clubs and hearts trade places, as do diamonds and spades.
+    permutation = [2, 3, 0, 1]
+    assert permute_card(str_index('J.H'), permutation) == str_index('J.C')
+    assert permute_card(str_index('9.S'), permutation) == str_index('9.D')
+    back = inverse(permutation)
+    for index in range(24):
+        assert permute_card(permute_card(index, permutation), back) == index
+    hand = hand_mask(cards('J.H', 'A.S', '9.C'))
+    assert permute_mask(permute_mask(hand, permutation), back) == hand
+
+
+def test_renamed_hands_share_a_canonical_form():
+    rng = random.Random(0)
+    for _ in range(200):
+        hand = random_hand(rng)
+        canonical, permutation = canonical_hand(hand)
+        assert permute_mask(hand, permutation) == canonical
+        for renaming in PERMUTATIONS:
+            assert canonical_hand(permute_mask(hand, renaming))[0] == canonical
+        trump = rng.randrange(4)
+        canonical, permutation = canonical_hand(hand, trump)
+        assert permutation[trump] == 0
+        assert permute_mask(hand, permutation) == canonical
+
+
+def test_canonical_hands_renames_cards():
+    hands = [hand_mask(cards('J.H', 'A.H')), hand_mask(cards('9.S'))]
+    masks, (up_card,), permutation = canonical_hands(
+        hands, trump=2, cards=[str_index('10.H')])
+    assert up_card == str_index('10.C')
+    assert masks == (hand_mask(cards('J.C', 'A.C')),
+                     permute_mask(hands[1], permutation))
+
+
+def test_hand_index_is_dense():
+    index = hand_index(3, fixed_trump=False)
+    assert sorted(index.indices.values()) == list(range(len(index)))
+    rng = random.Random(0)
+    for _ in range(200):
+        hand = random_hand(rng, 3)
+        number, permutation = index.index(hand)
+        assert index.hand(number) == permute_mask(hand, permutation)
+    trumped = hand_index(5)
+    assert len(trumped) < 42504
+    hand = hand_mask(cards('J.H', 'J.D', 'A.S', '9.C', 'K.H'))
+    number, permutation = trumped.index(hand, 2)
+    assert permutation[2] == 0
+    assert trumped.hand(number) == permute_mask(hand, permutation)
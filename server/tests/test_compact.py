@@ -0,0 +1,62 @@
+"""Test the compact card representation."""
+from euchre import compact
+from euchre.objects import Card, Deck
+from test_game import hand_from_str
+
+
+def mask_from_str(s):
+    return compact.hand_mask(hand_from_str(s))
+
+
+def test_round_trip():
+    for card in Deck.cards:
+        index = compact.card_index(card)
+        assert compact.index_card(index) == card
+        assert compact.str_index(str(card)) == index
+
+
+def test_hand_mask():
+    hand = hand_from_str("A.S K.S J.S Q.H 9.D")
+    mask = compact.hand_mask(hand)
+    assert compact.count(mask) == 5
+    assert sorted(map(str, compact.hand_cards(mask))) == sorted(map(str, hand))
+    assert compact.has_card(mask, compact.card_index(Card.from_str("J.S")))
+    assert not compact.has_card(mask, compact.card_index(Card.from_str("J.C")))
+
+
+def test_relative_suit():
+    spades = compact.suit_index(Card.from_str("J.S").suit)
+    left_bower = compact.card_index(Card.from_str("J.C"))
+    assert compact.RELATIVE_SUIT[spades][left_bower] == spades
+    clubs = compact.card_suit(left_bower)
+    assert compact.count(compact.SUIT_MASKS[spades][spades]) == 7
+    assert compact.count(compact.SUIT_MASKS[spades][clubs]) == 5
+
+
+def test_legal_plays():
+    spades = compact.suit_index(Card.from_str("J.S").suit)
+    hand = mask_from_str("A.C K.C J.C Q.D 9.H")
+    led = compact.card_index(Card.from_str("9.S"))
+    assert compact.legal_plays(hand, spades, led) == mask_from_str("J.C")
+    led = compact.card_index(Card.from_str("9.C"))
+    assert compact.legal_plays(hand, spades, led) == mask_from_str("A.C K.C")
+    led = compact.card_index(Card.from_str("A.S"))
+    assert compact.legal_plays(mask_from_str("A.C 9.H"), spades, led) == \
+        mask_from_str("A.C 9.H")
+    assert compact.legal_plays(hand, spades) == hand
+
+
+def test_winning_card():
+    spades = compact.suit_index(Card.from_str("J.S").suit)
+
+    def winner(trick_str):
+        played = [compact.card_index(c) for c in hand_from_str(trick_str)]
+        return compact.CARD_STRS[compact.winning_card(spades, played[0],
+                                                      played)]
+
+    assert winner("A.C 9.C K.H 10.C") == "A.C"
+    assert winner("A.C 9.C 9.S 10.C") == "9.S"
+    assert winner("A.S J.C K.S 10.C") == "J.C"
+    assert winner("J.C J.S A.S 10.C") == "J.S"
+    assert winner("J.C A.C") == "J.C"
+    assert winner("9.H A.C A.D") == "9.H"
@@ -0,0 +1,79 @@
+"""Test seedable and batched dealing."""
+import pytest
+
+from euchre import numeric
+from euchre.dealing import (BatchDealer, Dealer, deal, deal_batch,
+                            deal_from_permutation)
+from euchre.game import Game, PlayCardsPhase, initial_game_state
+from euchre.objects import Deck, Suit
+
+
+def deal_strs(dealt):
+    hands, up_card = dealt
+    return [[str(card) for card in hand] for hand in hands], str(up_card)
+
+
+def test_deal():
+    hands, up_card = deal()
+    cards = [card for hand in hands for card in hand] + [up_card]
+    assert [len(hand) for hand in hands] == [5, 5, 5, 5]
+    assert len(set(cards)) == 21
+
+
+def test_deal_from_permutation():
+    hands, up_card = deal_from_permutation(list(range(24)))
+    assert hands[0] == Deck.cards[0:5]
+    assert hands[3] == Deck.cards[15:20]
+    assert up_card == Deck.cards[20]
+
+
+def test_dealer_reproducible():
+    first, second = Dealer(42), Dealer(42)
+    for _ in range(10):
+        assert deal_strs(first()) == deal_strs(second())
+    assert deal_strs(Dealer(1)()) != deal_strs(Dealer(2)())
+
+
+def test_deal_batch():
+    np = pytest.importorskip('numpy')
+    batch = deal_batch(1000, seed=5)
+    assert batch.shape == (1000, 24)
+    assert (np.sort(batch, axis=1) == np.arange(24)).all()
+    assert (batch == deal_batch(1000, seed=5)).all()
+
+
+def test_batch_dealer():
+    pytest.importorskip('numpy')
+    first = BatchDealer(3, batch_size=7)
+    second = BatchDealer(3, batch_size=7)
+    for _ in range(20):
+        assert deal_strs(first()) == deal_strs(second())
+
+
+def test_game_uses_deal_source():
+    def play_out_hand(game):
+        for player in [1, 2, 3, 0, 1, 2, 3]:
+            game.perform_move('pass_bid', player)
+        trump = next(suit for suit in Suit
+                     if suit != game.state.up_card.suit)
+        state = game.perform_move('call_two', 0, False, trump)
+        assert isinstance(state, PlayCardsPhase)
+        while isinstance(game.state, PlayCardsPhase):
+            state = game.state
+            card = state.legal_cards()[0]
+            game.perform_move('play', state.turn, card)
+        return game.state
+
+    first = play_out_hand(Game(initial_game_state(Dealer(9))))
+    second = play_out_hand(Game(initial_game_state(Dealer(9))))
+    assert first.dealer == 1
+    assert deal_strs((first.hands, first.up_card)) == \
+        deal_strs((second.hands, second.up_card))
+
+
+def test_batch_dealing_requires_numpy(monkeypatch):
+    monkeypatch.setattr(numeric, 'np', None)
+    with pytest.raises(RuntimeError, match="batch dealing"):
+        deal_batch(1)
+    with pytest.raises(RuntimeError, match="batch dealing"):
+        BatchDealer()
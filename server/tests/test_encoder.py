@@ -1,6 +1,19 @@
 from test_game import (initial_game_state, play_phase_start_state,
                        round_almost_won_state)
-from euchre.encoder import to_serializable
+import json
+import random
+
+import pytest
+
+from euchre.dealing import Dealer
+from euchre.encoder import (changed_hands, decode_card, decode_hand,
+                            decode_suit, encode, move_event, public_state,
+                            state_patch, to_serializable, views)
+from euchre import game
+from euchre.exceptions import IllegalMoveException
+from euchre.game import GameOver
+from euchre.objects import Card
+from euchre.simulate import random_policy
 
 expected_initial_game_state = {
     'score': [0, 0],
@@ -60,3 +73,75 @@ def test_state_encoding():
         [initial_game_state, play_phase_start_state,
          round_almost_won_state], expecteds):
         assert to_serializable(state().state) == expected
+
+
+def test_patch_after_play():
+    old = play_phase_start_state().state
+    card = Card.from_str('9.H')
+    new = old.play(card)
+    changed, removed = state_patch(old, new)
+    assert changed == {'hands': [5, 4, 5, 5], 'turn': 2, 'trick': {1: '9.H'}}
+    assert removed == []
+    assert changed_hands(old, new) == [1]
+    assert move_event(old, 1, 'play', (card,)) == {
+        'seat': 1, 'move': 'play', 'args': ['9.H']}
+
+
+def test_patch_names_trick_winner():
+    old = round_almost_won_state().state
+    for card in ['A.D', 'A.H', 'A.S']:
+        old = old.play(Card.from_str(card))
+    event = move_event(old, 0, 'play', (Card.from_str('A.C'),))
+    assert event['trick_winner'] == 3
+
+
+def test_patches_rebuild_public_state():
+    rng = random.Random(3)
+    state = game.initial_game_state(Dealer(3))
+    client = public_state(state)
+    while not isinstance(state, GameOver):
+        move, args = random_policy(state, rng)
+        new = state.apply(move, *args)
+        changed, removed = state_patch(state, new)
+        for field in removed:
+            del client[field]
+        client.update(changed)
+        assert client == public_state(new)
+        state = new
+
+
+def test_views_share_one_encoding():
+    state = initial_game_state().state
+    public, hands = views(state)
+    assert public == dict(expected_initial_game_state, hands=[5, 5, 5, 5])
+    assert hands == expected_initial_game_state['hands']
+    assert views(GameOver(1, [4, 10])) == (
+        {'winning_team': 1, 'score': [4, 10], 'phase': 'gameover'}, [])
+
+
+def test_encode_bytes():
+    public, _ = views(play_phase_start_state().state)
+    assert json.loads(encode(public)) == json.loads(json.dumps(public))
+    msgpack = pytest.importorskip('msgpack')
+    assert msgpack.unpackb(encode(public, 'msgpack'),
+                           strict_map_key=False) == public
+
+
+def test_compact_round_trip():
+    state = play_phase_start_state().state.play(Card.from_str('9.H'))
+    public, hands = views(state, 'compact')
+    assert public['phase'] == 3
+    assert public['trump'] == 3
+    assert public['trick'] == {1: 12}
+    assert [set(decode_hand(hand)) for hand in hands] == [
+        set(decode_hand(hand)) for hand in views(state)[1]]
+    assert decode_card(12) == decode_card('9.H') == Card.from_str('9.H')
+    assert decode_suit(3) == decode_suit('S')
+    for bad in (-1, 24, True, None, 'X.S', [0]):
+        with pytest.raises(IllegalMoveException):
+            decode_card(bad)
+    for bad in (-1, 4, False, 'X', 2.0):
+        with pytest.raises(IllegalMoveException):
+            decode_suit(bad)
+    patch, _ = state_patch(play_phase_start_state().state, state, 'compact')
+    assert patch['trick'] == {1: 12}
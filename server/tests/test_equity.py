@@ -0,0 +1,47 @@
+"""Test match equity."""
+import pytest
+
+from euchre.equity import (GAME_POINTS, MatchEquity, cached_equity,
+                           outcome_distribution, simulate_outcomes)
+
+# The dealing team makes 1 or 2, or is euchred for 2, equally often.
+EVEN = {(1, 0): 1 / 3, (2, 0): 1 / 3, (0, 2): 1 / 3}
+
+
+def test_outcome_distribution_is_relative_to_dealer():
+    distribution = outcome_distribution([0, 1, 2, 3],
+                                        [(1, 0), (1, 0), (0, 2), (4, 0)])
+    assert distribution == {(1, 0): 0.25, (0, 1): 0.25, (0, 2): 0.25,
+                            (0, 4): 0.25}
+
+
+def test_equity_table():
+    equity = MatchEquity.from_distribution(EVEN)
+    # One point from the end with the deal, team 0 always scores.
+    assert equity.win_probability([9, 9], 0) == pytest.approx(2 / 3)
+    assert equity.win_probability([9, 9], 1) == pytest.approx(1 / 3)
+    assert equity.win_probability([9, 9], 1, team=1) == pytest.approx(2 / 3)
+    assert equity.win_probability([GAME_POINTS, 4], 0) == 1.0
+    assert equity.win_probability([0, 0], 0) == pytest.approx(
+        1 - equity.win_probability([0, 0], 1))
+    assert (equity.win_probability([8, 0], 0) >
+            equity.win_probability([6, 0], 0) >
+            equity.win_probability([6, 2], 0))
+    # Euchring team 0 from 9-9 wins the game for team 1.
+    assert equity.after_hand([9, 9], 0, 1, 2) == 1.0
+    assert equity.after_hand([8, 8], 0, 0, -2) == 0.0
+
+
+def test_cached_equity(tmp_path):
+    path = str(tmp_path / 'equity.json')
+    built = cached_equity(path, games=5)
+    assert sum(built.distribution.values()) == pytest.approx(1.0)
+    loaded = cached_equity(path, games=0)
+    assert loaded.table == built.table
+    assert loaded.distribution == built.distribution
+
+
+def test_simulated_outcomes():
+    distribution = simulate_outcomes(5, seed=1)
+    assert all(dealing == 0 or other == 0 for dealing, other in distribution)
+    assert sum(distribution.values()) == pytest.approx(1.0)
@@ -108,6 +108,24 @@ def test_skip_discard_on_alone():
     assert isinstance(next_state, PlayCardsPhase)
 
 
+def test_skip_discard_on_alone__leader():
+    g = initial_game_state()
+    g.perform_move('pass_bid', 1)
+    next_state = g.perform_move('call_one', 2, True)
+    assert next_state.trick.leader == next_state.turn == 3
+    next_state = g.perform_move('play', 3, Card.from_str("A.D"))
+    assert next_state.turn == 1
+
+
+def test_call_bid_two__alone():
+    g = initial_game_state()
+    for player in [1, 2, 3, 0]:
+        g.perform_move('pass_bid', player)
+    next_state = g.perform_move('call_two', 1, True, Suit.spades)
+    assert next_state.maker == 1
+    assert next_state.sitting == 3
+
+
 def test_proceed_to_bid_phase_two():
     g = initial_game_state()
     g.perform_move('pass_bid', 1)
@@ -213,6 +231,50 @@ def test_check_reneg__jack():
     g.perform_move('play', 2, Card.from_str("J.S"))
 
 
+def test_replace():
+    state = play_phase_start_state().state
+    hands = [[], [], [], []]
+    phase = state.replace(hands=hands)
+    assert type(phase) is type(state)
+    assert phase.hands is hands
+    assert state.hands != hands
+    assert (phase.trump, phase.turn) == (state.trump, state.turn)
+    with pytest.raises(TypeError):
+        state.replace(colour=None)
+
+
+def test_legal_moves__bidding():
+    g = initial_game_state()
+    assert len(g.state.legal_moves()) == 3
+    for player in [1, 2, 3, 0, 1, 2, 3]:
+        g.perform_move('pass_bid', player)
+    moves = g.state.legal_moves()
+    assert ('pass_bid', ()) not in moves
+    assert len(moves) == 6
+    assert all(args[1] != Suit.diamonds for _, args in moves)
+
+
+def test_legal_moves__discard():
+    g = initial_game_state()
+    g.perform_move('call_one', 1, False)
+    moves = g.state.legal_moves()
+    assert [args[0] for _, args in moves] == g.state.hands[0]
+
+
+def test_legal_moves__play():
+    g = play_phase_start_state(trump=Suit.diamonds)
+    assert len(g.state.legal_moves()) == 5
+    g.perform_move('play', 1, Card.from_str("Q.D"))
+    # Diamonds are trump, so only the left bower follows.
+    assert g.state.legal_moves() == [('play', (Card.from_str("J.H"),))]
+    mask = g.state.trick.led_mask
+    assert mask is not None
+    g.perform_move('play', 2, Card.from_str("J.H"))
+    assert g.state.trick.led_mask == mask
+    assert g.state.legal_cards() == hand_from_str("A.D K.D J.D")
+    assert GameOver(0).legal_moves() == []
+
+
 def test_win_round__make():
     g = round_almost_won_state()
     g.perform_move('play', 1, Card.from_str("A.D"))
@@ -263,3 +325,28 @@ def test_win_game():
     next_state = g.perform_move('play', 0, Card.from_str("A.C"))
     assert isinstance(next_state, GameOver)
     assert next_state.winning_team == 1
+
+
+def test_moves_leave_state_unchanged():
+    g = play_phase_start_state()
+    before = g.state
+    hands = [hand.copy() for hand in before.hands]
+    g.perform_move('play', 1, Card.from_str("A.C"))
+    g.perform_move('play', 2, Card.from_str("9.C"))
+    g.perform_move('play', 3, Card.from_str("9.S"))
+    g.perform_move('play', 0, Card.from_str("J.S"))
+    assert before.hands == hands
+    assert before.trick.cards == {}
+    assert before.trick_score == [0, 0]
+    assert before.turn == 1
+    assert g.state.hands[2] is not before.hands[2]
+
+
+def test_apply():
+    state = play_phase_start_state().state
+    next_state = state.apply('play', Card.from_str("A.C"))
+    assert next_state.turn == 2
+    assert state.apply('play', Card.from_str("K.C")).trick.cards == {
+        1: Card.from_str("K.C")}
+    with pytest.raises(IllegalMoveException):
+        state.apply('discard', Card.from_str("K.C"))
@@ -0,0 +1,53 @@
+"""Test recording hands to history files."""
+import pytest
+
+from euchre.history import (BID_CALL, BID_PASS, BID_SUIT, NO_BID,
+                            HistoryWriter, bid_code, read_history)
+from euchre.objects import Suit
+from euchre.simulate import simulate
+
+np = pytest.importorskip('numpy')
+
+
+def test_bid_codes():
+    assert bid_code('pass_bid', ()) == BID_PASS
+    assert bid_code('call_one', (False,)) == BID_CALL
+    assert bid_code('call_two', (True, Suit.hearts)) == BID_SUIT + 5
+
+
+def test_simulated_history(tmp_path):
+    path = str(tmp_path / 'sim.hands')
+    writer = HistoryWriter(path, chunk_size=16)
+    for stats in simulate(40, workers=1, seed=3, chunk_size=15,
+                          history=writer):
+        pass
+    writer.close()
+
+    hands = read_history(path)
+    assert len(hands) == stats.hands
+    assert list(hands['points'].sum(axis=0)) == stats.points
+    assert (hands['tricks'].sum(axis=1) == 5).all()
+    assert set(np.unique(hands['game'])) == set(range(40))
+    assert hands['alone'].sum() == stats.loners
+    # Every card is dealt exactly once.
+    dealt = np.bitwise_or.reduce(hands['hands'], axis=1)
+    assert (dealt & (1 << hands['up_card'].astype(np.uint32)) == 0).all()
+    # Bidding ends at the first call.
+    for bids in hands['bids']:
+        made = [bid for bid in bids if bid != NO_BID]
+        assert made[-1] != BID_PASS
+        assert all(bid == BID_PASS for bid in made[:-1])
+
+
+def test_append_to_history(tmp_path):
+    path = str(tmp_path / 'sim.hands')
+    for seed in range(2):
+        writer = HistoryWriter(path)
+        for _ in simulate(3, workers=1, seed=seed, history=writer):
+            pass
+        writer.close()
+    first = read_history(path)
+    assert len(first) > 6
+    (tmp_path / 'other').write_bytes(b'not a history at all')
+    with pytest.raises(ValueError):
+        read_history(str(tmp_path / 'other'))
@@ -0,0 +1,177 @@
+"""Test journaling and replaying tables."""
+import asyncio
+import os
+import random
+
+import pytest
+
+from euchre.dealing import Dealer
+from euchre.encoder import to_serializable
+from euchre.game import GameOver, initial_game_state
+from euchre.journal import (Journal, move_record, recover, restore_state,
+                            snapshot_record, snapshot_state)
+from euchre.simulate import random_policy
+
+
+def play(state, rng, moves):
+    """Play up to moves random moves from state; yield each one."""
+    for _ in range(moves):
+        if isinstance(state, GameOver):
+            return
+        move, args = random_policy(state, rng)
+        seat = state.turn
+        state = state.apply(move, *args)
+        yield seat, move, args, state
+
+
+def test_snapshot_round_trip():
+    rng = random.Random(1)
+    state = initial_game_state(Dealer(1))
+    for _, _, _, state in play(state, rng, 200):
+        restored = restore_state(snapshot_state(state),
+                                 getattr(state, 'deal', None))
+        assert snapshot_state(restored) == snapshot_state(state)
+
+
+def test_recover_from_snapshot_and_moves(tmp_path):
+    journal = Journal(str(tmp_path), segment_size=2000)
+    journal.append({'event': 'create', 'table': 0, 'name': "zero"})
+    journal.append({'event': 'create', 'table': 1, 'name': "one"})
+    journal.append({'event': 'close', 'table': 1})
+    journal.append({'event': 'start', 'table': 0, 'seed': 5})
+    rng = random.Random(2)
+    state = initial_game_state(Dealer(5))
+    for count, (seat, move, args, state) in enumerate(play(state, rng, 70)):
+        journal.append(move_record(0, seat, move, args))
+        if count == 40:
+            journal.append(snapshot_record(0, state))
+    journal.close()
+    assert len(journal.segments()) > 2
+
+    tables, next_table_id = recover(Journal(str(tmp_path)))
+    assert list(tables) == [0]
+    assert next_table_id == 2
+    assert tables[0].name == "zero"
+    assert len(tables[0].moves) == 29
+    assert (to_serializable(tables[0].replay()) ==
+            to_serializable(state))
+
+
+def test_torn_line_ends_segment(tmp_path):
+    journal = Journal(str(tmp_path))
+    journal.append({'event': 'create', 'table': 0, 'name': "zero"})
+    journal.file.write(b'{"event": "cre')
+    journal.close()
+    assert list(Journal(str(tmp_path)).records()) == [
+        {'event': 'create', 'table': 0, 'name': "zero"}]
+
+
+def test_server_recovers_tables(tmp_path):
+    pytest.importorskip('autobahn')
+    pytest.importorskip('bidict')
+    from test_server import FakeCoordinator
+
+    async def run():
+        coordinator = FakeCoordinator()
+        coordinator.journal = Journal(str(tmp_path))
+        table_id = await coordinator.tables.create_table("kept")
+        closed_id = await coordinator.tables.create_table("closed")
+        await coordinator.tables.close_table(closed_id)
+        players = [coordinator.new_player() for _ in range(4)]
+        for seat, player in enumerate(players):
+            player.join_table(table_id)
+            player.join_seat(seat)
+        players[0].start_game()
+        lobby = coordinator.tables.get(table_id)
+        lobby.snapshot_interval = 3
+        for _ in range(10):
+            state = lobby.game.state
+            move, args = random_policy(state, random.Random(0))
+            players[state.turn].perform_move(move, *to_serializable(args))
+        coordinator.journal.close()
+
+        restarted = FakeCoordinator()
+        await restarted.tables.recover(Journal(str(tmp_path)))
+        recovered = restarted.tables.get(table_id)
+        assert recovered.name == "kept"
+        assert (to_serializable(recovered.game.state) ==
+                to_serializable(lobby.game.state))
+        assert await restarted.tables.create_table() > closed_id
+
+    asyncio.run(run())
+
+
+def test_compaction_bounds_recovery(tmp_path):
+    pytest.importorskip('autobahn')
+    pytest.importorskip('bidict')
+    from test_server import FakeCoordinator
+    segment_size = 4096
+
+    async def run():
+        coordinator = FakeCoordinator()
+        journal = coordinator.journal = Journal(
+            str(tmp_path), segment_size=segment_size, background=True)
+        journal.describe = coordinator.tables.describe
+        closed_id = await coordinator.tables.create_table("closed")
+        table_id = await coordinator.tables.create_table("kept")
+        players = [coordinator.new_player() for _ in range(4)]
+        for seat, player in enumerate(players):
+            player.join_table(table_id)
+            player.join_seat(seat)
+        await coordinator.tables.close_table(closed_id)
+        lobby = coordinator.tables.get(table_id)
+        rng = random.Random(3)
+        compactions = 0
+        for _ in range(600):
+            if lobby.game is None or isinstance(lobby.game.state, GameOver):
+                players[0].start_game()
+            state = lobby.game.state
+            move, args = random_policy(state, rng)
+            players[state.turn].perform_move(move, *to_serializable(args))
+            # Nothing is synced on the way.
+            assert journal.pending
+            if journal.full():
+                compactions += 1
+            await journal.maintain()
+            assert len(journal.segments()) <= 2
+        journal.close()
+        assert compactions > 2
+
+        # Recovery reads no more than one full segment and a checkpoint.
+        size = sum(os.path.getsize(path) for path in journal.segments())
+        assert size < 2 * segment_size
+        restarted = FakeCoordinator()
+        await restarted.tables.recover(Journal(str(tmp_path)))
+        recovered = restarted.tables.get(table_id)
+        assert (to_serializable(recovered.game.state) ==
+                to_serializable(lobby.game.state))
+        assert recovered.seed == lobby.seed
+        assert await restarted.tables.create_table() > table_id
+
+    asyncio.run(run())
+
+
+def test_server_recovers_idle_tables(tmp_path):
+    pytest.importorskip('autobahn')
+    pytest.importorskip('bidict')
+    from test_server import FakeCoordinator
+
+    async def run():
+        coordinator = FakeCoordinator()
+        coordinator.journal = Journal(str(tmp_path))
+        table_id = await coordinator.tables.create_table("idle")
+        coordinator.journal.close()
+
+        restarted = FakeCoordinator()
+        await restarted.tables.recover(Journal(str(tmp_path)))
+        recovered = restarted.tables.get(table_id)
+        assert recovered.game is None
+        player = restarted.new_player()
+        player.join_table(table_id)
+        player.join_seat(0)
+        recovered.leave_seat(player)
+        recovered.publish_state()
+        await asyncio.sleep(0)
+        assert recovered.get_seats() == [None] * 4
+
+    asyncio.run(run())
@@ -0,0 +1,74 @@
+import asyncio
+import math
+import random
+from collections import defaultdict
+
+import pytest
+
+pytest.importorskip('autobahn')
+pytest.importorskip('bidict')
+
+from euchre.loadtest import (LoadPlayer, LoadStats, percentile,  # noqa: E402
+                             play_table)
+from test_server import FakeCoordinator, FakeDetails  # noqa: E402
+
+
+class FakeRouter(FakeCoordinator):
+    """Delivers publications to subscribers."""
+    def __init__(self):
+        super().__init__()
+        self.subscribers = defaultdict(list)
+        self.procedures['create_table'] = self.tables.create_table
+
+    def publish(self, topic, *args, options=None):
+        loop = asyncio.get_event_loop()
+        for session_id, handler in self.subscribers[topic]:
+            if options is None or session_id in options.eligible:
+                loop.call_soon(handler, *args)
+
+
+class FakeSession:
+    def __init__(self, router, session_id):
+        self.router = router
+        self.session_id = session_id
+
+    async def call(self, uri, *args):
+        await asyncio.sleep(0)
+        options = self.router.options.get(uri)
+        if options is None or options.details_arg is None:
+            return await self.router.call(uri, *args)
+        return await self.router.call(uri, *args,
+                                      details=FakeDetails(self.session_id))
+
+    async def subscribe(self, handler, topic):
+        self.router.subscribers[topic].append((self.session_id, handler))
+
+
+def test_percentile():
+    samples = list(range(1, 101))
+    assert percentile(samples, 0.5) == 51
+    assert percentile(samples, 0.99) == 100
+    assert percentile(samples, 1.0) == 100
+    assert math.isnan(percentile([], 0.5))
+
+
+@pytest.mark.parametrize('protocol', ['string', 'compact'])
+def test_players_finish_games(protocol):
+    async def run():
+        router = FakeRouter()
+        await router.register_players()
+        stats = LoadStats()
+        players = [LoadPlayer(FakeSession(router, seat), stats,
+                              random.Random(seat), protocol)
+                   for seat in range(4)]
+        for player in players:
+            await player.join()
+        await play_table(players, 2, stats, timeout=10)
+        return stats, players
+
+    stats, players = asyncio.run(run())
+    assert not stats.errors
+    assert stats.games == 2
+    assert len(stats.call_seconds) == len(stats.publish_seconds) > 0
+    assert all(player.protocol == protocol for player in players)
+    assert 'moves/s' in stats.report()
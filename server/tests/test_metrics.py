@@ -0,0 +1,66 @@
+"""Test metrics and their text format."""
+import asyncio
+
+from euchre.metrics import Registry, dump, serve
+
+
+def test_counter_and_gauge():
+    registry = Registry()
+    errors = registry.counter('errors_total', "Errors.", ['exception'])
+    errors.inc('IllegalMoveException')
+    errors.inc('IllegalMoveException')
+    errors.inc('OutOfTurnException')
+    registry.gauge('tables', "Tables.", lambda: 3)
+    assert errors.value('IllegalMoveException') == 2
+    text = registry.render()
+    assert '# TYPE errors_total counter' in text
+    assert 'errors_total{exception="IllegalMoveException"} 2' in text
+    assert 'errors_total{exception="OutOfTurnException"} 1' in text
+    assert 'tables 3\n' in text
+
+
+def test_histogram_buckets():
+    registry = Registry()
+    histogram = registry.histogram('move_seconds', "Moves.",
+                                   buckets=(0.001, 0.01))
+    for value in (0.0005, 0.001, 0.005, 0.5):
+        histogram.observe(value)
+    lines = registry.render().splitlines()
+    assert 'move_seconds_bucket{le="0.001"} 2' in lines
+    assert 'move_seconds_bucket{le="0.01"} 3' in lines
+    assert 'move_seconds_bucket{le="+Inf"} 4' in lines
+    assert 'move_seconds_count 4' in lines
+    assert histogram.count() == 4
+
+
+def test_sampled_timing():
+    registry = Registry(sample_every=4)
+    histogram = registry.histogram('call_seconds', "Calls.")
+    timed = histogram.time(lambda x: x + 1)
+    assert [timed(x) for x in range(10)] == list(range(1, 11))
+    assert histogram.calls == 10
+    assert histogram.count() == 2
+
+
+def test_serve_and_dump(tmp_path):
+    registry = Registry()
+    registry.counter('moves_total', "Moves.").inc()
+
+    async def run():
+        server = await serve(registry, '127.0.0.1', 0)
+        port = server.sockets[0].getsockname()[1]
+        reader, writer = await asyncio.open_connection('127.0.0.1', port)
+        writer.write(b'GET /metrics HTTP/1.0\r\n\r\n')
+        response = await reader.read()
+        writer.close()
+        server.close()
+        await server.wait_closed()
+        return response
+
+    response = asyncio.run(run())
+    assert response.startswith(b'HTTP/1.0 200 OK')
+    assert response.endswith(b'moves_total 1\n')
+    path = str(tmp_path / 'shard0.prom')
+    dump(path, registry)
+    with open(path) as metrics:
+        assert metrics.read() == registry.render()
@@ -0,0 +1,23 @@
+"""Test cards."""
+import copy
+import pickle
+
+import pytest
+
+from euchre.objects import Card, Deck, Rank, Suit
+
+
+def test_cards_are_interned():
+    card = Card.from_str('10.H')
+    assert card is Card(Rank.ten, Suit.hearts)
+    assert card is pickle.loads(pickle.dumps(card))
+    assert card is copy.deepcopy(card)
+    assert card != Card.from_str('10.D')
+    with pytest.raises(KeyError):
+        Card.from_str('1.H')
+
+
+def test_hash_is_deck_index():
+    for index, card in enumerate(Deck.cards):
+        assert hash(card) == card.index == index
+        assert Card.from_str(str(card)) is card
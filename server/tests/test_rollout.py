@@ -0,0 +1,56 @@
+"""Test the vectorized rollout engine against the game engine."""
+import pytest
+
+from euchre.dealing import Dealer
+from euchre.game import DiscardPhase, PlayCardsPhase, initial_game_state
+
+np = pytest.importorskip('numpy')
+rollout = pytest.importorskip('euchre.rollout')
+
+
+def lowest_card(state):
+    return min(state.legal_cards(), key=lambda card: card.index)
+
+
+def play_positions(count):
+    """Return PlayCardsPhases from random deals, some mid-trick."""
+    positions = []
+    for seed in range(count):
+        state = initial_game_state(Dealer(seed))
+        state = state.call_one(seed % 3 == 0)
+        if isinstance(state, DiscardPhase):
+            state = state.discard(state.current_hand[0])
+        for _ in range(seed % 7):
+            state = state.play(lowest_card(state))
+        positions.append(state)
+    return positions
+
+
+def finish(state):
+    """Play state out with lowest_card and return the points scored."""
+    score = state.score
+    while isinstance(state, PlayCardsPhase):
+        state = state.play(lowest_card(state))
+    return [after - before for after, before in zip(state.score, score)]
+
+
+def test_matches_game_engine():
+    positions = play_positions(60)
+    assert any(state.sitting is not None for state in positions)
+    assert any(len(state.trick) for state in positions)
+    batch = rollout.Batch.from_phases(positions)
+    rng = np.random.default_rng(0)
+    points = rollout.rollout(batch, rollout.lowest_policy, rng)
+    assert points.tolist() == [finish(state) for state in positions]
+
+
+def test_random_rollouts_finish():
+    rng = np.random.default_rng(1)
+    batch = rollout.Batch.deal(2000, rng, alone=0.2)
+    policies = [rollout.random_policy, rollout.highest_policy] * 2
+    points = rollout.rollout(batch, policies, rng)
+    assert batch.done().all()
+    playing = np.arange(4)[None, :] != batch.sitting[:, None]
+    assert (batch.hands[playing] == 0).all()
+    assert ((points > 0).sum(axis=1) == 1).all()
+    assert set(points.max(axis=1).tolist()) <= {1, 2, 4}
@@ -0,0 +1,457 @@
+"""Test the table layer of the server without a router."""
+import asyncio
+from collections import defaultdict
+
+import pytest
+
+pytest.importorskip('autobahn')
+pytest.importorskip('bidict')
+
+from euchre.exceptions import (IllegalMoveException,  # noqa: E402
+                               OutOfTurnException)
+from euchre.server import (BOT_ERRORS, MOVE_ERRORS,  # noqa: E402
+                           MOVES, PUBLISH_ERRORS, TABLE_MOVE_SECONDS,
+                           Coordinator, Player, PublishQueue,
+                           TableManager)
+
+
+class FakeRegistration:
+    def __init__(self, procedures, uri):
+        self.procedures = procedures
+        self.uri = uri
+
+    async def unregister(self):
+        del self.procedures[self.uri]
+
+
+class FakeDetails:
+    def __init__(self, caller):
+        self.caller = caller
+
+
+class FakeCoordinator:
+    """Stands in for the WAMP session, recording what it is asked to do."""
+    bot_workers = 1
+    bot_executor = None
+    journal = None
+    history = None
+    add_bot = Coordinator.add_bot
+
+    new_player_id = Coordinator.new_player_id
+    home_shard = Coordinator.home_shard
+    caller = Coordinator.caller
+    join_server = Coordinator.join_server
+    add_player = Coordinator.add_player
+    act = Coordinator.act
+    dispatcher = Coordinator.dispatcher
+    forget_session = Coordinator.forget_session
+    drop_player = Coordinator.drop_player
+    release_player = Coordinator.release_player
+    register_players = Coordinator.register_players
+
+    def __init__(self, shard=0, shards=1, procedures=None):
+        self.shard = shard
+        self.shards = shards
+        self.players = {}
+        self.sessions = {}
+        self.player_count = 0
+        self.procedures = {} if procedures is None else procedures
+        self.options = {}
+        self.subscriptions = {}
+        self.published = []
+        self.delivered = defaultdict(list)
+        self.backlog = 0
+        self.publish_queue = PublishQueue(lambda: self.backlog,
+                                          high_water=0, retry_delay=0)
+        self.tables = TableManager(self, shard, shards)
+
+    def publish(self, topic, *args, options=None):
+        self.published.append((topic, args))
+        if options is not None:
+            for session_id in options.eligible:
+                self.delivered[session_id].append((topic, args))
+
+    async def register(self, procedure, uri, options=None):
+        self.procedures[uri] = procedure
+        self.options[uri] = options
+        return FakeRegistration(self.procedures, uri)
+
+    async def subscribe(self, handler, topic):
+        self.subscriptions[topic] = handler
+
+    async def call(self, uri, *args, **kwargs):
+        result = self.procedures[uri](*args, **kwargs)
+        if asyncio.iscoroutine(result):
+            result = await result
+        return result
+
+    def new_player(self):
+        player = Player(self.new_player_id(), "p", self)
+        player.session_id = player.player_id
+        self.players[player.player_id] = player
+        return player
+
+
+def test_tables_are_independent():
+    async def run():
+        coordinator = FakeCoordinator()
+        first = await coordinator.tables.create_table("first")
+        second = await coordinator.tables.create_table()
+        assert coordinator.tables.list_tables() == {first: "first",
+                                                    second: "Table 1"}
+        assert 'table{}.seats'.format(second) in coordinator.procedures
+
+        players = [coordinator.new_player() for _ in range(4)]
+        for seat, player in enumerate(players):
+            player.join_table(first)
+            player.join_seat(seat)
+        players[0].start_game()
+        state = coordinator.tables.get(first).game.state
+        players[state.turn].perform_move('pass_bid')
+        await asyncio.sleep(0)
+        topics = {topic for topic, _ in coordinator.published}
+        assert 'table0.publicstate' in topics
+        assert 'table0.hand' in topics
+        assert [topic for topic, _ in coordinator.delivered[
+            players[1].session_id]] == ['table0.hand']
+        assert not any(topic.startswith('table1.') for topic in topics)
+        assert coordinator.tables.get(second).game is None
+
+        await coordinator.tables.close_table(first)
+        assert coordinator.tables.list_tables() == {second: "Table 1"}
+        assert 'table0.seats' not in coordinator.procedures
+        with pytest.raises(RuntimeError):
+            players[0].perform_move('pass_bid')
+
+    asyncio.run(run())
+
+
+def test_tables_across_shards():
+    async def run():
+        procedures = {}
+        shards = [FakeCoordinator(shard, 2, procedures) for shard in range(2)]
+        for coordinator in shards:
+            await coordinator.register_players()
+        table_ids = [await shards[0].tables.create_table() for _ in range(3)]
+        table_ids += [await shards[1].tables.create_table() for _ in range(3)]
+        assert len(set(table_ids)) == 6
+        for shard, coordinator in enumerate(shards):
+            assert all(coordinator.tables.ring.shard_for(table_id) == shard
+                       for table_id in coordinator.tables.list_tables())
+
+        # Players homed on shard 1 sit at a table owned by shard 0.
+        table_id = table_ids[0]
+        players = [shards[1].new_player() for _ in range(4)]
+        assert len({player.player_id for player in players}) == 4
+        for seat, player in enumerate(players):
+            player.join_table(table_id)
+            await player.join_seat(seat)
+        await players[0].start_game()
+        lobby = shards[0].tables.get(table_id)
+        assert lobby.get_seats() == [player.player_id for player in players]
+        await players[lobby.game.state.turn].perform_move('pass_bid')
+        assert lobby.game.state.turn == 2
+        await asyncio.sleep(0)
+        assert any(topic == 'table{}.publicstate'.format(table_id)
+                   for topic, _ in shards[0].published)
+        # The owning shard sends each hand only to its player's session.
+        hand = dict(shards[0].delivered[players[2].session_id])
+        snapshot = await players[2].snapshot()
+        assert snapshot['hand'] == hand['table{}.hand'.format(table_id)][0][
+            'hand']
+        assert 'table{}.snapshot'.format(table_id) not in procedures
+        assert await players[2].legal_moves() == [
+            ['pass_bid', []], ['call_one', [False]], ['call_one', [True]]]
+        assert await players[1].legal_moves() == []
+        assert 'table{}.legal_moves'.format(table_id) not in procedures
+
+        await shards[1].tables.close_table(table_id)
+        assert table_id not in shards[0].tables.list_tables()
+    asyncio.run(run())
+
+
+def test_players_act_through_dispatchers():
+    async def run():
+        procedures = {}
+        shards = [FakeCoordinator(shard, 2, procedures) for shard in range(2)]
+        for coordinator in shards:
+            await coordinator.register_players()
+        registered = len(procedures)
+
+        async def call(session_id, uri, *args):
+            return await shards[0].call(uri, *args,
+                                        details=FakeDetails(session_id))
+
+        sessions = [10, 11, 12, 13]
+        player_ids = [(await call(session_id, 'join_server'))[0]
+                      for session_id in sessions]
+        assert len(set(player_ids)) == 4
+        assert len(procedures) == registered
+        for session_id, player_id in zip(sessions, player_ids):
+            home = shards[session_id % 2]
+            assert home.sessions[session_id].player_id == player_id
+            assert player_id % 2 == home.shard
+
+        table_id = await shards[0].tables.create_table()
+        for seat, session_id in enumerate(sessions):
+            await call(session_id, 'player.join_table', table_id)
+            await call(session_id, 'player.join_seat', seat)
+        assert await call(11, 'player.set_protocol', 'compact') == 'compact'
+        await call(10, 'player.start_game')
+        lobby = shards[0].tables.get(table_id)
+        assert lobby.get_seats() == player_ids
+        await call(sessions[lobby.game.state.turn], 'player.perform_move',
+                   'pass_bid')
+        assert lobby.game.state.turn == 2
+        with pytest.raises(OutOfTurnException):
+            await call(10, 'player.perform_move', 'pass_bid')
+
+        await shards[1].forget_session(11)
+        with pytest.raises(RuntimeError):
+            await call(11, 'player.set_name', 'gone')
+        # A departed player keeps their seat until the table closes.
+        assert player_ids[1] in shards[1].players
+        await shards[1].tables.close_table(table_id)
+        assert player_ids[1] not in shards[1].players
+        assert player_ids[0] in shards[0].players
+        assert ('players', ({player_ids[1]: None},)) in shards[1].published
+
+        # Players without a seat are dropped as soon as they leave.
+        player_id, _ = await call(20, 'join_server')
+        await shards[0].forget_session(20)
+        assert player_id not in shards[0].players
+        assert not shards[0].sessions.get(20)
+        with pytest.raises(RuntimeError):
+            await shards[0].act(10, 'close')
+        with pytest.raises(RuntimeError):
+            await shards[0].call('player.start_game')
+    asyncio.run(run())
+
+
+def test_publishes_patches_and_snapshots():
+    async def run():
+        coordinator = FakeCoordinator()
+        table_id = await coordinator.tables.create_table()
+        players = [coordinator.new_player() for _ in range(4)]
+        for seat, player in enumerate(players):
+            player.join_table(table_id)
+            player.join_seat(seat)
+        players[0].start_game()
+        await asyncio.sleep(0)
+        lobby = coordinator.tables.get(table_id)
+        players[lobby.game.state.turn].perform_move('pass_bid')
+        await asyncio.sleep(0)
+
+        states = [args[0] for topic, args in coordinator.published
+                  if topic == 'table0.publicstate']
+        assert states[0]['version'] == 1 and 'snapshot' in states[0]
+        assert states[1] == {'version': 2, 'patch': {'turn': 2},
+                             'events': [{'seat': 1, 'move': 'pass_bid',
+                                         'args': []}]}
+        hands = [args[0] for topic, args in coordinator.published
+                 if topic == 'table0.hand']
+        assert len(hands) == 4
+
+        snapshot = players[2].snapshot()
+        assert snapshot['version'] == 2
+        assert snapshot['state']['turn'] == 2
+        assert snapshot['hand'] == hands[2]['hand']
+
+        assert players[1].legal_moves() == []
+        assert players[2].legal_moves() == [
+            ['pass_bid', []], ['call_one', [False]], ['call_one', [True]]]
+    asyncio.run(run())
+
+
+def test_snapshot_hands_are_encoded_once(monkeypatch):
+    import euchre.server
+    encoded = []
+
+    def encode_hand(hand, protocol):
+        encoded.append(protocol)
+        return []
+    monkeypatch.setattr(euchre.server, 'encode_hand', encode_hand)
+
+    async def run():
+        coordinator = FakeCoordinator()
+        table_id = await coordinator.tables.create_table()
+        players = [coordinator.new_player() for _ in range(4)]
+        players[3].set_protocol('compact')
+        for seat, player in enumerate(players):
+            player.join_table(table_id)
+            player.join_seat(seat)
+        players[0].start_game()
+        await asyncio.sleep(0)
+        hands = {session_id: dict(delivered)
+                 for session_id, delivered in coordinator.delivered.items()}
+        assert hands[players[0].session_id]['table0.hand'][0]['hand'] == (
+            players[0].snapshot()['hand'])
+        assert hands[players[3].session_id]['table0.hand.compact'][0][
+            'hand'] == players[3].snapshot()['hand']
+    asyncio.run(run())
+    assert encoded == []
+
+
+def test_publishes_coalesce_and_wait_for_backlog():
+    async def run():
+        coordinator = FakeCoordinator()
+        table_id = await coordinator.tables.create_table()
+        players = [coordinator.new_player() for _ in range(4)]
+        for seat, player in enumerate(players):
+            player.join_table(table_id)
+            player.join_seat(seat)
+        players[0].start_game()
+        await asyncio.sleep(0)
+        coordinator.backlog = 1
+        players[1].perform_move('pass_bid')
+        players[2].perform_move('pass_bid')
+        await asyncio.sleep(0)
+        await asyncio.sleep(0)
+        states = [args[0] for topic, args in coordinator.published
+                  if topic == 'table0.publicstate']
+        assert len(states) == 1
+
+        coordinator.backlog = 0
+        players[3].perform_move('pass_bid')
+        await asyncio.sleep(0.01)
+        states = [args[0] for topic, args in coordinator.published
+                  if topic == 'table0.publicstate']
+        assert len(states) == 2
+        assert states[1]['version'] == 2
+        assert states[1]['patch'] == {'turn': 0}
+        assert [event['seat'] for event in states[1]['events']] == [1, 2, 3]
+    asyncio.run(run())
+
+
+def test_failing_table_does_not_stop_others_publishing():
+    class Broken:
+        table_id = 'broken'
+
+        def flush_state(self):
+            raise ValueError("broken")
+
+    class Table:
+        flushed = 0
+
+        def __init__(self, table_id):
+            self.table_id = table_id
+
+        def flush_state(self):
+            self.flushed += 1
+
+    async def run():
+        queue = PublishQueue()
+        tables = [Table(0), Broken(), Table(1)]
+        for table in tables:
+            queue.schedule(table)
+        errors = PUBLISH_ERRORS.value('ValueError')
+        await asyncio.sleep(0)
+        assert [tables[0].flushed, tables[2].flushed] == [1, 1]
+        assert PUBLISH_ERRORS.value('ValueError') == errors + 1
+        assert not queue.tables and not queue.scheduled
+    asyncio.run(run())
+
+
+def test_moves_are_measured():
+    async def run():
+        coordinator = FakeCoordinator()
+        table_id = await coordinator.tables.create_table()
+        players = [coordinator.new_player() for _ in range(4)]
+        for seat, player in enumerate(players):
+            player.join_table(table_id)
+            player.join_seat(seat)
+        players[0].start_game()
+        moves = MOVES.value()
+        timed = TABLE_MOVE_SECONDS.count()
+        errors = MOVE_ERRORS.value('OutOfTurnException')
+        players[1].perform_move('pass_bid')
+        with pytest.raises(OutOfTurnException):
+            players[1].perform_move('pass_bid')
+        assert MOVES.value() == moves + 1
+        assert TABLE_MOVE_SECONDS.count() == timed + 2
+        assert MOVE_ERRORS.value('OutOfTurnException') == errors + 1
+    asyncio.run(run())
+
+
+def test_move_arguments_are_decoded_once(monkeypatch):
+    import euchre.server
+    decode = euchre.server.decode_args
+    decoded = []
+
+    def decode_args(move, args):
+        decoded.append(move)
+        return decode(move, args)
+    monkeypatch.setattr(euchre.server, 'decode_args', decode_args)
+
+    async def run():
+        coordinator = FakeCoordinator()
+        table_id = await coordinator.tables.create_table()
+        players = [coordinator.new_player() for _ in range(4)]
+        for seat, player in enumerate(players):
+            player.join_table(table_id)
+            player.join_seat(seat)
+        players[0].start_game()
+        players[1].perform_move('call_one', False)
+        lobby = coordinator.tables.get(table_id)
+        card = lobby.game.state.hands[0][0]
+        players[0].perform_move('discard', str(card))
+        assert lobby.game.state.hands[0].count(card) == 0
+        with pytest.raises(IllegalMoveException):
+            players[1].perform_move('play', 'X.X')
+    asyncio.run(run())
+    assert decoded == ['call_one', 'discard', 'play']
+
+
+def test_compact_protocol():
+    async def run():
+        coordinator = FakeCoordinator()
+        table_id = await coordinator.tables.create_table()
+        players = [coordinator.new_player() for _ in range(4)]
+        assert players[1].set_protocol('binary', 'compact') == 'compact'
+        assert players[2].set_protocol('binary') == 'string'
+        for seat, player in enumerate(players):
+            player.join_table(table_id)
+            player.join_seat(seat)
+        players[0].start_game()
+        await asyncio.sleep(0)
+        players[1].perform_move('pass_bid')
+        await asyncio.sleep(0)
+
+        published = dict(coordinator.published)
+        hands = dict(coordinator.delivered[players[1].session_id])
+        assert isinstance(hands['table0.hand.compact'][0]['hand'], int)
+        assert 'table0.hand' in dict(
+            coordinator.delivered[players[2].session_id])
+        compact = published['table0.publicstate.compact'][0]
+        assert compact['patch'] == {'turn': 2}
+        assert published['table0.publicstate'][0]['patch'] == {'turn': 2}
+    asyncio.run(run())
+
+
+@pytest.mark.parametrize('error', ['ValueError', 'IllegalMoveException'])
+def test_failing_bot_plays_a_default_move(error):
+    def choose_move(state, deadline=None):
+        if error == 'ValueError':
+            raise ValueError("search failed")
+        return ('discard', state.hands[state.turn][:1])
+
+    async def run():
+        coordinator = FakeCoordinator()
+        table_id = await coordinator.tables.create_table()
+        lobby = coordinator.tables.get(table_id)
+        players = [coordinator.new_player() for _ in range(3)]
+        for seat, player in zip((0, 2, 3), players):
+            player.join_table(table_id)
+            player.join_seat(seat)
+        lobby.add_bot(1)
+        bot = lobby.seats_to_players[1]
+        bot.bot.choose_move = choose_move
+        errors = BOT_ERRORS.value(error)
+        players[0].start_game()
+        for _ in range(100):
+            await asyncio.sleep(0.01)
+            if lobby.game.state.turn != 1:
+                break
+        assert lobby.game.state.turn == 2
+        assert BOT_ERRORS.value(error) == errors + 1
+    asyncio.run(run())
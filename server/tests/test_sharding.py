@@ -0,0 +1,20 @@
+"""Test the assignment of tables to shards."""
+from euchre.sharding import HashRing
+
+
+def test_hash_ring_is_stable():
+    first, second, single = HashRing(4), HashRing(4), HashRing(1)
+    assert ([first.shard_for(key) for key in range(100)] ==
+            [second.shard_for(key) for key in range(100)])
+    assert all(single.shard_for(key) == 0 for key in range(100))
+
+
+def test_hash_ring_spreads_and_moves_few_keys():
+    keys = range(4000)
+    four = list(map(HashRing(4).shard_for, keys))
+    five = list(map(HashRing(5).shard_for, keys))
+    for shard in range(4):
+        assert 600 < four.count(shard) < 1400
+    moved = sum(before != after for before, after in zip(four, five))
+    assert moved == five.count(4)
+    assert moved < len(keys) / 3
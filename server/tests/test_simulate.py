@@ -0,0 +1,27 @@
+"""Test the headless game simulator."""
+from euchre.simulate import passive_policy, random_policy, simulate
+
+
+def test_simulate_in_process():
+    results = list(simulate(20, workers=1, seed=1, chunk_size=8))
+    assert len(results) == 3
+    summary = results[-1].summary()
+    assert summary['games'] == 20
+    assert sum(summary['win_rate']) == 1
+    assert summary['hands'] >= 20 * 3
+
+
+def test_simulate_reproducible():
+    def run(workers):
+        stats = list(simulate(12, workers=workers, seed=7, chunk_size=4))[-1]
+        return stats.summary()
+
+    assert run(1) == run(1)
+    assert run(1) == run(2)
+
+
+def test_policies():
+    policies = [random_policy, passive_policy] * 2
+    stats = list(simulate(10, policies=policies, workers=1, seed=3))[-1]
+    assert stats.games == 10
+    assert sum(stats.wins) == 10
@@ -0,0 +1,73 @@
+"""Test the double-dummy solver against exhaustive search."""
+import random
+
+from euchre import compact
+from euchre.dealing import Dealer
+from euchre.game import PlayCardsPhase, Trick
+from euchre.objects import Card, Suit
+from euchre.solver import Position, Solver, solve
+from test_game import play_phase_start_state
+
+
+def brute_force(solver, hands, trick, leader, turn):
+    """Return tricks team 0 takes with best play, searching every card."""
+    if not trick and not any(hands):
+        return 0
+    led = trick[0] if trick else None
+    values = []
+    for card in compact.indices(compact.legal_plays(hands[turn],
+                                                    solver.trump, led)):
+        *child, won = solver.play(hands, trick, leader, turn, card)
+        values.append(won + brute_force(solver, *child))
+    return max(values) if turn % 2 == 0 else min(values)
+
+
+def random_phase(seed, sitting=None, hand_size=3):
+    rng = random.Random(seed)
+    hands, _ = Dealer(seed)()
+    hands = [hand[:hand_size] for hand in hands]
+    trump = rng.choice(list(Suit))
+    turn = rng.choice([p for p in range(4) if p != sitting])
+    maker = turn if sitting is None else (sitting + 2) % 4
+    return PlayCardsPhase([0, 0], hands, 0, turn, maker, sitting, trump,
+                          Trick(turn), [5 - hand_size, 0])
+
+
+def check_against_brute_force(phase):
+    position = Position.from_phase(phase)
+    solver = Solver(position.trump, position.sitting)
+    team = phase.turn % 2
+    values = solve(phase, solver)
+    assert len(values) == len(phase.current_hand)
+    for card, tricks in values.items():
+        index = compact.card_index(card)
+        *child, won = solver.play(position.hands, position.trick,
+                                  position.leader, position.turn, index)
+        team_0 = won + brute_force(solver, *child)
+        remaining = len(phase.current_hand)
+        taken = team_0 if team == 0 else remaining - team_0
+        assert tricks == phase.trick_score[team] + taken
+
+
+def test_solve_start_of_hand():
+    values = solve(play_phase_start_state().state)
+    assert {str(card): tricks for card, tricks in values.items()} == {
+        'A.C': 0, 'K.C': 0, 'J.C': 0, 'Q.D': 3, '9.H': 3}
+
+
+def test_matches_brute_force():
+    for seed in range(20):
+        check_against_brute_force(random_phase(seed))
+
+
+def test_matches_brute_force__alone():
+    for seed in range(20):
+        check_against_brute_force(random_phase(seed, sitting=seed % 4))
+
+
+def test_mid_trick():
+    g = play_phase_start_state()
+    g.perform_move('play', 1, Card.from_str("Q.D"))
+    values = solve(g.state)
+    assert {str(card): tricks for card, tricks in values.items()} == {
+        'A.H': 2, 'K.H': 2, 'J.H': 2, 'Q.C': 2, '9.C': 2}